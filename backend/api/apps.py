@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        # Connects the response cache invalidation signals
+        from . import response_cache  # noqa: F401
+        # Registers the background job tasks
+        from . import tasks  # noqa: F401
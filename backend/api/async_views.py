@@ -0,0 +1,184 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+from django.http import HttpResponse
+from django.urls import URLPattern
+from django.utils.cache import patch_vary_headers
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAcceptable, NotFound
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .db_router import read_from_replica, reset_read_alias
+from .instrumentation import span
+from .models import Match
+from .pagination import MatchCursorPagination
+from .response_cache import acached
+from .serializers import (LiveStateSerializer, MatchSerializer, MatchSummarySerializer, ScorecardSerializer,
+                          with_match_prefetch, with_scorecard_prefetch)
+from .views import SCORING_ACTIONS, match_list_queryset
+
+# Async match reads for the ASGI server (settings.ASYNC_API): list, detail, live state and scorecard go
+# through the async ORM on the event loop instead of queueing for the one thread Django runs sync views on.
+# Payloads, renderers, response cache and replica routing are the same as the DRF views'. Scoring writes,
+# and every other method on these URLs, run the DRF views in a bounded pool of SCORING_WRITE_THREADS
+# threads, so a slow write holds up no reads and the pool size caps the connections writes hold.
+
+
+@lru_cache(maxsize=None)
+def write_pool():
+    return ThreadPoolExecutor(settings.SCORING_WRITE_THREADS, thread_name_prefix='scoring-write')
+
+
+def in_write_pool(view):
+    """A sync view as an async view running in the write pool."""
+    def run(request, *args, **kwargs):
+        # Pool threads keep their connection between requests like a sync worker does, within CONN_MAX_AGE
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            # Rendered here rather than on the sync thread
+            if callable(getattr(response, 'render', None)):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await sync_to_async(run, thread_sensitive=False, executor=write_pool())(request, *args, **kwargs)
+    return wrapper
+
+
+def renderers():
+    # The browsable API stays with the sync views
+    return [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+            if not issubclass(renderer, BrowsableAPIRenderer)]
+
+
+def render(request, renderer, media_type, data, status_code, etag=None):
+    content_type = f'{media_type}; charset={renderer.charset}' if renderer.charset else media_type
+    response = HttpResponse(renderer.render(data, media_type, {'request': request}), status=status_code,
+                            content_type=content_type)
+    patch_vary_headers(response, ('Accept',))
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def spectator_read(cache_kind=None):
+    """Turns `async def load(request, **kwargs) -> data` into an async view.
+
+    Reads go to a replica like ReplicaReadMixin's, and through the response cache when cache_kind is set
+    (see api.response_cache.acached). API errors are rendered like DRF's exception handler renders them.
+    """
+    def decorator(load):
+        @wraps(load)
+        async def view(request, format=None, **kwargs):
+            drf_request = Request(request)
+            choices = renderers()
+            try:
+                renderer, media_type = DefaultContentNegotiation().select_renderer(drf_request, choices, format)
+            except NotAcceptable as exc:
+                return render(drf_request, choices[0], choices[0].media_type, {'detail': exc.detail},
+                              exc.status_code)
+
+            etag = None
+            code = status.HTTP_200_OK
+            token = read_from_replica(request)
+            try:
+                if cache_kind:
+                    data, etag = await acached(cache_kind, request, renderer.format,
+                                               lambda: load(drf_request, **kwargs), kwargs.get('pk'))
+                    if data is None:
+                        code = status.HTTP_304_NOT_MODIFIED
+                else:
+                    data = await load(drf_request, **kwargs)
+            except APIException as exc:
+                data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                code = exc.status_code
+            finally:
+                reset_read_alias(token)
+            return render(drf_request, renderer, media_type, data, code, etag)
+        return view
+    return decorator
+
+
+async def get_match(queryset, pk):
+    try:
+        return await queryset.aget(pk=pk)
+    except (Match.DoesNotExist, TypeError, ValueError):
+        raise NotFound("No Match matches the given query.")
+
+
+# The serializers below only touch prefetched rows, so they run on the event loop without queries
+
+
+@spectator_read('list')
+async def match_list(request):
+    queryset = match_list_queryset(Match.objects.all(), request.query_params)
+    paginator = MatchCursorPagination()
+    # The cursor paginator evaluates its page itself, so the page query runs on the sync thread; list pages
+    # are served from the response cache until a match changes
+    page = await sync_to_async(paginator.paginate_queryset)(queryset, request)
+    return paginator.get_paginated_response(MatchSummarySerializer(page, many=True).data).data
+
+
+@spectator_read('detail')
+async def match_detail(request, pk):
+    match = await get_match(with_match_prefetch(Match.objects.all()), pk)
+    with span('serialize'):
+        return MatchSerializer(match, context={'request': request}).data
+
+
+@spectator_read()
+async def match_live(request, pk):
+    # One trip to the sync thread: the last ball is annotated instead of aggregated separately
+    queryset = Match.objects.annotate(last_delivery_id=Max('innings__deliveries__id')).prefetch_related('innings')
+    return LiveStateSerializer(await get_match(queryset, pk)).data
+
+
+@spectator_read('scorecard')
+async def match_scorecard(request, pk):
+    match = await get_match(with_scorecard_prefetch(Match.objects.all()), pk)
+    return ScorecardSerializer(match).data
+
+
+ASYNC_READS = {
+    'match-list': match_list,
+    'match-detail': match_detail,
+    'match-live': match_live,
+    'match-scorecard': match_scorecard,
+}
+WRITE_VIEWS = {f"match-{action.replace('_', '-')}" for action in SCORING_ACTIONS}
+
+
+def with_sync_fallback(read, sync_view):
+    # GETs are served by the async view, anything else (create, update, OPTIONS...) by the DRF view
+    sync_view = in_write_pool(sync_view)
+
+    @wraps(sync_view)
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET':
+            return await read(request, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+    return view
+
+
+def async_urlpatterns(patterns):
+    """The router's patterns with the match reads async and the scoring writes in the write pool."""
+    converted = []
+    for pattern in patterns:
+        callback = pattern.callback
+        if pattern.name in ASYNC_READS:
+            callback = with_sync_fallback(ASYNC_READS[pattern.name], callback)
+        elif pattern.name in WRITE_VIEWS:
+            callback = in_write_pool(callback)
+        converted.append(URLPattern(pattern.pattern, callback, pattern.default_args, pattern.name))
+    return converted
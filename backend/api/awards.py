@@ -0,0 +1,47 @@
+import heapq
+
+from django.db.models import Sum
+
+from .models import BattingLine, BowlingLine
+
+# Man of the match points per bowler wicket, on top of one point per run
+MOM_POINTS_PER_WICKET = 20
+
+
+def batting_totals(match):
+    return (BattingLine.objects.filter(innings__match=match)
+            .values('player').annotate(runs=Sum('runs'), balls=Sum('balls')))
+
+
+def bowling_totals(match):
+    return (BowlingLine.objects.filter(innings__match=match)
+            .values('player').annotate(wickets=Sum('wickets'), runs=Sum('runs_conceded')))
+
+
+def top(rows, key):
+    # Top-1 selection in a single pass, no full sort
+    best = heapq.nsmallest(1, rows, key=key)
+    return best[0] if best else None
+
+
+def compute_awards(match):
+    """Sets best batsman, best bowler and man of the match from the per-innings scorecard lines."""
+    # Two grouped queries, one row per player who batted or bowled
+    batting = list(batting_totals(match))
+    bowling = list(bowling_totals(match))
+
+    # Most runs, then fewest balls faced
+    best_batsman = top(batting, key=lambda row: (-row['runs'], row['balls'], row['player']))
+    # Most wickets, then fewest runs conceded
+    best_bowler = top(bowling, key=lambda row: (-row['wickets'], row['runs'], row['player']))
+
+    points = {}
+    for row in batting:
+        points[row['player']] = points.get(row['player'], 0) + row['runs']
+    for row in bowling:
+        points[row['player']] = points.get(row['player'], 0) + row['wickets'] * MOM_POINTS_PER_WICKET
+    man_of_match = top(points.items(), key=lambda item: (-item[1], item[0]))
+
+    match.best_batsman_id = best_batsman['player'] if best_batsman else None
+    match.best_bowler_id = best_bowler['player'] if best_bowler else None
+    match.man_of_match_id = man_of_match[0] if man_of_match else None
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .serializers import InningsSummarySerializer, DeliverySerializer
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    def __init__(self, match_id, loop):
+        self.match_id = match_id
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, payload):
+        # Runs on the subscriber's loop. A spectator that stops reading loses the oldest events,
+        # the version in every event tells them to resync from /live/.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(payload)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+def _fan_out(subscriptions, payload):
+    for subscription in subscriptions:
+        subscription.put(payload)
+
+
+class InProcessBroadcaster:
+    """Fans match events out to the subscribers connected to this process."""
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        # match id -> event loop -> subscriptions, so a publish costs one wake-up per loop, not per spectator
+        self._subscriptions = defaultdict(lambda: defaultdict(set))
+
+    def subscribe(self, match_id, loop=None):
+        subscription = Subscription(match_id, loop or asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[match_id][subscription.loop].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            loops = self._subscriptions.get(subscription.match_id)
+            if not loops:
+                return
+            subscriptions = loops.get(subscription.loop)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del loops[subscription.loop]
+            if not loops:
+                del self._subscriptions[subscription.match_id]
+
+    def subscriber_count(self, match_id):
+        with self._lock:
+            return sum(len(s) for s in self._subscriptions.get(match_id, {}).values())
+
+    def publish(self, match_id, event):
+        self.deliver(match_id, json.dumps(event))
+
+    def deliver(self, match_id, payload):
+        # The payload is encoded once and shared by every subscriber
+        with self._lock:
+            targets = [(loop, tuple(subs)) for loop, subs in self._subscriptions.get(match_id, {}).items()]
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(_fan_out, subscriptions, payload)
+            except RuntimeError:
+                # The loop was closed while its subscribers were still registered
+                pass
+
+
+class RedisBroadcaster(InProcessBroadcaster):
+    """Relays events through Redis pub/sub so every server process reaches its own subscribers."""
+
+    CHANNEL_PREFIX = 'sbfc:match:'
+
+    def __init__(self, url='redis://localhost:6379/0', **options):
+        super().__init__(**options)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroadcaster requires the 'redis' package")
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(f'{self.CHANNEL_PREFIX}*')
+        self._listener = threading.Thread(target=self._listen, name='redis-broadcaster', daemon=True)
+        self._listener.start()
+
+    def publish(self, match_id, event):
+        self._redis.publish(f'{self.CHANNEL_PREFIX}{match_id}', json.dumps(event))
+
+    def _listen(self):
+        for message in self._pubsub.listen():
+            channel = message['channel'].decode()
+            match_id = int(channel[len(self.CHANNEL_PREFIX):])
+            self.deliver(match_id, message['data'].decode())
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                config = getattr(settings, 'LIVE_BROADCASTER', {})
+                backend = import_string(config.get('BACKEND', 'api.broadcast.InProcessBroadcaster'))
+                _broadcaster = backend(**config.get('OPTIONS', {}))
+    return _broadcaster
+
+
+def publish_match_event(match, event, innings=None, delivery=None):
+    payload = {
+        'event': event,
+        'match': match.id,
+        'version': match.version,
+        'status': match.status,
+        'innings': InningsSummarySerializer(innings).data if innings else None,
+        'delivery': DeliverySerializer(delivery).data if delivery else None,
+    }
+    get_broadcaster().publish(match.id, payload)
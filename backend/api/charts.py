@@ -0,0 +1,132 @@
+import copy
+from itertools import accumulate
+
+from django.core.cache import cache
+
+from .models import Delivery
+from .scorecard import ILLEGAL_EXTRA_TYPES
+from .scoring import BALLS_PER_OVER, overs_display, run_rate
+
+# Match progression charts, built in one pass over the balls of each innings in (over, ball) order.
+# The state folded from completed overs is cached and extended with the balls bowled since. Cache keys
+# carry the match's last_undo_version, so undo and rewind start a fresh entry instead of serving balls
+# that are gone; stale entries simply expire.
+CHART_CACHE_TIMEOUT = 6 * 60 * 60
+CHART_FIELDS = ('over_number', 'batsman_id', 'non_striker_id', 'runs_batter', 'extras', 'extra_type',
+                'is_wicket', 'player_out_id')
+
+
+def cache_key(innings, match):
+    return f'charts:{innings.id}:{match.last_undo_version}'
+
+
+def empty_state():
+    return {
+        # Overs before this one are folded in; the cache never holds part of an over unless the innings is over
+        'next_over': 0,
+        'runs': 0,
+        'wickets': 0,
+        'legal_balls': 0,
+        # [runs, wickets, legal balls] per over
+        'overs': [],
+        'fall_of_wickets': [],
+        'partnerships': [],
+        'partnership': new_partnership(1),
+    }
+
+
+def new_partnership(wicket):
+    return {'wicket': wicket, 'batters': [], 'runs': 0, 'balls': 0}
+
+
+def fold(state, row):
+    over_number, batsman_id, non_striker_id, runs_batter, extras, extra_type, is_wicket, player_out_id = row
+    legal = extra_type not in ILLEGAL_EXTRA_TYPES
+    runs = runs_batter + extras
+    while len(state['overs']) <= over_number:
+        state['overs'].append([0, 0, 0])
+    over = state['overs'][over_number]
+    over[0] += runs
+    state['runs'] += runs
+    if legal:
+        over[2] += 1
+        state['legal_balls'] += 1
+
+    partnership = state['partnership']
+    for batter in (batsman_id, non_striker_id):
+        if batter is not None and batter not in partnership['batters']:
+            partnership['batters'].append(batter)
+    partnership['runs'] += runs
+    partnership['balls'] += 1 if legal else 0
+
+    if is_wicket:
+        over[1] += 1
+        state['wickets'] += 1
+        state['fall_of_wickets'].append({
+            'wicket': state['wickets'],
+            'runs': state['runs'],
+            'overs': overs_display(state['legal_balls']),
+            'player_out': player_out_id,
+        })
+        state['partnerships'].append(partnership)
+        state['partnership'] = new_partnership(state['wickets'] + 1)
+
+
+def render(innings, state):
+    manhattan = [over[0] for over in state['overs']]
+    worm = list(accumulate(manhattan))
+    balls = accumulate(over[2] for over in state['overs'])
+    partnerships = [{**p, 'is_unbroken': False} for p in state['partnerships']]
+    if state['partnership']['batters']:
+        partnerships.append({**state['partnership'], 'is_unbroken': True})
+    return {
+        'id': innings.id,
+        'innings_number': innings.innings_number,
+        'batting_team': innings.batting_team_id,
+        'manhattan': manhattan,
+        'worm': worm,
+        'run_rate': [run_rate(runs, faced) for runs, faced in zip(worm, balls)],
+        'wickets': [over[1] for over in state['overs']],
+        'fall_of_wickets': state['fall_of_wickets'],
+        'partnerships': partnerships,
+    }
+
+
+def innings_charts(match, innings):
+    """Chart series for one innings. Reads only the overs that are not cached yet."""
+    key = cache_key(innings, match)
+    state = cache.get(key) or empty_state()
+    rows = list(Delivery.objects.filter(innings=innings, over_number__gte=state['next_over'])
+                .order_by('over_number', 'ball_number', 'id').values_list(*CHART_FIELDS))
+
+    # Cacheable prefix: the run of complete overs from next_over on, or everything once the innings is over
+    legal = {}
+    for row in rows:
+        legal[row[0]] = legal.get(row[0], 0) + (row[5] not in ILLEGAL_EXTRA_TYPES)
+    boundary = state['next_over']
+    if innings.is_completed:
+        boundary = max(legal, default=boundary - 1) + 1
+    else:
+        while legal.get(boundary, 0) >= BALLS_PER_OVER:
+            boundary += 1
+
+    split = next((i for i, row in enumerate(rows) if row[0] >= boundary), len(rows))
+    if boundary > state['next_over']:
+        for row in rows[:split]:
+            fold(state, row)
+        state['next_over'] = boundary
+        cache.set(key, state, CHART_CACHE_TIMEOUT)
+
+    if split < len(rows):
+        state = copy.deepcopy(state)
+        for row in rows[split:]:
+            fold(state, row)
+    return render(innings, state)
+
+
+def match_charts(match):
+    return {
+        'id': match.id,
+        'version': match.version,
+        'innings': [innings_charts(match, innings) for innings in match.innings.order_by('innings_number')],
+    }
@@ -0,0 +1,77 @@
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.cache import patch_vary_headers
+
+# Compresses API responses with brotli when the client accepts it and the optional 'brotli' package is
+# installed, otherwise with gzip. Streaming responses (the live event stream, exports) are left alone so
+# events are not held back in a compressor buffer.
+MIN_LENGTH = 200
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_ACCEPT = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for part in header.split(','):
+        found = _ACCEPT.match(part)
+        if not found:
+            continue
+        try:
+            quality = float(found.group(2) or 1)
+        except ValueError:
+            # A malformed q value like 1.2.3: not acceptable, rather than an error on every endpoint
+            continue
+        if quality > 0:
+            encodings.add(found.group(1).lower())
+    return encodings
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or len(response.content) < MIN_LENGTH:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding, compressed = 'br', brotli.compress(response.content, quality=BROTLI_QUALITY)
+        elif 'gzip' in accepted:
+            encoding, compressed = 'gzip', gzip.compress(response.content, GZIP_LEVEL, mtime=0)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The compressed body is a different byte sequence, a strong ETag no longer matches it
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        return response
@@ -0,0 +1,109 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+# Read replicas for spectator traffic. Views opt in with ReplicaReadMixin: their GET requests read from one
+# of settings.DATABASE_REPLICAS, everything else (writes, transactions, other views) stays on the primary.
+# A client that has just written is pinned to the primary for DATABASE_REPLICA_PIN_SECONDS, so the scorer
+# reads its own balls whatever the replication lag. The pin travels as a cookie and as the X-Primary-Until
+# header, which cross-origin clients without credentials echo back.
+
+PIN_COOKIE = 'sbfc_primary_until'
+PIN_HEADER = 'X-Primary-Until'
+DEFAULT_PIN_SECONDS = 5
+
+_read_alias = ContextVar('replica_read_alias', default=None)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS)
+
+
+def reading_replica():
+    return _read_alias.get() is not None
+
+
+@contextmanager
+def primary():
+    """Reads in the block go to the primary, e.g. to fill a cache that has to outlive replication lag."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def is_pinned(request):
+    for value in (request.headers.get(PIN_HEADER), request.COOKIES.get(PIN_COOKIE)):
+        try:
+            if value and float(value) > time.time():
+                return True
+        except ValueError:
+            pass
+    return False
+
+
+def reset_read_alias(token):
+    if token is not None:
+        _read_alias.reset(token)
+
+
+def read_from_replica(request):
+    """Points the request's reads at a replica, unless it writes or is pinned; returns the token to reset."""
+    if request.method in SAFE_METHODS and replicas() and not is_pinned(request):
+        return _read_alias.set(random.choice(replicas()))
+    return None
+
+
+def pin(response):
+    until = time.time() + pin_seconds()
+    response[PIN_HEADER] = f'{until:.3f}'
+    response.set_cookie(PIN_COOKIE, f'{until:.3f}', max_age=pin_seconds(), samesite='Lax')
+
+
+class ReplicaRouter:
+    """Routes reads to the replica chosen for the current request, if any; writes always to the primary."""
+
+    def db_for_read(self, model, **hints):
+        # None falls through to 'default'
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaReadMixin:
+    """For viewsets: safe requests read from a replica unless the client is pinned to the primary."""
+
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._replica_token = read_from_replica(request)
+
+    def dispatch(self, request, *args, **kwargs):
+        # Reset here rather than in finalize_response, which an exception DRF does not handle skips; the
+        # thread would keep reading from the replica in its next requests
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            reset_read_alias(self._replica_token)
+            self._replica_token = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin(response)
+        return response
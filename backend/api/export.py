@@ -0,0 +1,257 @@
+import array
+import ast
+import struct
+import sys
+import tempfile
+import zipfile
+
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+
+from .models import Delivery
+from .scorecard import ILLEGAL_EXTRA_TYPES
+
+# Columnar export of deliveries for season analysis. Rows are read with values_list in server-side chunks and
+# written column by column, so memory is bounded by the chunk size. npz is one .npy per column, as numpy.load
+# reads it; parquet needs the optional pyarrow package. The chart series helpers work on the columns with
+# numpy. extra_type and wicket_type are dictionary encoded as small integer codes with their labels stored
+# alongside; missing player ids are -1, and so are labels outside the tables (legacy rows, or a choice added
+# since), which parquet stores as null.
+EXPORT_CHUNK_SIZE = 20000
+NULL_ID = -1
+UNKNOWN_CODE = -1
+
+EXTRA_TYPE_LABELS = tuple(code for code, _ in Delivery.EXTRA_TYPES)
+WICKET_TYPE_LABELS = tuple(code for code, _ in Delivery.WICKET_TYPES)
+EXTRA_TYPE_CODES = {label: i for i, label in enumerate(EXTRA_TYPE_LABELS)}
+WICKET_TYPE_CODES = {label: i for i, label in enumerate(WICKET_TYPE_LABELS)}
+
+# (column, values_list lookup, array typecode): q = int64, h = int16, b = int8
+COLUMNS = (
+    ('id', 'id', 'q'),
+    ('match_id', 'innings__match_id', 'q'),
+    ('innings_id', 'innings_id', 'q'),
+    ('innings_number', 'innings__innings_number', 'b'),
+    ('over_number', 'over_number', 'h'),
+    ('ball_number', 'ball_number', 'h'),
+    ('batsman_id', 'batsman_id', 'q'),
+    ('non_striker_id', 'non_striker_id', 'q'),
+    ('bowler_id', 'bowler_id', 'q'),
+    ('runs_batter', 'runs_batter', 'h'),
+    ('extras', 'extras', 'h'),
+    ('extra_type', 'extra_type', 'b'),
+    ('is_wicket', 'is_wicket', 'b'),
+    ('wicket_type', 'wicket_type', 'b'),
+    ('player_out_id', 'player_out_id', 'q'),
+    ('catcher_id', 'catcher_id', 'q'),
+)
+NPY_DESCR = {'q': '<i8', 'h': '<i2', 'b': '|i1'}
+
+
+class ExportError(Exception):
+    pass
+
+
+def delivery_rows(queryset):
+    # Innings by innings, balls in the order they were bowled; served by the (innings, id) index
+    return queryset.order_by('innings_id', 'id').values_list(*(lookup for _, lookup, _ in COLUMNS))
+
+
+def iter_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields {column: array.array} chunks of at most chunk_size deliveries."""
+    encoders = {
+        'extra_type': lambda value: EXTRA_TYPE_CODES.get(value, UNKNOWN_CODE),
+        'wicket_type': lambda value: WICKET_TYPE_CODES.get(value, UNKNOWN_CODE),
+    }
+    rows = delivery_rows(queryset).iterator(chunk_size=chunk_size)
+    while True:
+        batch = [row for _, row in zip(range(chunk_size), rows)]
+        if not batch:
+            return
+        chunk = {}
+        for (name, _, typecode), values in zip(COLUMNS, zip(*batch)):
+            if name in encoders:
+                values = map(encoders[name], values)
+            elif name.endswith('_id'):
+                values = (NULL_ID if value is None else value for value in values)
+            chunk[name] = array.array(typecode, values)
+        yield chunk
+
+
+def npy_header(descr, length):
+    header = repr({'descr': descr, 'fortran_order': False, 'shape': (length,)})
+    # Magic, version 1.0 and the header length take 10 bytes; the whole header is padded to 64 bytes
+    padding = 63 - (10 + len(header)) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header
+
+
+def labels_npy(labels):
+    width = max(len(label) for label in labels)
+    body = b''.join(label.ljust(width, '\0').encode('utf-32-le') for label in labels)
+    return npy_header(f'<U{width}', len(labels)) + body
+
+
+def little_endian(values):
+    if sys.byteorder != 'little' and values.itemsize > 1:
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class _Sink:
+    # Write-only file object for zipfile; the streaming response drains it after every write
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def spool_columns(chunks):
+    """Writes every column to its own temporary file. Returns ({column: file}, row count)."""
+    files = {name: tempfile.TemporaryFile() for name, _, _ in COLUMNS}
+    count = 0
+    for chunk in chunks:
+        for name, values in chunk.items():
+            little_endian(values).tofile(files[name])
+        count += len(chunk['id'])
+    for spooled in files.values():
+        spooled.seek(0)
+    return files, count
+
+
+def iter_npz(chunks, block_size=1 << 20):
+    """Yields the bytes of an npz archive. Columns are spooled to disk first, a .npy header needs the length."""
+    files, count = spool_columns(chunks)
+    sink = _Sink()
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, _, typecode in COLUMNS:
+                with archive.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                    member.write(npy_header(NPY_DESCR[typecode], count))
+                    while block := files[name].read(block_size):
+                        member.write(block)
+                        yield sink.drain()
+                yield sink.drain()
+            archive.writestr('extra_type_labels.npy', labels_npy(EXTRA_TYPE_LABELS))
+            archive.writestr('wicket_type_labels.npy', labels_npy(WICKET_TYPE_LABELS))
+        yield sink.drain()
+    finally:
+        for spooled in files.values():
+            spooled.close()
+
+
+def write_npz(chunks, fileobj):
+    for data in iter_npz(chunks):
+        fileobj.write(data)
+
+
+def write_parquet(chunks, fileobj):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImproperlyConfigured("Parquet export requires the 'pyarrow' package, use npz otherwise")
+
+    types = {'q': pa.int64(), 'h': pa.int16(), 'b': pa.int8()}
+    labels = {'extra_type': pa.array(EXTRA_TYPE_LABELS), 'wicket_type': pa.array(WICKET_TYPE_LABELS)}
+    schema = pa.schema([
+        (name, pa.dictionary(pa.int8(), pa.string()) if name in labels else types[typecode])
+        for name, _, typecode in COLUMNS
+    ])
+    with pq.ParquetWriter(fileobj, schema) as writer:
+        for chunk in chunks:
+            columns = []
+            for name, _, typecode in COLUMNS:
+                values = pa.array(chunk[name], type=types[typecode])
+                if name in labels:
+                    unknown = np.asarray(chunk[name]) == UNKNOWN_CODE
+                    values = pa.DictionaryArray.from_arrays(values, labels[name], mask=unknown)
+                columns.append(values)
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+
+
+WRITERS = {'npz': write_npz, 'parquet': write_parquet}
+
+
+def export_deliveries(queryset, fileobj, file_type='npz', chunk_size=EXPORT_CHUNK_SIZE):
+    if file_type not in WRITERS:
+        raise ExportError(f"Unknown export type {file_type}, expected one of {', '.join(WRITERS)}")
+    WRITERS[file_type](iter_chunks(queryset, chunk_size), fileobj)
+
+
+def read_npz(fileobj):
+    """Reads an npz written by this module back into {column: array.array} (labels as tuples of str).
+
+    numpy.load reads the same files.
+    """
+    columns = {}
+    with zipfile.ZipFile(fileobj) as archive:
+        for member in archive.namelist():
+            data = archive.read(member)
+            (header_length,) = struct.unpack('<H', data[8:10])
+            header = ast.literal_eval(data[10:10 + header_length].decode('latin1'))
+            body = data[10 + header_length:]
+            name = member[:-len('.npy')]
+            if header['descr'].startswith('<U'):
+                width = int(header['descr'][2:])
+                text = body.decode('utf-32-le')
+                columns[name] = tuple(text[i:i + width].rstrip('\0') for i in range(0, len(text), width))
+            else:
+                typecode = {descr: code for code, descr in NPY_DESCR.items()}[header['descr']]
+                values = array.array(typecode)
+                values.frombytes(body)
+                columns[name] = little_endian(values)
+    return columns
+
+
+def over_series(over_number, runs, legal, wickets=None):
+    """Per-over chart series for one innings, from its columns in bowling order.
+
+    runs is the total (bat + extras) of each ball and legal is 1 for balls that count towards the over.
+    Returns manhattan (runs per over), worm (cumulative runs at the end of each over), run_rate
+    (cumulative runs per six legal balls) and, if wickets is given, wickets per over.
+    """
+    over_number = np.asarray(over_number, dtype=np.intp)
+    overs = int(over_number.max()) + 1 if over_number.size else 0
+
+    def per_over(values):
+        return np.bincount(over_number, weights=np.asarray(values, dtype=np.int64), minlength=overs).astype(np.int64)
+
+    manhattan = per_over(runs)
+    worm = np.cumsum(manhattan)
+    faced = np.cumsum(per_over(legal))
+    run_rate = np.round(np.divide(worm * 6, faced, out=np.zeros(overs), where=faced > 0), 2)
+    series = {'manhattan': manhattan.tolist(), 'worm': worm.tolist(), 'run_rate': run_rate.tolist()}
+    if wickets is not None:
+        series['wickets'] = per_over(wickets).tolist()
+    return series
+
+
+def innings_series(columns):
+    """over_series for every innings in exported columns, keyed by innings id."""
+    innings_id = np.asarray(columns['innings_id'])
+    if not innings_id.size:
+        return {}
+    legal_codes = [EXTRA_TYPE_CODES[label] for label in EXTRA_TYPE_LABELS if label not in ILLEGAL_EXTRA_TYPES]
+    runs = np.asarray(columns['runs_batter'], dtype=np.int64) + np.asarray(columns['extras'], dtype=np.int64)
+    legal = np.isin(np.asarray(columns['extra_type']), legal_codes)
+    over_number = np.asarray(columns['over_number'])
+    is_wicket = np.asarray(columns['is_wicket'])
+    # Exports are ordered by innings, so each innings is one contiguous run of rows
+    starts = np.flatnonzero(np.r_[True, innings_id[1:] != innings_id[:-1]])
+    ends = np.r_[starts[1:], innings_id.size]
+    return {
+        int(innings_id[start]): over_series(over_number[start:end], runs[start:end], legal[start:end],
+                                            is_wicket[start:end])
+        for start, end in zip(starts, ends)
+    }
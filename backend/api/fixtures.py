@@ -0,0 +1,151 @@
+import csv
+import io
+
+from django.db import transaction
+
+from .models import Team, Player, Match, Tournament
+from .response_cache import invalidate_lists
+
+FORMATS = {code for code, _ in Match.FORMAT_CHOICES}
+
+
+class FixtureError(Exception):
+    pass
+
+
+def squad(team_name, players):
+    """Checks a squad payload: a list of {'name': ..., 'is_captain': ...} entries."""
+    if not isinstance(players, list):
+        raise FixtureError(f"Players of {team_name} must be a list")
+    for number, player in enumerate(players, start=1):
+        if not isinstance(player, dict) or not str(player.get('name') or '').strip():
+            raise FixtureError(f"Player {number} of {team_name} needs a name")
+    return players
+
+
+def create_team(name, players):
+    players = squad(name, players)
+    team = Team.objects.create(name=name)
+    Player.objects.bulk_create([
+        Player(name=p['name'], team=team, is_captain=p.get('is_captain', False)) for p in players
+    ])
+    return team
+
+
+def resolve_team(data):
+    """A team payload either names a new squad or points at an existing team by id, reusing its players."""
+    if not data:
+        raise FixtureError("Team details are required")
+    if data.get('id') is not None:
+        team = Team.objects.filter(pk=data['id']).first()
+        if team is None:
+            raise FixtureError(f"Team {data['id']} does not exist")
+        return team
+    if not data.get('name'):
+        raise FixtureError("A new team needs a name")
+    return create_team(data['name'], data.get('players', []))
+
+
+def resolve_tournament(pk):
+    """The tournament a new match is scheduled in, None when the payload names none."""
+    if pk in (None, ''):
+        return None
+    tournament = Tournament.objects.filter(pk=pk).first() if str(pk).isdigit() else None
+    if tournament is None:
+        raise FixtureError(f"Tournament {pk} does not exist")
+    return tournament
+
+
+def _truthy(value):
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def parse_fixture_csv(text, name=None, format='T20', custom_overs=None, last_man_standing=False):
+    """Reads the CSV fixture layout into the JSON fixture structure.
+
+    Columns: team, player, is_captain, opponent. A row with a player adds them to the team's squad,
+    a row with an opponent schedules team vs opponent. Tournament-wide settings come from the arguments.
+    """
+    try:
+        custom_overs = int(custom_overs) if custom_overs not in (None, '') else None
+    except ValueError:
+        raise FixtureError("custom_overs must be a number")
+    teams = {}
+    matches = []
+    for line, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        team = (row.get('team') or '').strip()
+        if not team:
+            raise FixtureError(f"Line {line}: team is required")
+        squad = teams.setdefault(team, {'name': team, 'players': []})
+        if (row.get('player') or '').strip():
+            squad['players'].append({
+                'name': row['player'].strip(),
+                'is_captain': _truthy(row.get('is_captain')),
+            })
+        if (row.get('opponent') or '').strip():
+            matches.append({'team_a': team, 'team_b': row['opponent'].strip()})
+    return {
+        'name': name,
+        'format': format,
+        'custom_overs': custom_overs,
+        'last_man_standing': _truthy(last_man_standing),
+        'teams': list(teams.values()),
+        'matches': matches,
+    }
+
+
+@transaction.atomic
+def import_fixture(data):
+    """Creates a tournament with its squads and matches in one transaction, a handful of bulk inserts."""
+    if not isinstance(data, dict):
+        raise FixtureError("A fixture must be a JSON object")
+    fmt = data.get('format', 'T20')
+    if fmt not in FORMATS:
+        raise FixtureError(f"Unknown format {fmt}")
+
+    teams = {}
+    new_squads = []
+    for entry in data.get('teams', []):
+        name = entry.get('name')
+        if entry.get('id') is not None:
+            team = Team.objects.filter(pk=entry['id']).first()
+            if team is None:
+                raise FixtureError(f"Team {entry['id']} does not exist")
+            teams[name or team.name] = team
+            continue
+        if not name:
+            raise FixtureError("Every team needs a name")
+        if name in teams:
+            raise FixtureError(f"Team {name} is listed twice")
+        teams[name] = Team(name=name)
+        new_squads.append((teams[name], squad(name, entry.get('players', []))))
+
+    Team.objects.bulk_create([team for team, _ in new_squads])
+    Player.objects.bulk_create([
+        Player(name=p['name'], team=team, is_captain=p.get('is_captain', False))
+        for team, players in new_squads for p in players
+    ])
+
+    tournament = Tournament.objects.create(name=data.get('name') or 'Tournament')
+    matches = []
+    for entry in data.get('matches', []):
+        name_a, name_b = entry.get('team_a'), entry.get('team_b')
+        if name_a not in teams or name_b not in teams:
+            raise FixtureError(f"Match {name_a} vs {name_b} refers to a team that is not in the fixture")
+        if name_a == name_b:
+            raise FixtureError(f"{name_a} cannot play itself")
+        if entry.get('format', fmt) not in FORMATS:
+            raise FixtureError(f"Unknown format {entry['format']}")
+        matches.append(Match(
+            tournament=tournament,
+            format=entry.get('format', fmt),
+            custom_overs=entry.get('custom_overs', data.get('custom_overs')),
+            last_man_standing=entry.get('last_man_standing', data.get('last_man_standing', False)),
+            team_a=teams[name_a],
+            team_b=teams[name_b],
+            status='SETUP',
+        ))
+    Match.objects.bulk_create(matches)
+    # bulk_create sends no signals
+    transaction.on_commit(invalidate_lists)
+    return tournament
@@ -0,0 +1,83 @@
+from .models import Delivery, InningsEvent, InningsSnapshot
+from .scorecard import ILLEGAL_EXTRA_TYPES
+
+# What the event log keeps of a ball, enough to record it again on redo
+BALL_FIELDS = ('over_number', 'ball_number', 'batsman_id', 'non_striker_id', 'bowler_id', 'runs_batter', 'extras',
+               'extra_type', 'is_wicket', 'wicket_type', 'player_out_id', 'catcher_id', 'client_seq')
+STATE_FIELDS = ('legal_balls', 'total_runs', 'total_wickets', 'last_bowler_id')
+
+
+def ball_payload(delivery):
+    return {field: getattr(delivery, field) for field in BALL_FIELDS}
+
+
+def log_event(innings, kind, delivery):
+    return InningsEvent.objects.create(innings=innings, kind=kind, payload=ball_payload(delivery))
+
+
+def log_undone(innings, deliveries):
+    # One UNDO per ball, in the order they are undone (latest ball first)
+    InningsEvent.objects.bulk_create([
+        InningsEvent(innings=innings, kind='UNDO', payload=ball_payload(d)) for d in deliveries
+    ])
+
+
+def empty_state():
+    return {'legal_balls': 0, 'total_runs': 0, 'total_wickets': 0, 'last_bowler_id': None}
+
+
+def replay(state, delivery):
+    state['total_runs'] += delivery.runs_batter + delivery.extras
+    if delivery.is_wicket:
+        state['total_wickets'] += 1
+    if delivery.extra_type not in ILLEGAL_EXTRA_TYPES:
+        state['legal_balls'] += 1
+        state['last_bowler_id'] = delivery.bowler_id
+    return state
+
+
+def take_snapshot(innings, delivery):
+    InningsSnapshot.objects.create(
+        innings=innings, last_delivery=delivery, **{field: getattr(innings, field) for field in STATE_FIELDS}
+    )
+
+
+def restore_state(innings):
+    """Sets the innings counters from its latest snapshot and the balls bowled after it.
+
+    Snapshots are taken at the end of every over, so this is two queries and at most an over of balls
+    to replay, however long the innings is.
+    """
+    snapshot = innings.snapshots.order_by('-legal_balls').first()
+    state = {field: getattr(snapshot, field) for field in STATE_FIELDS} if snapshot else empty_state()
+    since = snapshot.last_delivery_id if snapshot else 0
+    for delivery in Delivery.objects.filter(innings=innings, id__gt=since).order_by('id'):
+        replay(state, delivery)
+    for field, value in state.items():
+        setattr(innings, field, value)
+
+
+def build_snapshots(deliveries, balls_per_over):
+    """Snapshot field dicts for deliveries in the order they were bowled."""
+    state = empty_state()
+    snapshots = []
+    for delivery in deliveries:
+        replay(state, delivery)
+        if delivery.extra_type not in ILLEGAL_EXTRA_TYPES and state['legal_balls'] % balls_per_over == 0:
+            snapshots.append({'last_delivery_id': delivery.id, **state})
+    return snapshots
+
+
+def next_redo(innings):
+    """The most recent UNDO that has not been redone, or None. Bowling a new ball clears the redo stack."""
+    redone = 0
+    for event in innings.events.order_by('-id').iterator():
+        if event.kind == 'BALL':
+            return None
+        if event.kind == 'REDO':
+            redone += 1
+        elif redone:
+            redone -= 1
+        else:
+            return event
+    return None
@@ -0,0 +1,246 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+# Opt-in request instrumentation: wall time, DB queries and DB time, response size and timing spans inside
+# the scoring path, per view. Exposed in Prometheus text format at /api/metrics and as one JSON log line per
+# request; requests slower than SLOW_REQUEST_MS also log their SQL. When disabled the middleware removes
+# itself and span() returns a shared no-op context manager, so the cost is one ContextVar lookup per span.
+# Metrics are kept per process, Prometheus sums them across workers.
+
+logger = logging.getLogger('api.requests')
+
+DEFAULTS = {'ENABLED': False, 'SLOW_REQUEST_MS': 500, 'MAX_RECORDED_QUERIES': 200}
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRIC_PREFIX = 'sbfc_'
+
+_current = ContextVar('request_metrics', default=None)
+_NO_SPAN = nullcontext()
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetrics:
+    def __init__(self, max_recorded_queries):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.sql = []
+        self.spans = {}
+        self.max_recorded_queries = max_recorded_queries
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_seconds += elapsed
+            if len(self.sql) < self.max_recorded_queries:
+                self.sql.append((sql, round(elapsed * 1000, 3)))
+
+
+class Span:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.metrics.spans[self.name] = self.metrics.spans.get(self.name, 0.0) + elapsed
+        registry.observe_span(self.name, elapsed)
+
+
+def span(name):
+    """Times a block as part of the current request, e.g. `with span('awards'):`. No-op when not instrumented."""
+    metrics = _current.get()
+    if metrics is None:
+        return _NO_SPAN
+    return Span(metrics, name)
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (view, method, status) -> count
+            self.requests = {}
+            # view -> [bucket counts..., sum, count], and the per-view totals
+            self.durations = {}
+            self.queries = {}
+            self.db_seconds = {}
+            self.response_bytes = {}
+            # span -> [sum, count]
+            self.spans = {}
+
+    def observe_request(self, view, method, status, seconds, metrics, size):
+        with self._lock:
+            key = (view, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.durations.setdefault(view, [0] * (len(DURATION_BUCKETS) + 1) + [0.0])
+            histogram[bisect_left(DURATION_BUCKETS, seconds)] += 1
+            histogram[-1] += seconds
+            self.queries[view] = self.queries.get(view, 0) + metrics.queries
+            self.db_seconds[view] = self.db_seconds.get(view, 0.0) + metrics.db_seconds
+            self.response_bytes[view] = self.response_bytes.get(view, 0) + size
+
+    def observe_span(self, name, seconds):
+        with self._lock:
+            totals = self.spans.setdefault(name, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+
+    def render(self):
+        """Prometheus text exposition format, version 0.0.4."""
+        p = METRIC_PREFIX
+        lines = []
+        with self._lock:
+            lines += [f'# HELP {p}http_requests_total Requests by view, method and status.',
+                      f'# TYPE {p}http_requests_total counter']
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'{p}http_requests_total{_labels(view=view, method=method, status=status)} {count}')
+
+            lines += [f'# HELP {p}http_request_duration_seconds Wall time per request.',
+                      f'# TYPE {p}http_request_duration_seconds histogram']
+            for view, histogram in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, count in zip((*DURATION_BUCKETS, '+Inf'), histogram[:-1]):
+                    cumulative += count
+                    lines.append(f'{p}http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {cumulative}')
+                lines.append(f'{p}http_request_duration_seconds_sum{_labels(view=view)} {histogram[-1]:.6f}')
+                lines.append(f'{p}http_request_duration_seconds_count{_labels(view=view)} {cumulative}')
+
+            for name, help_text, values in (
+                ('http_db_queries_total', 'Database queries run by requests.', self.queries),
+                ('http_db_seconds_total', 'Time spent in the database by requests.', self.db_seconds),
+                ('http_response_bytes_total', 'Response body bytes, streaming responses excluded.',
+                 self.response_bytes),
+            ):
+                lines += [f'# HELP {p}{name} {help_text}', f'# TYPE {p}{name} counter']
+                for view, value in sorted(values.items()):
+                    lines.append(f'{p}{name}{_labels(view=view)} {round(value, 6)}')
+
+            lines += [f'# HELP {p}span_duration_seconds Time spent in named sections of the scoring path.',
+                      f'# TYPE {p}span_duration_seconds summary']
+            for name, (total, count) in sorted(self.spans.items()):
+                lines.append(f'{p}span_duration_seconds_sum{_labels(span=name)} {total:.6f}')
+                lines.append(f'{p}span_duration_seconds_count{_labels(span=name)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def _instrument(connection, **kwargs):
+    # Installed on every connection rather than per request: under ASGI the ORM runs on other threads than
+    # the middleware, and the request's metrics reach them through the ContextVar
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _instrument_connections(**kwargs):
+    # request_started is sent on the thread that runs the request's sync code, the ASGI handler's too
+    for connection in connections.all(initialized_only=True):
+        _instrument(connection)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        options = config()
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = options['SLOW_REQUEST_MS'] / 1000
+        self.max_recorded_queries = options['MAX_RECORDED_QUERIES']
+        connection_created.connect(_instrument)
+        request_started.connect(_instrument_connections)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics(self.max_recorded_queries)
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(self.max_recorded_queries)
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.observe(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, metrics, elapsed):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+        registry.observe_request(view, request.method, response.status_code, elapsed, metrics, size)
+
+        record = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(elapsed * 1000, 3),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_seconds * 1000, 3),
+            'bytes': size,
+            'spans': {name: round(seconds * 1000, 3) for name, seconds in metrics.spans.items()},
+        }
+        if elapsed >= self.slow_seconds:
+            record['sql'] = metrics.sql
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
+
+
+def metrics_view(request):
+    if not config()['ENABLED']:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
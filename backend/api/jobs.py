@@ -0,0 +1,224 @@
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Min, Q
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+# Background jobs: work that does not have to finish inside the scorer's request, like awards and the stats
+# rollups once a match completes. Jobs are rows of the Job table written in the caller's transaction, so
+# they exist exactly when the write that caused them commits, and no broker is needed. Enqueueing with a
+# key that is already queued or done is a no-op. The queue backend (settings.BACKGROUND_JOBS) decides
+# where they run:
+#   ThreadPoolQueue  worker threads of the web process, woken when the enqueueing transaction commits
+#   DatabaseQueue    only stored; `manage.py run_jobs` runs them in a process of its own
+#   ImmediateQueue   inline at enqueue, inside the caller's transaction (tests, scripts)
+# A failing job is retried with exponential backoff until max_attempts, then left FAILED with its error.
+# Tasks run later than the write that queued them, so they re-check the state they act on.
+
+logger = logging.getLogger('api.jobs')
+
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2
+# How long a worker holds a RUNNING job before another worker may take it over
+LEASE_SECONDS = 300
+
+_tasks = {}
+
+
+def task(name, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Registers a function as the job `name`; it is called with the job's payload as keyword arguments."""
+    def decorator(func):
+        _tasks[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def _start(job, now):
+    job.status = 'RUNNING'
+    job.attempts += 1
+    job.locked_until = now + timedelta(seconds=LEASE_SECONDS)
+    job.save(update_fields=['status', 'attempts', 'locked_until'])
+    return job
+
+
+def claim(now):
+    """Takes the oldest due job for this worker, or returns None."""
+    with transaction.atomic():
+        job = (Job.objects.select_for_update(skip_locked=True)
+               .filter(Q(status='PENDING', run_after__lte=now) | Q(status='RUNNING', locked_until__lt=now))
+               .order_by('id').first())
+        return _start(job, now) if job is not None else None
+
+
+def run_job(job):
+    """Runs a claimed job in a savepoint and records the outcome: DONE, PENDING for a retry, or FAILED."""
+    try:
+        if job.name not in _tasks:
+            raise LookupError(f"No task registered as {job.name!r}")
+        func = _tasks[job.name][0]
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'FAILED'
+            logger.error("Job %s %s failed after %d attempts", job.id, job.name, job.attempts)
+        else:
+            job.status = 'PENDING'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+            logger.warning("Job %s %s failed, attempt %d of %d", job.id, job.name, job.attempts, job.max_attempts)
+    else:
+        job.status = 'DONE'
+        job.finished_at = timezone.now()
+    job.locked_until = None
+    job.save(update_fields=['status', 'run_after', 'locked_until', 'last_error', 'finished_at'])
+    return job
+
+
+def run_due(now=None):
+    """Runs due jobs until none is left. Returns how many ran."""
+    count = 0
+    while (job := claim(now or timezone.now())) is not None:
+        run_job(job)
+        count += 1
+    return count
+
+
+def next_due():
+    return Job.objects.filter(status='PENDING').aggregate(at=Min('run_after'))['at']
+
+
+def purge(days):
+    """Deletes jobs that finished more than `days` ago. Failed jobs are kept for inspection."""
+    return Job.objects.filter(status='DONE', finished_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
+
+
+class DatabaseQueue:
+    """Stores jobs for `manage.py run_jobs`."""
+
+    def __init__(self, **options):
+        pass
+
+    def enqueue(self, name, payload, key=None, delay=0):
+        max_attempts = _tasks[name][1] if name in _tasks else DEFAULT_MAX_ATTEMPTS
+        fields = {'name': name, 'payload': payload, 'max_attempts': max_attempts,
+                  'run_after': timezone.now() + timedelta(seconds=delay)}
+        if key is None:
+            job, created = Job.objects.create(**fields), True
+        else:
+            job, created = Job.objects.get_or_create(key=key, defaults=fields)
+        if created:
+            self.dispatch(job)
+        return job
+
+    def dispatch(self, job):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class ImmediateQueue(DatabaseQueue):
+    """Runs each job as it is enqueued. A failed job stays queued for `manage.py run_jobs` to retry."""
+
+    def dispatch(self, job):
+        if job.run_after <= timezone.now():
+            run_job(_start(job, timezone.now()))
+
+
+class ThreadPoolQueue(DatabaseQueue):
+    """Runs jobs on worker threads of this process once the transaction that enqueued them commits.
+
+    Jobs left behind by a process that stopped are picked up by the next wake-up, or by `run_jobs`.
+    """
+
+    def __init__(self, workers=2, **options):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='jobs')
+        self._timer = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def dispatch(self, job):
+        transaction.on_commit(self.wake)
+
+    def wake(self):
+        with self._lock:
+            if not self._closed:
+                self.executor.submit(self.drain)
+
+    def drain(self):
+        close_old_connections()
+        try:
+            run_due()
+            due = next_due()
+        finally:
+            # Workers may idle for a long time between matches, so they do not hold on to a connection
+            connection.close()
+        if due is not None:
+            self.wake_at(due)
+
+    def wake_at(self, when):
+        # One timer for the earliest retry; a drain before then finds nothing due and sets it again
+        delay = max(0.0, (when - timezone.now()).total_seconds())
+        with self._lock:
+            if self._closed:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self.wake)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def shutdown(self):
+        # Waits for the drains already submitted; retries that are not due yet stay queued for `run_jobs`
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+        self.executor.shutdown(wait=True)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                config = getattr(settings, 'BACKGROUND_JOBS', {})
+                backend = import_string(config.get('BACKEND', 'api.jobs.ThreadPoolQueue'))
+                _queue = backend(**config.get('OPTIONS', {}))
+    return _queue
+
+
+@receiver(setting_changed)
+def reset_queue(setting, **kwargs):
+    global _queue
+    if setting == 'BACKGROUND_JOBS':
+        _queue = None
+
+
+def shutdown_queue():
+    """Lets the queue finish the jobs it is running and stops it, for commands that drop the database."""
+    global _queue
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is not None:
+        queue.shutdown()
+
+
+def enqueue(name, payload, key=None, delay=0):
+    """Queues the task `name` with keyword arguments `payload`, in the caller's transaction."""
+    return get_queue().enqueue(name, payload, key=key, delay=delay)
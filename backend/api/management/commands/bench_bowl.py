@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Match, Team, Player
+from api.scoring import BALLS_PER_OVER, lock_match, start_innings, record_delivery
+
+
+class Command(BaseCommand):
+    help = "Measure per-ball scoring latency and query count from the first to the last ball of a long innings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--balls', type=int, default=600)
+        parser.add_argument('--bucket', type=int, default=60, help="Report one row per this many balls")
+
+    def handle(self, *args, **options):
+        balls = options['balls']
+        bucket = options['bucket']
+        timings = []
+        query_counts = []
+
+        # Everything happens inside a transaction that is rolled back, so the benchmark leaves no data behind
+        with transaction.atomic():
+            team_a = Team.objects.create(name='Bench A')
+            team_b = Team.objects.create(name='Bench B')
+            batters = [Player.objects.create(name=f'A{i}', team=team_a) for i in range(11)]
+            bowlers = [Player.objects.create(name=f'B{i}', team=team_b) for i in range(11)]
+            match = Match.objects.create(
+                format='T20',
+                custom_overs=-(-balls // BALLS_PER_OVER) + 1,
+                team_a=team_a,
+                team_b=team_b,
+                status='LIVE',
+            )
+            start_innings(match, 1, team_a.id, team_b.id)
+
+            for n in range(balls):
+                over, ball = divmod(n, BALLS_PER_OVER)
+                data = {
+                    'over_number': over,
+                    'ball_number': ball + 1,
+                    'batsman_id': batters[0].id,
+                    'non_striker_id': batters[1].id,
+                    'bowler_id': bowlers[over % 2].id,
+                    'runs_batter': n % 4,
+                }
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    # Same reads the bowl action does before scoring
+                    current = lock_match(match.pk)
+                    innings = current.innings.order_by('-innings_number').first()
+                    record_delivery(current, innings, data)
+                    timings.append((time.perf_counter() - started) * 1000)
+                query_counts.append(len(ctx.captured_queries))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'balls':>11} {'mean ms':>9} {'p95 ms':>9} {'queries':>8}")
+        for start in range(0, balls, bucket):
+            window = timings[start:start + bucket]
+            queries = query_counts[start:start + bucket]
+            p95 = sorted(window)[max(0, int(len(window) * 0.95) - 1)]
+            self.stdout.write(
+                f"{start + 1:>5}-{start + len(window):<5} {statistics.mean(window):>9.3f} {p95:>9.3f} {max(queries):>8}"
+            )
+        first = statistics.mean(timings[:bucket])
+        last = statistics.mean(timings[-bucket:])
+        self.stdout.write(f"last/first bucket latency ratio: {last / first:.2f}")
@@ -0,0 +1,163 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.models import Match
+from api.simulator import run_load
+
+# How each deployment is started: the WSGI one with gunicorn's sync workers, the ASGI one with uvicorn and
+# the async match views (settings.ASYNC_API)
+SERVERS = {
+    'wsgi': ('gunicorn', ['cricket_backend.wsgi:application', '--worker-class', 'sync', '--workers', '{workers}',
+                          '--bind', '127.0.0.1:{port}', '--log-level', 'warning'], 'false'),
+    'asgi': ('uvicorn', ['cricket_backend.asgi:application', '--workers', '{workers}', '--host', '127.0.0.1',
+                         '--port', '{port}', '--log-level', 'warning'], 'true'),
+}
+STARTUP_TIMEOUT = 30
+REPORT_COLUMNS = ('requests', 'rps', 'p50_ms', 'p99_ms', 'errors')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def database_url(settings_dict):
+    # The servers run in their own processes and find the benchmark database through DATABASE_URL
+    engine = settings_dict['ENGINE']
+    if engine == 'django.db.backends.sqlite3':
+        return f"sqlite:///{settings_dict['NAME']}"
+    if engine == 'django.db.backends.postgresql':
+        credentials = quote(settings_dict['USER'] or '') + ':' + quote(settings_dict['PASSWORD'] or '')
+        host = f"{settings_dict['HOST'] or 'localhost'}:{settings_dict['PORT'] or 5432}"
+        return f"postgres://{credentials}@{host}/{quote(settings_dict['NAME'])}"
+    raise CommandError(f"bench_servers supports SQLite and PostgreSQL, not {engine}")
+
+
+async def get(port, path):
+    # One connection per request: gunicorn's sync workers do not keep connections alive anyway
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: application/json\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]) if response else None
+
+
+async def drive(port, paths, concurrency, seconds):
+    """Keeps `concurrency` requests in flight for `seconds`; returns (latencies in ms, errors)."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(index):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                status = await get(port, path)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = ("Compare requests per second on the match read endpoints under WSGI (gunicorn, sync workers) and "
+            "ASGI (uvicorn, async views) at high concurrency. Runs against a throwaway test database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', action='append', choices=sorted(SERVERS),
+                            help="Repeat to pick servers; both by default")
+        parser.add_argument('--workers', type=int, default=4, help="Server processes, the same for both")
+        parser.add_argument('--concurrency', type=int, default=200, help="Requests in flight")
+        parser.add_argument('--seconds', type=float, default=15)
+        parser.add_argument('--matches', type=int, default=4, help="Simulated matches to read")
+
+    def handle(self, *args, **options):
+        servers = options['server'] or sorted(SERVERS)
+        for server in servers:
+            package = SERVERS[server][0]
+            if importlib.util.find_spec(package) is None:
+                raise CommandError(f"The {server} benchmark needs the '{package}' package")
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            run_load(matches=options['matches'], spectators=0)
+            paths = ['/api/matches/']
+            for match_id in Match.objects.values_list('id', flat=True):
+                paths += [f'/api/matches/{match_id}/', f'/api/matches/{match_id}/live/',
+                          f'/api/matches/{match_id}/scorecard/']
+            url = database_url(connection.settings_dict)
+            # The servers get their own connections
+            connection.close()
+            results = {server: self.bench(server, url, paths, options) for server in servers}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{options['workers']} workers, {options['concurrency']} concurrent requests, "
+                          f"{options['seconds']}s per server, {len(paths)} URLs")
+        self.stdout.write(f"{'server':<8}" + ''.join(f"{column:>12}" for column in REPORT_COLUMNS))
+        for server, row in results.items():
+            self.stdout.write(f"{server:<8}" + ''.join(f"{row[column]:>12}" for column in REPORT_COLUMNS))
+
+    def bench(self, server, url, paths, options):
+        package, arguments, async_api = SERVERS[server]
+        port = free_port()
+        command = [sys.executable, '-m', package,
+                   *(argument.format(workers=options['workers'], port=port) for argument in arguments)]
+        env = {**os.environ, 'DATABASE_URL': url, 'ASYNC_API': async_api}
+        env.pop('DATABASE_REPLICA_URLS', None)
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stderr=log)
+            try:
+                self.wait_until_ready(process, port, log)
+                latencies, errors = asyncio.run(drive(port, paths, options['concurrency'], options['seconds']))
+            finally:
+                process.terminate()
+                process.wait()
+
+        latencies.sort()
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2) if latencies else None
+        return {'requests': len(latencies), 'rps': round(len(latencies) / options['seconds'], 1),
+                'p50_ms': pct(0.50), 'p99_ms': pct(0.99), 'errors': errors}
+
+    def wait_until_ready(self, process, port, log):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                log.seek(0)
+                raise CommandError(f"The server exited: {log.read().decode(errors='replace')}")
+            try:
+                if asyncio.run(get(port, '/api/matches/')) == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"The server did not answer within {STARTUP_TIMEOUT}s")
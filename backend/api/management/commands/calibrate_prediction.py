@@ -0,0 +1,92 @@
+import json
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import BallPrediction, Delivery, Innings
+from api.prediction import Calibration, PredictionModel, brier_score, get_model, replay
+from api.scoring import BALLS_PER_OVER, lock_match, max_overs, wickets_limit
+
+REPLAY_FIELDS = ('id', 'runs_batter', 'extras', 'extra_type', 'is_wicket')
+
+
+def replay_innings(innings_list):
+    """Yields (innings, [(delivery id, State), ...]) for every innings, reading the deliveries in one pass."""
+    by_id = {innings.id: innings for innings in innings_list}
+    deliveries = (Delivery.objects.filter(innings_id__in=by_id)
+                  .order_by('innings_id', 'over_number', 'ball_number', 'id')
+                  .values_list('innings_id', *REPLAY_FIELDS).iterator(chunk_size=5000))
+    for innings_id, rows in groupby(deliveries, key=lambda row: row[0]):
+        innings = by_id[innings_id]
+        match = innings.match
+        yield innings, list(replay((row[1:] for row in rows), wickets_limit(match, innings),
+                                   max_overs(match) * BALLS_PER_OVER, innings.target))
+
+
+def outcome(innings):
+    if innings.match.result == 'TIE':
+        return 0.5
+    return 1.0 if innings.match.winner_id == innings.batting_team_id else 0.0
+
+
+class Command(BaseCommand):
+    help = ("Fit the projected score and win probability table to the deliveries of completed limited-overs "
+            "matches, and optionally recompute the stored per-ball predictions with it")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.PREDICTION_MODEL_PATH,
+                            help="Where to write the fitted table (PREDICTION_MODEL_PATH by default)")
+        parser.add_argument('--rebuild', action='store_true', help="Recompute the per-ball predictions")
+
+    def handle(self, *args, **options):
+        completed = list(Innings.objects.filter(match__format='T20', match__status='COMPLETED', is_completed=True)
+                         .select_related('match').order_by('id'))
+        prior = PredictionModel.prior()
+        calibration = Calibration(prior)
+        for innings, states in replay_innings(completed):
+            for _, state in states:
+                calibration.add(state, innings.total_runs)
+        if not calibration.observations:
+            raise CommandError("No completed limited-overs matches to calibrate from")
+        model = calibration.model()
+
+        def outcomes():
+            for innings, states in replay_innings(completed):
+                won = outcome(innings)
+                for _, state in states:
+                    yield state, won
+
+        self.stdout.write(f"{calibration.observations} balls from {len(completed)} innings")
+        self.stdout.write(f"Win probability Brier score: prior {brier_score(prior, outcomes())}, "
+                          f"fitted {brier_score(model, outcomes())}")
+        with open(options['output'], 'w') as fileobj:
+            json.dump(model.to_json(), fileobj)
+        get_model.cache_clear()
+        self.stdout.write(self.style.SUCCESS(f"Model written to {options['output']}"))
+
+        if options['rebuild']:
+            count = self.rebuild(model)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt per-ball predictions for {count} innings"))
+
+    def rebuild(self, model):
+        innings_list = list(Innings.objects.filter(match__format='T20').select_related('match').order_by('id'))
+        count = 0
+        for innings, states in replay_innings(innings_list):
+            with transaction.atomic():
+                # Not while a ball of the same match is being scored
+                lock_match(innings.match_id)
+                BallPrediction.objects.filter(innings=innings).delete()
+                predictions = []
+                for delivery_id, state in states:
+                    projected, probability = model.predict(state)
+                    predictions.append(BallPrediction(
+                        innings=innings, delivery_id=delivery_id, legal_balls=state.legal_balls,
+                        total_runs=state.runs, total_wickets=state.wickets, recent_run_rate=state.recent_run_rate,
+                        projected_score=projected, win_probability=probability,
+                    ))
+                BallPrediction.objects.bulk_create(predictions, batch_size=1000)
+                Innings.objects.filter(pk=innings.pk).update(recent_run_rate=states[-1][1].recent_run_rate)
+            count += 1
+        return count
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.awards import compute_awards
+from api.models import Match
+
+
+class Command(BaseCommand):
+    help = "(Re)compute best batsman, best bowler and man of the match for completed matches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_ids', nargs='*', type=int, help="Matches to recompute; all completed matches if omitted")
+
+    def handle(self, *args, **options):
+        matches = Match.objects.filter(status='COMPLETED').order_by('id')
+        if options['match_ids']:
+            matches = matches.filter(id__in=options['match_ids'])
+            missing = set(options['match_ids']) - set(matches.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"Not completed or not found: {', '.join(map(str, sorted(missing)))}")
+
+        count = 0
+        for match in matches.iterator():
+            with transaction.atomic():
+                compute_awards(match)
+                match.save(update_fields=['best_batsman', 'best_bowler', 'man_of_match'])
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Computed awards for {count} matches"))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORT_CHUNK_SIZE, WRITERS, ExportError, export_deliveries
+from api.models import Delivery
+
+
+class Command(BaseCommand):
+    help = "Export deliveries to a columnar file (npz, or parquet with pyarrow installed) in bounded memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--type', dest='file_type', choices=sorted(WRITERS), help="Defaults to the file extension")
+        parser.add_argument('--match', type=int, help="Only this match")
+        parser.add_argument('--tournament', type=int, help="Only matches of this tournament")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_type = options['file_type'] or path.rsplit('.', 1)[-1]
+        deliveries = Delivery.objects.all()
+        if options['match']:
+            deliveries = deliveries.filter(innings__match_id=options['match'])
+        if options['tournament']:
+            deliveries = deliveries.filter(innings__match__tournament_id=options['tournament'])
+
+        started = time.perf_counter()
+        try:
+            with open(path, 'wb') as fileobj:
+                export_deliveries(deliveries, fileobj, file_type, options['chunk_size'])
+        except (ExportError, ImproperlyConfigured) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Exported to {path} in {time.perf_counter() - started:.2f}s"))
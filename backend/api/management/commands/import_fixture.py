@@ -0,0 +1,43 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.fixtures import FixtureError, import_fixture, parse_fixture_csv
+
+
+class Command(BaseCommand):
+    help = "Create a tournament with its squads and matches from a JSON or CSV fixture file, in one transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--name', help="Tournament name (CSV fixtures)")
+        parser.add_argument('--format', default='T20', help="Match format (CSV fixtures)")
+        parser.add_argument('--overs', type=int, help="Overs per innings (CSV fixtures)")
+        parser.add_argument('--last-man-standing', action='store_true', help="(CSV fixtures)")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        try:
+            text = path.read_text(encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        try:
+            if path.suffix.lower() == '.csv':
+                data = parse_fixture_csv(
+                    text,
+                    name=options['name'] or path.stem,
+                    format=options['format'],
+                    custom_overs=options['overs'],
+                    last_man_standing=options['last_man_standing'],
+                )
+            else:
+                data = json.loads(text)
+            tournament = import_fixture(data)
+        except (FixtureError, ValueError) as e:
+            raise CommandError(f"Invalid fixture: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created tournament {tournament.id} ({tournament.name}) with {tournament.matches.count()} matches"
+        ))
@@ -0,0 +1,67 @@
+import asyncio
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Simulate many spectators on one match and measure how long each scoring event takes to reach all of them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=10000)
+        parser.add_argument('--events', type=int, default=120)
+        parser.add_argument('--interval', type=float, default=0.1, help="Seconds between published events")
+        parser.add_argument('--backend', default='api.broadcast.InProcessBroadcaster')
+        parser.add_argument('--redis-url', help="Passed to the backend, e.g. a local redis-server for RedisBroadcaster")
+
+    def handle(self, *args, **options):
+        options_for_backend = {'url': options['redis_url']} if options['redis_url'] else {}
+        broadcaster = import_string(options['backend'])(**options_for_backend)
+        latencies = asyncio.run(self.run(broadcaster, options['subscribers'], options['events'], options['interval']))
+
+        latencies.sort()
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        self.stdout.write(f"subscribers: {options['subscribers']}, events: {len(latencies)}")
+        self.stdout.write(
+            f"fan-out ms  mean {statistics.mean(latencies):.2f}  p50 {pct(0.50):.2f}  "
+            f"p95 {pct(0.95):.2f}  p99 {pct(0.99):.2f}  max {latencies[-1]:.2f}"
+        )
+        deliveries = options['subscribers'] * len(latencies)
+        self.stdout.write(f"deliveries: {deliveries}, serializations: {len(latencies)}")
+
+    async def run(self, broadcaster, subscribers, events, interval):
+        match_id = 1
+        subscriptions = [broadcaster.subscribe(match_id) for _ in range(subscribers)]
+        remaining = {}
+        done = {}
+        published_at = {}
+
+        async def spectator(subscription):
+            # Events arrive in publish order, so the n-th payload is event n; like the SSE view,
+            # spectators pass the encoded payload through without decoding it
+            for seq in range(events):
+                await subscription.get()
+                remaining[seq] -= 1
+                if remaining[seq] == 0:
+                    done[seq] = time.perf_counter()
+
+        def scorer():
+            # Publishing happens from a worker thread, like a sync view committing a ball
+            for seq in range(events):
+                remaining[seq] = subscribers
+                published_at[seq] = time.perf_counter()
+                broadcaster.publish(match_id, {'seq': seq})
+                time.sleep(interval)
+
+        tasks = [asyncio.create_task(spectator(s)) for s in subscriptions]
+        thread = threading.Thread(target=scorer)
+        thread.start()
+        await asyncio.gather(*tasks)
+        thread.join()
+        for subscription in subscriptions:
+            broadcaster.unsubscribe(subscription)
+        return [(done[seq] - published_at[seq]) * 1000 for seq in range(events)]
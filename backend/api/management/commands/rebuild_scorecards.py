@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Innings
+from api.response_cache import invalidate_match
+from api.scorecard import rebuild_innings
+
+
+class Command(BaseCommand):
+    help = "Recompute the batting and bowling scorecard lines from the recorded deliveries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--match', type=int, help="Only rebuild this match")
+
+    def handle(self, *args, **options):
+        innings_qs = Innings.objects.order_by('id')
+        if options['match']:
+            innings_qs = innings_qs.filter(match_id=options['match'])
+        count = 0
+        for innings in innings_qs.iterator():
+            with transaction.atomic():
+                rebuild_innings(innings)
+            invalidate_match(innings.match_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt scorecards for {count} innings"))
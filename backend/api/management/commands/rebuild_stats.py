@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the player and team statistics rollups from every completed match"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            players, teams = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {players} player and {teams} team stats rows"))
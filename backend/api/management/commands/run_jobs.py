@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import purge, run_due
+
+
+class Command(BaseCommand):
+    help = ("Run queued background jobs (awards, stats rollups, chart warming). A worker for "
+            "BACKGROUND_JOBS_BACKEND=api.jobs.DatabaseQueue, and a sweep for jobs a web process left behind")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the jobs that are due and exit")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds between looks at the queue")
+        parser.add_argument('--purge-days', type=int, default=None,
+                            help="Also delete jobs that finished more than this many days ago")
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write(f"Purged {purge(options['purge_days'])} finished jobs")
+        if options['once']:
+            self.stdout.write(self.style.SUCCESS(f"Ran {run_due()} jobs"))
+            return
+        self.stdout.write(f"Running jobs every {options['poll']}s, Ctrl-C to stop")
+        try:
+            while True:
+                close_old_connections()
+                if run_due():
+                    continue
+                time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,108 @@
+import json
+import platform
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.jobs import shutdown_queue
+from api.simulator import SCENARIOS, run_load
+
+# Columns of the report; latency and size regressions are flagged against --compare
+REPORT_COLUMNS = ('requests', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_queries', 'max_queries', 'mean_bytes')
+
+
+class Command(BaseCommand):
+    help = ("Score simulated matches through the real endpoints while spectators poll, and report latency, "
+            "queries and payload size per endpoint. Runs against a throwaway test database. "
+            "load_baseline.json was recorded with the defaults: `simulate_load --compare load_baseline.json`")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, default=6)
+        parser.add_argument('--spectators', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help="Repeat to mix scenarios; all of them by default")
+        parser.add_argument('--players', type=int, default=11)
+        parser.add_argument('--poll-interval', type=float, default=0.0, help="Seconds between a spectator's polls")
+        parser.add_argument('--undo-rate', type=float, default=0.02)
+        parser.add_argument('--output', help="Write the results as a baseline JSON file")
+        parser.add_argument('--compare', help="Baseline JSON file to compare against, e.g. load_baseline.json")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p95 latency growth over the baseline, as a fraction")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        config = {key: options[key] for key in ('matches', 'spectators', 'seed', 'players', 'poll_interval',
+                                                'undo_rate')}
+        config['scenarios'] = options['scenario'] or sorted(SCENARIOS)
+
+        # The test environment allows the in-process client's host; the test database keeps the data out of
+        # the real one and is dropped afterwards
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        if connection.vendor == 'sqlite':
+            # Spectators poll without pause; in the default journal mode their reads hold off the scorers'
+            # writes until these time out as "database is locked". WAL lets both proceed.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+        try:
+            started = time.perf_counter()
+            recorder = run_load(
+                matches=config['matches'], spectators=config['spectators'], seed=config['seed'],
+                scenarios=config['scenarios'], players=config['players'],
+                poll_interval=config['poll_interval'], undo_rate=config['undo_rate'],
+            )
+            elapsed = time.perf_counter() - started
+        finally:
+            # Background jobs of the last balls (awards, stats) must not outlive the database they write to
+            shutdown_queue()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        results = {
+            'config': config,
+            'environment': {'python': platform.python_version(), 'database': connection.vendor},
+            'seconds': round(elapsed, 2),
+            'endpoints': recorder.summary(),
+        }
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as fileobj:
+                json.dump(results, fileobj, indent=2)
+            self.stdout.write(f"Baseline written to {options['output']}")
+        if options['compare']:
+            with open(options['compare']) as fileobj:
+                regressions = self.compare(json.load(fileobj), results, options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+
+    def report(self, results):
+        self.stdout.write(f"{results['config']['matches']} matches, {results['config']['spectators']} spectators, "
+                          f"{results['seconds']}s")
+        self.stdout.write(f"{'endpoint':<10}" + ''.join(f"{column:>13}" for column in REPORT_COLUMNS))
+        for endpoint, row in results['endpoints'].items():
+            self.stdout.write(f"{endpoint:<10}" + ''.join(f"{row[column]:>13}" for column in REPORT_COLUMNS))
+
+    def compare(self, baseline, results, tolerance):
+        if baseline.get('config') != results['config']:
+            self.stdout.write(self.style.WARNING("The baseline was recorded with a different configuration"))
+        regressions = []
+        for endpoint, row in results['endpoints'].items():
+            before = baseline.get('endpoints', {}).get(endpoint)
+            if before is None:
+                continue
+            # Query counts are deterministic for a given seed, latency gets some slack
+            if row['max_queries'] > before['max_queries']:
+                regressions.append(f"{endpoint}: max queries {before['max_queries']} -> {row['max_queries']}")
+            if row['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{endpoint}: p95 {before['p95_ms']}ms -> {row['p95_ms']}ms")
+            if row['mean_bytes'] > before['mean_bytes'] * (1 + tolerance):
+                regressions.append(f"{endpoint}: mean size {before['mean_bytes']} -> {row['mean_bytes']} bytes")
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+        return regressions
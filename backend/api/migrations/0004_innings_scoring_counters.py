@@ -0,0 +1,51 @@
+# Generated by Django 5.1.5 on 2026-10-17 15:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    Innings = apps.get_model('api', 'Innings')
+    Delivery = apps.get_model('api', 'Delivery')
+    Player = apps.get_model('api', 'Player')
+    for innings in Innings.objects.all():
+        legal = Delivery.objects.filter(innings=innings).exclude(extra_type__in=['WD', 'NB'])
+        last_legal = legal.order_by('-over_number', '-ball_number', '-id').first()
+        innings.legal_balls = legal.count()
+        innings.last_bowler_id = last_legal.bowler_id if last_legal else None
+        innings.batting_team_size = Player.objects.filter(team_id=innings.batting_team_id).count()
+        if innings.innings_number == 2:
+            first = Innings.objects.filter(match_id=innings.match_id, innings_number=1).first()
+            innings.target = first.total_runs + 1 if first else None
+        innings.save(update_fields=['legal_balls', 'last_bowler', 'batting_team_size', 'target'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_delivery_catcher'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='innings',
+            name='batting_team_size',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='innings',
+            name='last_bowler',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.player'),
+        ),
+        migrations.AddField(
+            model_name='innings',
+            name='legal_balls',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='innings',
+            name='target',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
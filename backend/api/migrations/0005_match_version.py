@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-17 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_innings_scoring_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='last_undo_version',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
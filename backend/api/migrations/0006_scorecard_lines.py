@@ -0,0 +1,118 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# A frozen copy of api.scorecard.build_lines at the time of this migration, so later changes to the
+# scorecard rules do not change what it does
+BALLS_PER_OVER = 6
+ILLEGAL_EXTRA_TYPES = ('WD', 'NB')
+
+
+def build_lines(deliveries):
+    batting = {}
+    bowling = {}
+    over_balls = {}
+    for d in deliveries:
+        for pid in (d.batsman_id, d.non_striker_id):
+            if pid is not None and pid not in batting:
+                batting[pid] = {'first_delivery_id': d.id, 'runs': 0, 'balls': 0, 'fours': 0, 'sixes': 0,
+                                'is_out': False, 'wicket_type': 'NONE', 'dismissed_by_id': None,
+                                'caught_by_id': None}
+        line = batting[d.batsman_id]
+        line['runs'] += d.runs_batter
+        line['balls'] += 0 if d.extra_type == 'WD' else 1
+        line['fours'] += 1 if d.runs_batter == 4 else 0
+        line['sixes'] += 1 if d.runs_batter == 6 else 0
+        bowler_wicket = d.is_wicket and d.wicket_type != 'RUN_OUT'
+        if d.is_wicket and d.player_out_id in batting:
+            batting[d.player_out_id].update({
+                'is_out': True,
+                'wicket_type': d.wicket_type,
+                'dismissed_by_id': d.bowler_id if bowler_wicket else None,
+                'caught_by_id': d.catcher_id,
+            })
+
+        if d.bowler_id not in bowling:
+            bowling[d.bowler_id] = {'first_delivery_id': d.id, 'maidens': 0, 'legal_balls': 0, 'runs_conceded': 0,
+                                    'wickets': 0, 'dots': 0, 'wides': 0, 'no_balls': 0}
+        line = bowling[d.bowler_id]
+        legal = d.extra_type not in ILLEGAL_EXTRA_TYPES
+        cost = d.runs_batter + (0 if legal else d.extras)
+        line['legal_balls'] += 1 if legal else 0
+        line['runs_conceded'] += cost
+        line['wickets'] += 1 if bowler_wicket else 0
+        line['dots'] += 1 if legal and cost == 0 else 0
+        line['wides'] += 1 if d.extra_type == 'WD' else 0
+        line['no_balls'] += 1 if d.extra_type == 'NB' else 0
+        over = over_balls.setdefault((d.over_number, d.bowler_id), [0, 0])
+        over[0] += 1 if legal else 0
+        over[1] += cost
+
+    for (_, bowler_id), (legal_balls, runs) in over_balls.items():
+        if legal_balls >= BALLS_PER_OVER and runs == 0:
+            bowling[bowler_id]['maidens'] += 1
+    return batting, bowling
+
+
+def backfill_lines(apps, schema_editor):
+    Innings = apps.get_model('api', 'Innings')
+    Delivery = apps.get_model('api', 'Delivery')
+    BattingLine = apps.get_model('api', 'BattingLine')
+    BowlingLine = apps.get_model('api', 'BowlingLine')
+    for innings in Innings.objects.all():
+        batting, bowling = build_lines(Delivery.objects.filter(innings=innings).order_by('id'))
+        BattingLine.objects.bulk_create([BattingLine(innings=innings, player_id=pid, **f) for pid, f in batting.items()])
+        BowlingLine.objects.bulk_create([BowlingLine(innings=innings, player_id=pid, **f) for pid, f in bowling.items()])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_match_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BattingLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('runs', models.IntegerField(default=0)),
+                ('balls', models.IntegerField(default=0)),
+                ('fours', models.IntegerField(default=0)),
+                ('sixes', models.IntegerField(default=0)),
+                ('is_out', models.BooleanField(default=False)),
+                ('wicket_type', models.CharField(choices=[('BOWLED', 'Bowled'), ('CAUGHT', 'Caught'), ('LBW', 'LBW'), ('RUN_OUT', 'Run Out'), ('STUMPED', 'Stumped'), ('HIT_WICKET', 'Hit Wicket'), ('NONE', 'None')], default='NONE', max_length=10)),
+                ('caught_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.player')),
+                ('dismissed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.player')),
+                ('first_delivery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.delivery')),
+                ('innings', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batting_lines', to='api.innings')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batting_lines', to='api.player')),
+            ],
+            options={
+                'ordering': ['innings', 'first_delivery'],
+                'constraints': [models.UniqueConstraint(fields=('innings', 'player'), name='unique_batting_line')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BowlingLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('legal_balls', models.IntegerField(default=0)),
+                ('maidens', models.IntegerField(default=0)),
+                ('runs_conceded', models.IntegerField(default=0)),
+                ('wickets', models.IntegerField(default=0)),
+                ('dots', models.IntegerField(default=0)),
+                ('wides', models.IntegerField(default=0)),
+                ('no_balls', models.IntegerField(default=0)),
+                ('first_delivery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.delivery')),
+                ('innings', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bowling_lines', to='api.innings')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bowling_lines', to='api.player')),
+            ],
+            options={
+                'ordering': ['innings', 'first_delivery'],
+                'constraints': [models.UniqueConstraint(fields=('innings', 'player'), name='unique_bowling_line')],
+            },
+        ),
+        migrations.RunPython(backfill_lines, migrations.RunPython.noop),
+    ]
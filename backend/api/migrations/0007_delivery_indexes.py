@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_scorecard_lines'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='delivery',
+            options={'ordering': ['innings_id', 'over_number', 'ball_number']},
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['innings', 'over_number', 'ball_number', 'id'], name='delivery_innings_ball_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['innings', 'extra_type'], name='delivery_innings_extra_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['innings', 'id'], name='delivery_innings_id_idx'),
+        ),
+    ]
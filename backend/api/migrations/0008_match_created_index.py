@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delivery_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['-created_at', '-id'], name='match_created_idx'),
+        ),
+    ]
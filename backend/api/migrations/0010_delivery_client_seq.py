@@ -0,0 +1,22 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_tournament'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='client_seq',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='delivery',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_seq__isnull', False)), fields=('innings', 'client_seq'), name='unique_delivery_client_seq'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copies of the rules at the time of this migration, so later changes to api.history and
+# api.scoring do not change what it does
+BALLS_PER_OVER = 6
+ILLEGAL_EXTRA_TYPES = ('WD', 'NB')
+
+
+def build_snapshots(deliveries):
+    state = {'legal_balls': 0, 'total_runs': 0, 'total_wickets': 0, 'last_bowler_id': None}
+    snapshots = []
+    for delivery in deliveries:
+        state['total_runs'] += delivery.runs_batter + delivery.extras
+        if delivery.is_wicket:
+            state['total_wickets'] += 1
+        if delivery.extra_type not in ILLEGAL_EXTRA_TYPES:
+            state['legal_balls'] += 1
+            state['last_bowler_id'] = delivery.bowler_id
+            if state['legal_balls'] % BALLS_PER_OVER == 0:
+                snapshots.append({'last_delivery_id': delivery.id, **state})
+    return snapshots
+
+
+def backfill_snapshots(apps, schema_editor):
+    Innings = apps.get_model('api', 'Innings')
+    Delivery = apps.get_model('api', 'Delivery')
+    InningsSnapshot = apps.get_model('api', 'InningsSnapshot')
+    for innings in Innings.objects.all():
+        snapshots = build_snapshots(Delivery.objects.filter(innings=innings).order_by('id'))
+        InningsSnapshot.objects.bulk_create([InningsSnapshot(innings=innings, **f) for f in snapshots])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_delivery_client_seq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InningsEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('BALL', 'Ball'), ('UNDO', 'Undo'), ('REDO', 'Redo')], max_length=4)),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('innings', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='api.innings')),
+            ],
+            options={
+                'ordering': ['innings', 'id'],
+                'indexes': [models.Index(fields=['innings', 'id'], name='innings_event_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InningsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('legal_balls', models.IntegerField()),
+                ('total_runs', models.IntegerField()),
+                ('total_wickets', models.IntegerField()),
+                ('innings', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.innings')),
+                ('last_bowler', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.player')),
+                ('last_delivery', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.delivery')),
+            ],
+            options={
+                'ordering': ['innings', 'legal_balls'],
+                'constraints': [models.UniqueConstraint(fields=('innings', 'legal_balls'), name='unique_innings_snapshot')],
+            },
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_innings_snapshots_and_events'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='innings',
+            name='overs_bowled',
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_remove_innings_overs_bowled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='stats_recorded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('matches', models.IntegerField(default=0)),
+                ('batting_innings', models.IntegerField(default=0)),
+                ('runs', models.IntegerField(default=0)),
+                ('balls', models.IntegerField(default=0)),
+                ('fours', models.IntegerField(default=0)),
+                ('sixes', models.IntegerField(default=0)),
+                ('outs', models.IntegerField(default=0)),
+                ('fifties', models.IntegerField(default=0)),
+                ('hundreds', models.IntegerField(default=0)),
+                ('highest_score', models.IntegerField(default=0)),
+                ('bowling_innings', models.IntegerField(default=0)),
+                ('legal_balls', models.IntegerField(default=0)),
+                ('maidens', models.IntegerField(default=0)),
+                ('runs_conceded', models.IntegerField(default=0)),
+                ('wickets', models.IntegerField(default=0)),
+                ('best_wickets', models.IntegerField(default=0)),
+                ('best_runs', models.IntegerField(blank=True, null=True)),
+                ('catches', models.IntegerField(default=0)),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='api.player')),
+                ('tournament', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='player_stats', to='api.tournament')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament', '-runs'], name='player_stats_runs_idx'), models.Index(fields=['tournament', '-wickets'], name='player_stats_wickets_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('tournament__isnull', True)), fields=('player',), name='unique_career_stats'), models.UniqueConstraint(fields=('player', 'tournament'), name='unique_tournament_player_stats')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TeamStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played', models.IntegerField(default=0)),
+                ('won', models.IntegerField(default=0)),
+                ('lost', models.IntegerField(default=0)),
+                ('tied', models.IntegerField(default=0)),
+                ('runs_scored', models.IntegerField(default=0)),
+                ('balls_faced', models.IntegerField(default=0)),
+                ('runs_conceded', models.IntegerField(default=0)),
+                ('balls_bowled', models.IntegerField(default=0)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='api.team')),
+                ('tournament', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='team_stats', to='api.tournament')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('tournament__isnull', True)), fields=('team',), name='unique_career_team_stats'), models.UniqueConstraint(fields=('team', 'tournament'), name='unique_tournament_team_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:26
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_results(apps, schema_editor):
+    # Only T20 matches were ever completed: a winner or a tie, and a two-innings lead
+    Match = apps.get_model('api', 'Match')
+    Innings = apps.get_model('api', 'Innings')
+    Match.objects.filter(status='COMPLETED', winner__isnull=False).update(result='WIN')
+    Match.objects.filter(status='COMPLETED', winner__isnull=True).update(result='TIE')
+    Innings.objects.filter(innings_number=2, target__isnull=False).update(lead_at_start=1 - F('target'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_player_and_team_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='innings',
+            name='follow_on',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='innings',
+            name='lead_at_start',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='day',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='days',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='result',
+            field=models.CharField(blank=True, choices=[('WIN', 'Win'), ('TIE', 'Tie'), ('DRAW', 'Draw')], max_length=4, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='session',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='session_start_balls',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='session_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='win_by',
+            field=models.CharField(blank=True, choices=[('RUNS', 'Runs'), ('WICKETS', 'Wickets'), ('INNINGS', 'Innings and runs')], max_length=7, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='win_margin',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='teamstats',
+            name='drawn',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_test_match_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='innings',
+            name='recent_run_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BallPrediction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('legal_balls', models.IntegerField()),
+                ('total_runs', models.IntegerField()),
+                ('total_wickets', models.IntegerField()),
+                ('recent_run_rate', models.FloatField()),
+                ('projected_score', models.FloatField()),
+                ('win_probability', models.FloatField()),
+                ('delivery', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='prediction', to='api.delivery')),
+                ('innings', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='api.innings')),
+            ],
+            options={
+                'ordering': ['innings', 'delivery'],
+                'indexes': [models.Index(fields=['innings', 'delivery'], name='prediction_innings_idx')],
+            },
+        ),
+    ]
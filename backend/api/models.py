@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Team(models.Model):
     name = models.CharField(max_length=100)
@@ -15,6 +16,13 @@ class Player(models.Model):
     def __str__(self):
         return f"{self.name} ({self.team.name})"
 
+class Tournament(models.Model):
+    name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
 class Match(models.Model):
     FORMAT_CHOICES = (
         ('T20', 'T20'),
@@ -29,10 +37,21 @@ class Match(models.Model):
         ('BAT', 'Bat'),
         ('BOWL', 'Bowl'),
     )
+    RESULT_CHOICES = (
+        ('WIN', 'Win'),
+        ('TIE', 'Tie'),
+        ('DRAW', 'Draw'),
+    )
+    WIN_BY_CHOICES = (
+        ('RUNS', 'Runs'),
+        ('WICKETS', 'Wickets'),
+        ('INNINGS', 'Innings and runs'),
+    )
 
     format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
     custom_overs = models.IntegerField(null=True, blank=True, help_text="Total overs per innings for limited overs")
     last_man_standing = models.BooleanField(default=False)
+    tournament = models.ForeignKey(Tournament, on_delete=models.SET_NULL, null=True, blank=True, related_name='matches')
     
     team_a = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='matches_as_team_a')
     team_b = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='matches_as_team_b')
@@ -47,6 +66,29 @@ class Match(models.Model):
     man_of_match = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='mom_awards')
     best_batsman = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='best_batsman_awards')
     best_bowler = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='best_bowler_awards')
+    result = models.CharField(max_length=4, choices=RESULT_CHOICES, null=True, blank=True)
+    win_by = models.CharField(max_length=7, choices=WIN_BY_CHOICES, null=True, blank=True)
+    win_margin = models.IntegerField(null=True, blank=True)
+
+    # Test matches: scheduled days and the current day and session (see api.scoring.close_session)
+    days = models.IntegerField(null=True, blank=True)
+    day = models.IntegerField(default=1)
+    session = models.IntegerField(default=1)
+    session_started_at = models.DateTimeField(null=True, blank=True)
+    # Legal balls bowled in the match when the session started, so the over rate needs no delivery scan
+    session_start_balls = models.IntegerField(default=0)
+
+    # Bumped on every scoring change so pollers can tell whether they are stale without fetching the match
+    version = models.IntegerField(default=0)
+    last_undo_version = models.IntegerField(default=0)
+    # Whether this match is counted in PlayerStats/TeamStats (see api.stats)
+    stats_recorded = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Cursor pagination of the match history, newest first
+            models.Index(fields=['-created_at', '-id'], name='match_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.team_a} vs {self.team_b} ({self.format})"
@@ -59,11 +101,22 @@ class Innings(models.Model):
     
     is_declared = models.BooleanField(default=False)
     is_completed = models.BooleanField(default=False)
+    follow_on = models.BooleanField(default=False)
     
     # Cached totals for easier querying
     total_runs = models.IntegerField(default=0)
     total_wickets = models.IntegerField(default=0)
-    overs_bowled = models.FloatField(default=0.0)
+    # Source of truth for overs: display, limits and rates are derived from it (see api.scoring)
+    legal_balls = models.IntegerField(default=0)
+
+    # Cached at innings start so scoring a ball never has to re-read the roster or the first innings
+    batting_team_size = models.IntegerField(default=0)
+    target = models.IntegerField(null=True, blank=True)
+    # Batting side's runs minus the opponents' over the earlier innings; the lead is lead_at_start + total_runs
+    lead_at_start = models.IntegerField(default=0)
+    # Exponentially weighted runs per legal ball, part of the prediction state (see api.prediction)
+    recent_run_rate = models.FloatField(null=True, blank=True)
+    last_bowler = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
 
     class Meta:
         ordering = ['innings_number']
@@ -106,11 +159,241 @@ class Delivery(models.Model):
     player_out = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='outs')
     catcher = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='catches')
     
-    # Store snapshot state for Undo functionality
+    # Undo state lives in InningsSnapshot and InningsEvent
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Sequence number assigned by an offline scorer, makes replaying a queued batch idempotent
+    client_seq = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
-        ordering = ['innings', 'over_number', 'ball_number']
+        # innings_id rather than innings: ordering by the relation would join Innings and sort by its ordering
+        ordering = ['innings_id', 'over_number', 'ball_number']
+        indexes = [
+            # Ball-by-ball order within an innings: default ordering, undo and the last legal ball lookup
+            models.Index(fields=['innings', 'over_number', 'ball_number', 'id'], name='delivery_innings_ball_idx'),
+            # Legal/illegal delivery filters
+            models.Index(fields=['innings', 'extra_type'], name='delivery_innings_extra_idx'),
+            # Delta feed and last delivery id for live polling
+            models.Index(fields=['innings', 'id'], name='delivery_innings_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['innings', 'client_seq'], condition=models.Q(client_seq__isnull=False),
+                                    name='unique_delivery_client_seq'),
+        ]
 
     def __str__(self):
         return f"{self.over_number}.{self.ball_number} - {self.batsman} to {self.bowler}"
+
+class BattingLine(models.Model):
+    # Per-innings batting aggregates, maintained ball by ball by api.scorecard
+    innings = models.ForeignKey(Innings, on_delete=models.CASCADE, related_name='batting_lines')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='batting_lines')
+    # The ball on which the batter first appeared; orders the card and removes the line if that ball is undone
+    first_delivery = models.ForeignKey(Delivery, on_delete=models.CASCADE, related_name='+')
+
+    runs = models.IntegerField(default=0)
+    balls = models.IntegerField(default=0)
+    fours = models.IntegerField(default=0)
+    sixes = models.IntegerField(default=0)
+
+    is_out = models.BooleanField(default=False)
+    wicket_type = models.CharField(max_length=10, choices=Delivery.WICKET_TYPES, default='NONE')
+    dismissed_by = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    caught_by = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['innings', 'first_delivery']
+        constraints = [
+            models.UniqueConstraint(fields=['innings', 'player'], name='unique_batting_line'),
+        ]
+
+    def __str__(self):
+        return f"{self.player.name} {self.runs}({self.balls})"
+
+class BowlingLine(models.Model):
+    innings = models.ForeignKey(Innings, on_delete=models.CASCADE, related_name='bowling_lines')
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='bowling_lines')
+    first_delivery = models.ForeignKey(Delivery, on_delete=models.CASCADE, related_name='+')
+
+    legal_balls = models.IntegerField(default=0)
+    maidens = models.IntegerField(default=0)
+    runs_conceded = models.IntegerField(default=0)
+    wickets = models.IntegerField(default=0)
+    dots = models.IntegerField(default=0)
+    wides = models.IntegerField(default=0)
+    no_balls = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['innings', 'first_delivery']
+        constraints = [
+            models.UniqueConstraint(fields=['innings', 'player'], name='unique_bowling_line'),
+        ]
+
+    def __str__(self):
+        return f"{self.player.name} {self.wickets}-{self.runs_conceded}"
+
+class InningsSnapshot(models.Model):
+    # Innings counters at the end of every over. Undo and rewind restore the nearest snapshot and replay
+    # the few balls bowled after it instead of recounting the innings.
+    innings = models.ForeignKey(Innings, on_delete=models.CASCADE, related_name='snapshots')
+    # The over-ending ball; undoing it removes the snapshot
+    last_delivery = models.OneToOneField(Delivery, on_delete=models.CASCADE, related_name='+')
+
+    legal_balls = models.IntegerField()
+    total_runs = models.IntegerField()
+    total_wickets = models.IntegerField()
+    last_bowler = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['innings', 'legal_balls']
+        constraints = [
+            models.UniqueConstraint(fields=['innings', 'legal_balls'], name='unique_innings_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.innings} after {self.legal_balls} balls: {self.total_runs}/{self.total_wickets}"
+
+class InningsEvent(models.Model):
+    # Append-only log of scoring actions. Deliveries hold the current state, the log keeps what undo
+    # removed so it can be redone.
+    KINDS = (
+        ('BALL', 'Ball'),
+        ('UNDO', 'Undo'),
+        ('REDO', 'Redo'),
+    )
+
+    innings = models.ForeignKey(Innings, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=4, choices=KINDS)
+    # The ball as it was recorded (see api.history.ball_payload)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['innings', 'id']
+        indexes = [
+            models.Index(fields=['innings', 'id'], name='innings_event_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} in {self.innings}"
+
+class BallPrediction(models.Model):
+    # Projected score and batting side's win probability after every ball of a limited-overs innings,
+    # with the recent run rate they were computed from (see api.prediction)
+    innings = models.ForeignKey(Innings, on_delete=models.CASCADE, related_name='predictions')
+    delivery = models.OneToOneField(Delivery, on_delete=models.CASCADE, related_name='prediction')
+
+    legal_balls = models.IntegerField()
+    total_runs = models.IntegerField()
+    total_wickets = models.IntegerField()
+    recent_run_rate = models.FloatField()
+    projected_score = models.FloatField()
+    win_probability = models.FloatField()
+
+    class Meta:
+        ordering = ['innings', 'delivery']
+        indexes = [
+            models.Index(fields=['innings', 'delivery'], name='prediction_innings_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.innings} after {self.legal_balls} balls: {self.win_probability:.0%}"
+
+class PlayerStats(models.Model):
+    # Rollups of completed matches, maintained by api.stats. A null tournament holds the career totals.
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='stats')
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, null=True, blank=True, related_name='player_stats')
+
+    matches = models.IntegerField(default=0)
+    batting_innings = models.IntegerField(default=0)
+    runs = models.IntegerField(default=0)
+    balls = models.IntegerField(default=0)
+    fours = models.IntegerField(default=0)
+    sixes = models.IntegerField(default=0)
+    outs = models.IntegerField(default=0)
+    fifties = models.IntegerField(default=0)
+    hundreds = models.IntegerField(default=0)
+    highest_score = models.IntegerField(default=0)
+
+    bowling_innings = models.IntegerField(default=0)
+    legal_balls = models.IntegerField(default=0)
+    maidens = models.IntegerField(default=0)
+    runs_conceded = models.IntegerField(default=0)
+    wickets = models.IntegerField(default=0)
+    # Best bowling in an innings: most wickets, then fewest runs
+    best_wickets = models.IntegerField(default=0)
+    best_runs = models.IntegerField(null=True, blank=True)
+
+    catches = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player'], condition=models.Q(tournament__isnull=True),
+                                    name='unique_career_stats'),
+            models.UniqueConstraint(fields=['player', 'tournament'], name='unique_tournament_player_stats'),
+        ]
+        indexes = [
+            # Leaderboards: top N of a scope without sorting the table
+            models.Index(fields=['tournament', '-runs'], name='player_stats_runs_idx'),
+            models.Index(fields=['tournament', '-wickets'], name='player_stats_wickets_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.player.name}: {self.runs} runs, {self.wickets} wickets"
+
+class TeamStats(models.Model):
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='stats')
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, null=True, blank=True, related_name='team_stats')
+
+    played = models.IntegerField(default=0)
+    won = models.IntegerField(default=0)
+    lost = models.IntegerField(default=0)
+    tied = models.IntegerField(default=0)
+    drawn = models.IntegerField(default=0)
+    runs_scored = models.IntegerField(default=0)
+    balls_faced = models.IntegerField(default=0)
+    runs_conceded = models.IntegerField(default=0)
+    balls_bowled = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['team'], condition=models.Q(tournament__isnull=True),
+                                    name='unique_career_team_stats'),
+            models.UniqueConstraint(fields=['team', 'tournament'], name='unique_tournament_team_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.team.name}: {self.won}/{self.played}"
+
+class Job(models.Model):
+    # Background work queued by the scoring hooks and run by api.jobs, e.g. awards once a match completes
+    STATUSES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # Enqueueing work whose key is already queued or done is a no-op
+    key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=7, choices=STATUSES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    # Not before: retries back off
+    run_after = models.DateTimeField(default=timezone.now)
+    # A RUNNING job still held after this is taken to have lost its worker
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.payload}: {self.status}"
+
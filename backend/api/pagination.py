@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class MatchCursorPagination(CursorPagination):
+    # Newest first; cursors stay stable while new matches are being created
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
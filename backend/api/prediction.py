@@ -0,0 +1,200 @@
+import json
+import math
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import BallPrediction
+from .scorecard import ILLEGAL_EXTRA_TYPES
+
+# Live projected score and win probability for limited-overs innings. The model is a table of expected
+# further runs by (wickets in hand, balls left), so a prediction is two list lookups and an erf; the state
+# is the innings counters plus recent_run_rate, updated ball by ball, and nothing is replayed per poll.
+# The prediction after every ball is stored in BallPrediction for charts. Until calibrate_prediction has
+# fitted the table to recorded deliveries (PREDICTION_MODEL_PATH), a Duckworth-Lewis style prior is used.
+
+# Table bounds: eleven wickets for last man standing, fifty overs
+MAX_WICKETS = 11
+MAX_BALLS = 300
+PAR_RUNS_PER_BALL = 1.4
+# What a side can still score per wicket in hand however many balls are left, shapes the prior
+RUNS_PER_WICKET = 40
+RUNS_SD_PER_BALL = 1.5
+# Weight of the latest legal ball in recent_run_rate, and how far a hot or cold spell moves the projection
+RECENT_WEIGHT = 0.1
+MOMENTUM = 0.3
+# Legal balls before recent_run_rate gets its full weight
+RECENT_BALLS = 12
+# Observations a calibrated table cell needs before it outweighs the prior
+PRIOR_STRENGTH = 20
+
+# The per-ball state vector; wicket_limit and ball_limit are fixed for the innings
+State = namedtuple('State', 'runs wickets legal_balls target recent_run_rate wicket_limit ball_limit')
+
+
+def normal_cdf(z):
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+
+def update_recent_rate(previous, runs, legal):
+    # Runs off wides and no-balls are added to the rate without counting as a ball
+    if previous is None:
+        return float(runs)
+    if legal:
+        return previous + RECENT_WEIGHT * (runs - previous)
+    return previous + RECENT_WEIGHT * runs
+
+
+class PredictionModel:
+    def __init__(self, expected, runs_sd_per_ball=RUNS_SD_PER_BALL):
+        # expected[wickets in hand][balls left]: further runs
+        self.expected = expected
+        self.runs_sd_per_ball = runs_sd_per_ball
+
+    @classmethod
+    def prior(cls, runs_per_ball=PAR_RUNS_PER_BALL):
+        def further(wickets, balls):
+            # Close to runs_per_ball * balls with wickets to spare, capped by the wickets in hand
+            cap = wickets * RUNS_PER_WICKET
+            return cap * (1 - math.exp(-runs_per_ball * balls / cap)) if cap else 0.0
+        return cls([[further(w, b) for b in range(MAX_BALLS + 1)] for w in range(MAX_WICKETS + 1)])
+
+    def expected_runs(self, wickets_in_hand, balls_left):
+        return self.expected[min(max(wickets_in_hand, 0), MAX_WICKETS)][min(max(balls_left, 0), MAX_BALLS)]
+
+    def predict(self, state):
+        """(projected score, batting side's win probability) for a State."""
+        wickets_in_hand = max(0, state.wicket_limit - state.wickets)
+        balls_left = max(0, state.ball_limit - state.legal_balls)
+        par = self.expected_runs(state.wicket_limit, state.ball_limit)
+        remaining = self.expected_runs(wickets_in_hand, balls_left)
+        if state.recent_run_rate is not None and par:
+            trust = MOMENTUM * min(1, state.legal_balls / RECENT_BALLS)
+            form = trust * (state.recent_run_rate * state.ball_limit / par - 1)
+            remaining *= min(1.5, max(0.5, 1 + form))
+        projected = state.runs + remaining
+        spread = self.runs_sd_per_ball * math.sqrt(balls_left) if wickets_in_hand else 0.0
+
+        if state.target is None:
+            # Against a par chase of the same length
+            edge = projected - par
+            spread = math.hypot(spread, self.runs_sd_per_ball * math.sqrt(state.ball_limit))
+        elif state.runs >= state.target:
+            return round(projected, 1), 1.0
+        else:
+            # Half a run for the tie, which is half a win
+            edge = remaining - (state.target - state.runs) + 0.5
+        if not spread:
+            return round(projected, 1), 0.5 if state.target is not None and state.runs == state.target - 1 else 0.0
+        return round(projected, 1), round(normal_cdf(edge / spread), 4)
+
+    def to_json(self):
+        return {'runs_sd_per_ball': self.runs_sd_per_ball, 'expected': self.expected}
+
+
+def load_model(path):
+    if path and os.path.exists(path):
+        with open(path) as fileobj:
+            data = json.load(fileobj)
+        return PredictionModel(data['expected'], data['runs_sd_per_ball'])
+    return PredictionModel.prior()
+
+
+@lru_cache(maxsize=None)
+def get_model():
+    return load_model(getattr(settings, 'PREDICTION_MODEL_PATH', None))
+
+
+def record_prediction(innings, delivery, state):
+    projected, probability = get_model().predict(state)
+    BallPrediction.objects.create(
+        innings=innings, delivery=delivery, legal_balls=state.legal_balls, total_runs=state.runs,
+        total_wickets=state.wickets, recent_run_rate=state.recent_run_rate, projected_score=projected,
+        win_probability=probability,
+    )
+
+
+def restore_recent_rate(innings):
+    # After undo or rewind: the rate stored with the last ball still standing
+    innings.recent_run_rate = (innings.predictions.order_by('-delivery_id')
+                               .values_list('recent_run_rate', flat=True).first())
+
+
+def replay(rows, wicket_limit, ball_limit, target):
+    """Yields (delivery id, State) after every ball of an innings.
+
+    rows are (id, runs_batter, extras, extra_type, is_wicket) in the order the balls were bowled.
+    """
+    runs = wickets = legal_balls = 0
+    recent = None
+    for delivery_id, runs_batter, extras, extra_type, is_wicket in rows:
+        legal = extra_type not in ILLEGAL_EXTRA_TYPES
+        runs += runs_batter + extras
+        wickets += 1 if is_wicket else 0
+        legal_balls += 1 if legal else 0
+        recent = update_recent_rate(recent, runs_batter + extras, legal)
+        yield delivery_id, State(runs, wickets, legal_balls, target, recent, wicket_limit, ball_limit)
+
+
+class Calibration:
+    """Accumulates replayed states and final scores into a fitted PredictionModel."""
+
+    def __init__(self, prior):
+        self.prior = prior
+        self.sums = [[0.0] * (MAX_BALLS + 1) for _ in range(MAX_WICKETS + 1)]
+        self.counts = [[0] * (MAX_BALLS + 1) for _ in range(MAX_WICKETS + 1)]
+        self.squared_error = 0.0
+        self.balls_left = 0
+        self.observations = 0
+
+    def add(self, state, final_runs):
+        wickets_in_hand = min(max(state.wicket_limit - state.wickets, 0), MAX_WICKETS)
+        balls_left = min(max(state.ball_limit - state.legal_balls, 0), MAX_BALLS)
+        further = final_runs - state.runs
+        self.sums[wickets_in_hand][balls_left] += further
+        self.counts[wickets_in_hand][balls_left] += 1
+        self.squared_error += (further - self.prior.expected_runs(wickets_in_hand, balls_left)) ** 2
+        self.balls_left += balls_left
+        self.observations += 1
+
+    def model(self):
+        expected = []
+        for w in range(MAX_WICKETS + 1):
+            sums, counts, prior = self.sums[w], self.counts[w], self.prior.expected[w]
+            row = [(sums[b] + PRIOR_STRENGTH * prior[b]) / (counts[b] + PRIOR_STRENGTH) for b in range(MAX_BALLS + 1)]
+            # More balls or more wickets never means fewer runs
+            for b in range(1, MAX_BALLS + 1):
+                row[b] = max(row[b], row[b - 1])
+            if expected:
+                row = [max(runs, below) for runs, below in zip(row, expected[-1])]
+            expected.append([round(runs, 3) for runs in row])
+        spread = (math.sqrt(self.squared_error / self.balls_left) if self.balls_left
+                  else self.prior.runs_sd_per_ball)
+        return PredictionModel(expected, round(spread, 4))
+
+
+def brier_score(model, outcomes):
+    """Mean squared error of the win probabilities for (State, won) pairs; lower is better."""
+    total = count = 0
+    for state, won in outcomes:
+        total += (model.predict(state)[1] - won) ** 2
+        count += 1
+    return round(total / count, 4) if count else None
+
+
+SERIES_COLUMNS = ('legal_balls', 'total_runs', 'total_wickets', 'projected_score', 'win_probability')
+
+
+def match_series(match):
+    """The stored per-ball predictions of each innings, as rows in SERIES_COLUMNS order."""
+    rows = {}
+    for innings_id, *row in (BallPrediction.objects.filter(innings__match=match)
+                             .order_by('innings_id', 'delivery_id').values_list('innings_id', *SERIES_COLUMNS)):
+        rows.setdefault(innings_id, []).append(row)
+    return {
+        'columns': SERIES_COLUMNS,
+        'innings': [{'innings_number': innings.innings_number, 'batting_team': innings.batting_team_id,
+                     'balls': rows.get(innings.id, [])} for innings in match.innings.all()],
+    }
@@ -0,0 +1,82 @@
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .export import EXTRA_TYPE_CODES, EXTRA_TYPE_LABELS, UNKNOWN_CODE, WICKET_TYPE_CODES, WICKET_TYPE_LABELS
+
+# Compact encodings for scorer and spectator clients, chosen with the Accept header or ?format=.
+# Every list of deliveries becomes a list of rows in DELIVERY_COLUMNS order: no repeated keys, no timestamp,
+# extra and wicket types as indexes into the label lists (-1 for a label outside them), booleans as 0/1.
+# The column list and labels are sent once per response under "delivery_format".
+DELIVERY_COLUMNS = ('id', 'innings', 'over_number', 'ball_number', 'batsman', 'non_striker', 'bowler',
+                    'runs_batter', 'extras', 'extra_type', 'is_wicket', 'wicket_type', 'player_out', 'catcher',
+                    'client_seq')
+DELIVERY_FORMAT = {
+    'columns': DELIVERY_COLUMNS,
+    'extra_type': EXTRA_TYPE_LABELS,
+    'wicket_type': WICKET_TYPE_LABELS,
+}
+
+
+def pack_delivery(delivery):
+    return [
+        EXTRA_TYPE_CODES.get(delivery[column], UNKNOWN_CODE) if column == 'extra_type'
+        else WICKET_TYPE_CODES.get(delivery[column], UNKNOWN_CODE) if column == 'wicket_type'
+        else int(delivery[column]) if column == 'is_wicket'
+        else delivery.get(column)
+        for column in DELIVERY_COLUMNS
+    ]
+
+
+def _pack(data, found):
+    if isinstance(data, dict):
+        packed = {}
+        for key, value in data.items():
+            if key == 'deliveries' and value:
+                found.append(True)
+                value = [pack_delivery(d) for d in value]
+            else:
+                value = _pack(value, found)
+            packed[key] = value
+        return packed
+    if isinstance(data, list):
+        return [_pack(item, found) for item in data]
+    return data
+
+
+def compact(data):
+    found = []
+    packed = _pack(data, found)
+    if found and isinstance(packed, dict):
+        packed['delivery_format'] = DELIVERY_FORMAT
+    return packed
+
+
+class CompactJSONRenderer(JSONRenderer):
+    media_type = 'application/vnd.sbfc.compact+json'
+    format = 'compact'
+    # No indentation or spaces whatever the client asks for
+    compact = True
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        return None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(compact(data) if data is not None else None, accepted_media_type, renderer_context)
+
+
+class MsgpackRenderer(BaseRenderer):
+    """The compact representation as msgpack. Needs the optional 'msgpack' package."""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImproperlyConfigured("MsgpackRenderer requires the 'msgpack' package")
+        if data is None:
+            return b''
+        return msgpack.packb(compact(data), use_bin_type=True)
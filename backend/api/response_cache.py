@@ -0,0 +1,219 @@
+import hashlib
+import json
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .db_router import primary, reading_replica
+from .models import Delivery, Innings, Match, Player, Team
+
+# Rendered responses of completed matches (detail and scorecard) and of match list pages. A completed
+# match only changes through undo or an admin edit, both of which go through the model signals below.
+# Entries are tagged with generations instead of being looked up and deleted one by one: any match change
+# starts a new list generation, a team or player edit starts a new generation for everything.
+# Signals only reach the process that made the change, so entries are short-lived unless the cache is
+# shared between processes (settings.RESPONSE_CACHE_TIMEOUT).
+DEFAULT_TIMEOUT = 24 * 60 * 60
+GENERATION_KEY = 'responses:generation'
+LIST_GENERATION_KEY = 'responses:list-generation'
+MATCH_KINDS = ('detail', 'scorecard')
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def _generations():
+    found = cache.get_many([GENERATION_KEY, LIST_GENERATION_KEY])
+    return [found.get(key) or _start_generation(key) for key in (GENERATION_KEY, LIST_GENERATION_KEY)]
+
+
+async def _acache(method, *args):
+    # Local memory has nothing to wait for, its async methods would only add a thread hop per call
+    if isinstance(caches['default'], LocMemCache):
+        return getattr(cache, method)(*args)
+    return await getattr(cache, f'a{method}')(*args)
+
+
+async def _agenerations():
+    found = await _acache('get_many', [GENERATION_KEY, LIST_GENERATION_KEY])
+    return [found.get(key) or await _astart_generation(key) for key in (GENERATION_KEY, LIST_GENERATION_KEY)]
+
+
+def _start_generation(key):
+    # Evicted or never set: a fresh generation can only miss, never serve a stale entry
+    generation = _new_generation()
+    cache.set(key, generation, None)
+    return generation
+
+
+async def _astart_generation(key):
+    generation = _new_generation()
+    await _acache('set', key, generation, None)
+    return generation
+
+
+def match_key(generation, match_id, kind):
+    return f'responses:{generation}:match:{match_id}:{kind}'
+
+
+def list_key(generation, list_generation, request):
+    # Pagination links are absolute, so the host is part of the key along with the query string
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'responses:{generation}:list:{list_generation}:{url}'
+
+
+def etag_for(data):
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.md5(body.encode()).hexdigest()
+
+
+def _entry_key(kind, request, generations, pk):
+    generation, list_generation = generations
+    if kind == 'list':
+        return list_key(generation, list_generation, request)
+    return match_key(generation, pk, kind)
+
+
+def _timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _new_entry(data):
+    return {'data': data, 'etag': etag_for(data)}
+
+
+def _conditional(entry, request, renderer_format):
+    """(ETag, whether the client's If-None-Match already has it)."""
+    # One representation per renderer, so the tag names the format too
+    etag = f'"{entry["etag"]}-{renderer_format}"'
+    # Weak comparison: compression turns the tag into W/"..."
+    return etag, etag in {tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))}
+
+
+def cached_response(kind):
+    """Serves a view from the response cache, with ETag and If-None-Match support.
+
+    kind is 'list', or one of MATCH_KINDS for views that take the match pk. Match responses are only
+    stored once the match is COMPLETED, list pages always (every match change invalidates them).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(self, request, *args, **kwargs)
+            key = _entry_key(kind, request, _generations(), kwargs.get('pk'))
+
+            entry = cache.get(key)
+            if entry is None:
+                # A replica may not have caught up with the write that invalidated the entry, so entries are
+                # filled from the primary. List pages are always stored, match responses once COMPLETED.
+                if kind == 'list':
+                    with primary():
+                        response = view(self, request, *args, **kwargs)
+                else:
+                    response = view(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                if kind != 'list' and response.data.get('status') != 'COMPLETED':
+                    return response
+                if kind != 'list' and reading_replica():
+                    with primary():
+                        response = view(self, request, *args, **kwargs)
+                entry = _new_entry(response.data)
+                if timeout := _timeout():
+                    cache.set(key, entry, timeout)
+
+            etag, not_modified = _conditional(entry, request, request.accepted_renderer.format)
+            response = Response(status=status.HTTP_304_NOT_MODIFIED) if not_modified else Response(entry['data'])
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+async def acached(kind, request, renderer_format, load, pk=None):
+    """Async twin of cached_response for api.async_views: (data, ETag) with data None for a 304.
+
+    load is a coroutine function returning the payload, the ETag is None when the payload was not cached.
+    """
+    key = _entry_key(kind, request, await _agenerations(), pk)
+    entry = await _acache('get', key)
+    if entry is None:
+        if kind == 'list':
+            with primary():
+                data = await load()
+        else:
+            data = await load()
+            if data.get('status') != 'COMPLETED':
+                return data, None
+            if reading_replica():
+                with primary():
+                    data = await load()
+        entry = _new_entry(data)
+        if timeout := _timeout():
+            await _acache('set', key, entry, timeout)
+
+    etag, not_modified = _conditional(entry, request, renderer_format)
+    return None if not_modified else entry['data'], etag
+
+
+def invalidate_match(match_id):
+    generation = cache.get(GENERATION_KEY)
+    if generation is not None:
+        cache.delete_many([match_key(generation, match_id, kind) for kind in MATCH_KINDS])
+    invalidate_lists()
+
+
+def invalidate_lists():
+    cache.set(LIST_GENERATION_KEY, _new_generation(), None)
+
+
+def invalidate_all():
+    cache.set(GENERATION_KEY, _new_generation(), None)
+
+
+def _on_commit_too(invalidate, *args):
+    # Once now, and again after commit: a request that read the old rows while the transaction was open
+    # may have cached them in between
+    invalidate(*args)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: invalidate(*args))
+
+
+@receiver([post_save, post_delete], sender=Match)
+def match_changed(sender, instance, **kwargs):
+    _on_commit_too(invalidate_match, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Innings)
+def innings_changed(sender, instance, **kwargs):
+    _on_commit_too(invalidate_match, instance.match_id)
+
+
+@receiver([post_save, post_delete], sender=Delivery)
+def delivery_changed(sender, instance, **kwargs):
+    if Delivery.innings.is_cached(instance):
+        match_id = instance.innings.match_id
+    else:
+        match_id = Innings.objects.filter(pk=instance.innings_id).values_list('match_id', flat=True).first()
+    if match_id is not None:
+        _on_commit_too(invalidate_match, match_id)
+
+
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Player)
+def roster_changed(sender, instance, created=False, **kwargs):
+    # Team names and rosters are part of every match response. New teams and players are in none yet.
+    if not created:
+        _on_commit_too(invalidate_all)
@@ -0,0 +1,155 @@
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, When
+
+from .models import Delivery, BattingLine, BowlingLine
+
+BALLS_PER_OVER = 6
+# Wides and no-balls have to be re-bowled, everything else counts towards the over
+ILLEGAL_EXTRA_TYPES = ('WD', 'NB')
+
+
+def runs_conceded(delivery):
+    # Byes and leg byes are not charged to the bowler, wides and no-balls are
+    runs = delivery.runs_batter
+    if delivery.extra_type in ILLEGAL_EXTRA_TYPES:
+        runs += delivery.extras
+    return runs
+
+
+def is_bowler_wicket(delivery):
+    return delivery.is_wicket and delivery.wicket_type != 'RUN_OUT'
+
+
+def batting_contribution(delivery):
+    return {
+        'runs': delivery.runs_batter,
+        'balls': 0 if delivery.extra_type == 'WD' else 1,
+        'fours': 1 if delivery.runs_batter == 4 else 0,
+        'sixes': 1 if delivery.runs_batter == 6 else 0,
+    }
+
+
+def bowling_contribution(delivery):
+    legal = delivery.extra_type not in ILLEGAL_EXTRA_TYPES
+    cost = runs_conceded(delivery)
+    return {
+        'legal_balls': 1 if legal else 0,
+        'runs_conceded': cost,
+        'wickets': 1 if is_bowler_wicket(delivery) else 0,
+        'dots': 1 if legal and cost == 0 else 0,
+        'wides': 1 if delivery.extra_type == 'WD' else 0,
+        'no_balls': 1 if delivery.extra_type == 'NB' else 0,
+    }
+
+
+def dismissal(delivery):
+    return {
+        'is_out': True,
+        'wicket_type': delivery.wicket_type,
+        'dismissed_by_id': delivery.bowler_id if is_bowler_wicket(delivery) else None,
+        'caught_by_id': delivery.catcher_id,
+    }
+
+
+NOT_OUT = {'is_out': False, 'wicket_type': 'NONE', 'dismissed_by_id': None, 'caught_by_id': None}
+
+
+def is_maiden(legal_balls, runs_conceded):
+    # A whole over by one bowler with no runs conceded; an over shared after a mid-over change is not
+    return legal_balls >= BALLS_PER_OVER and runs_conceded == 0
+
+
+def over_figures(innings, over_number, bowler_id):
+    """(legal balls, runs conceded) of one bowler in one over."""
+    # An over is at most a handful of rows, so this stays cheap however long the innings is
+    figures = Delivery.objects.filter(innings=innings, over_number=over_number, bowler_id=bowler_id).aggregate(
+        legal_balls=Count('id', filter=~Q(extra_type__in=ILLEGAL_EXTRA_TYPES)),
+        runs=Sum(F('runs_batter') + Case(
+            When(extra_type__in=ILLEGAL_EXTRA_TYPES, then=F('extras')),
+            default=0,
+            output_field=IntegerField(),
+        )),
+    )
+    return figures['legal_balls'], figures['runs'] or 0
+
+
+def _increment(contribution, sign):
+    return {field: F(field) + sign * value for field, value in contribution.items() if value}
+
+
+def apply_delivery(innings, delivery, completes_over):
+    batters = {delivery.batsman_id, delivery.non_striker_id} - {None}
+    BattingLine.objects.bulk_create(
+        [BattingLine(innings=innings, player_id=pid, first_delivery=delivery) for pid in batters],
+        ignore_conflicts=True,
+    )
+    BowlingLine.objects.bulk_create(
+        [BowlingLine(innings=innings, player_id=delivery.bowler_id, first_delivery=delivery)],
+        ignore_conflicts=True,
+    )
+
+    batting = _increment(batting_contribution(delivery), 1)
+    if batting:
+        BattingLine.objects.filter(innings=innings, player_id=delivery.batsman_id).update(**batting)
+
+    bowling = _increment(bowling_contribution(delivery), 1)
+    if completes_over and is_maiden(*over_figures(innings, delivery.over_number, delivery.bowler_id)):
+        bowling['maidens'] = F('maidens') + 1
+    if bowling:
+        BowlingLine.objects.filter(innings=innings, player_id=delivery.bowler_id).update(**bowling)
+
+    if delivery.is_wicket and delivery.player_out_id:
+        BattingLine.objects.filter(innings=innings, player_id=delivery.player_out_id).update(**dismissal(delivery))
+
+
+def revert_delivery(innings, delivery, completed_over):
+    # Must run before the delivery is deleted; lines first created by it are removed by the cascade
+    batting = _increment(batting_contribution(delivery), -1)
+    if batting:
+        BattingLine.objects.filter(innings=innings, player_id=delivery.batsman_id).update(**batting)
+
+    bowling = _increment(bowling_contribution(delivery), -1)
+    if completed_over and is_maiden(*over_figures(innings, delivery.over_number, delivery.bowler_id)):
+        bowling['maidens'] = F('maidens') - 1
+    if bowling:
+        BowlingLine.objects.filter(innings=innings, player_id=delivery.bowler_id).update(**bowling)
+
+    if delivery.is_wicket and delivery.player_out_id:
+        BattingLine.objects.filter(innings=innings, player_id=delivery.player_out_id).update(**NOT_OUT)
+
+
+def build_lines(deliveries):
+    """Aggregates deliveries (in the order they were bowled) into batting and bowling line field dicts."""
+    batting = {}
+    bowling = {}
+    over_balls = {}
+    for d in deliveries:
+        for pid in (d.batsman_id, d.non_striker_id):
+            if pid is not None and pid not in batting:
+                batting[pid] = {'first_delivery_id': d.id, 'runs': 0, 'balls': 0, 'fours': 0, 'sixes': 0, **NOT_OUT}
+        for field, value in batting_contribution(d).items():
+            batting[d.batsman_id][field] += value
+        if d.is_wicket and d.player_out_id in batting:
+            batting[d.player_out_id].update(dismissal(d))
+
+        if d.bowler_id not in bowling:
+            bowling[d.bowler_id] = {'first_delivery_id': d.id, 'maidens': 0, 'legal_balls': 0, 'runs_conceded': 0,
+                                    'wickets': 0, 'dots': 0, 'wides': 0, 'no_balls': 0}
+        contribution = bowling_contribution(d)
+        for field, value in contribution.items():
+            bowling[d.bowler_id][field] += value
+        over = over_balls.setdefault((d.over_number, d.bowler_id), [0, 0])
+        over[0] += contribution['legal_balls']
+        over[1] += contribution['runs_conceded']
+
+    for (_, bowler_id), (legal_balls, runs) in over_balls.items():
+        if is_maiden(legal_balls, runs):
+            bowling[bowler_id]['maidens'] += 1
+    return batting, bowling
+
+
+def rebuild_innings(innings):
+    BattingLine.objects.filter(innings=innings).delete()
+    BowlingLine.objects.filter(innings=innings).delete()
+    batting, bowling = build_lines(innings.deliveries.order_by('id'))
+    BattingLine.objects.bulk_create([BattingLine(innings=innings, player_id=pid, **f) for pid, f in batting.items()])
+    BowlingLine.objects.bulk_create([BowlingLine(innings=innings, player_id=pid, **f) for pid, f in bowling.items()])
@@ -0,0 +1,473 @@
+from django.db.models import F
+
+from .instrumentation import span
+from .jobs import enqueue
+from .history import log_event, log_undone, next_redo, restore_state, take_snapshot
+from .models import Player, Match, Innings, Delivery
+from .prediction import State, get_model, record_prediction, restore_recent_rate, update_recent_rate
+from .scorecard import BALLS_PER_OVER, ILLEGAL_EXTRA_TYPES, apply_delivery, rebuild_innings, revert_delivery
+from .stats import record_match_stats, remove_match_stats
+
+DEFAULT_MAX_OVERS = 20
+DEFAULT_TEST_DAYS = 5
+SESSIONS_PER_DAY = 3
+
+
+class ScoringError(Exception):
+    pass
+
+
+class VersionConflict(ScoringError):
+    def __init__(self, version, expected):
+        super().__init__(f"Match is at version {version}, not {expected}; reload and retry")
+        self.version = version
+
+
+def is_legal(extra_type):
+    return extra_type not in ILLEGAL_EXTRA_TYPES
+
+
+def overs_display(legal_balls):
+    # "overs.balls" notation, e.g. 3.4 for 22 legal balls. For display only, never compare or divide it
+    return f"{legal_balls // BALLS_PER_OVER}.{legal_balls % BALLS_PER_OVER}"
+
+
+def run_rate(runs, legal_balls):
+    return round(runs * BALLS_PER_OVER / legal_balls, 2) if legal_balls else 0.0
+
+
+def max_overs(match):
+    return match.custom_overs if match.custom_overs else DEFAULT_MAX_OVERS
+
+
+def balls_remaining(match, innings):
+    # Only limited-overs innings have a ball limit
+    if match.format != 'T20':
+        return None
+    return max(0, max_overs(match) * BALLS_PER_OVER - innings.legal_balls)
+
+
+def runs_needed(innings):
+    return max(0, innings.target - innings.total_runs) if innings.target is not None else None
+
+
+def required_run_rate(match, innings):
+    needed = runs_needed(innings)
+    balls = balls_remaining(match, innings)
+    if needed is None or not balls:
+        return None
+    return run_rate(needed, balls)
+
+
+def lead(innings):
+    # Negative while the batting side trails; no need to read the earlier innings
+    return innings.lead_at_start + innings.total_runs
+
+
+def test_days(match):
+    return match.days or DEFAULT_TEST_DAYS
+
+
+def follow_on_margin(match):
+    # Law 14.1: 200 runs in a match of five days or more, 150 for three or four days, 100 for two, 75 for one
+    days = test_days(match)
+    return 200 if days >= 5 else 150 if days >= 3 else 100 if days == 2 else 75
+
+
+def over_rate(match, now):
+    """Overs per hour in the current Test session, from the innings counters (match.innings should be prefetched)."""
+    if match.format != 'TEST' or match.session_started_at is None:
+        return None
+    hours = (now - match.session_started_at).total_seconds() / 3600
+    balls = sum(innings.legal_balls for innings in match.innings.all()) - match.session_start_balls
+    return round(balls / BALLS_PER_OVER / hours, 2) if hours > 0 else None
+
+
+def wickets_limit(match, innings):
+    team_size = innings.batting_team_size
+    return team_size if match.last_man_standing else max(0, team_size - 1)
+
+
+def innings_state(match, innings):
+    """The prediction state vector (see api.prediction), None for innings without a ball limit."""
+    if match.format != 'T20':
+        return None
+    return State(innings.total_runs, innings.total_wickets, innings.legal_balls, innings.target,
+                 innings.recent_run_rate, wickets_limit(match, innings), max_overs(match) * BALLS_PER_OVER)
+
+
+def innings_prediction(match, innings):
+    # (projected score, win probability) from the counters alone, for serializers
+    state = innings_state(match, innings)
+    return get_model().predict(state) if state else (None, None)
+
+
+def lock_match(pk):
+    """Locks the match row for the rest of the transaction. Every scoring write takes this lock first, so
+    writes to one match are applied one at a time and each sees the counters left by the previous one.
+    """
+    return Match.objects.select_for_update().get(pk=pk)
+
+
+def check_version(match, expected):
+    # Optimistic check for scorer devices: a write based on an older version of the match is refused
+    if expected is None:
+        return
+    try:
+        expected = int(expected)
+    except (TypeError, ValueError):
+        raise ScoringError("expected_version must be a whole number")
+    if expected != match.version:
+        raise VersionConflict(match.version, expected)
+
+
+def bump_version(match, undo=False):
+    match.version += 1
+    update_fields = ['version']
+    if undo:
+        match.last_undo_version = match.version
+        update_fields.append('last_undo_version')
+    match.save(update_fields=update_fields)
+
+
+def start_innings(match, innings_number, batting_team_id, bowling_team_id, target=None, lead_at_start=0):
+    return Innings.objects.create(
+        match=match,
+        innings_number=innings_number,
+        batting_team_id=batting_team_id,
+        bowling_team_id=bowling_team_id,
+        batting_team_size=Player.objects.filter(team_id=batting_team_id).count(),
+        target=target,
+        lead_at_start=lead_at_start,
+    )
+
+
+def is_innings_over(match, innings):
+    # Only looks at the cached counters on the innings, no queries
+    if innings.total_wickets >= wickets_limit(match, innings):
+        return True
+    if match.format == 'T20' and innings.legal_balls >= max_overs(match) * BALLS_PER_OVER:
+        return True
+    if innings.target is not None and innings.total_runs >= innings.target:
+        return True
+    return False
+
+
+def record_delivery(match, innings, data, client_seq=None, bump=True, event='BALL'):
+    if not innings or innings.is_completed:
+        raise ScoringError("No active innings")
+
+    # Enforce: a bowler cannot bowl consecutive overs
+    start_of_over = (innings.legal_balls % BALLS_PER_OVER) == 0
+    if start_of_over and innings.last_bowler_id and data.get('bowler_id') == innings.last_bowler_id:
+        raise ScoringError("Bowler cannot bowl consecutive overs")
+
+    with span('insert_delivery'):
+        delivery = Delivery.objects.create(
+            innings=innings,
+            over_number=data['over_number'],
+            ball_number=data['ball_number'],
+            batsman_id=data['batsman_id'],
+            # Allow this to be None for Last Man Standing
+            non_striker_id=data.get('non_striker_id'),
+            bowler_id=data['bowler_id'],
+            runs_batter=data.get('runs_batter', 0),
+            extras=data.get('extras', 0),
+            extra_type=data.get('extra_type', 'NONE'),
+            is_wicket=data.get('is_wicket', False),
+            wicket_type=data.get('wicket_type', 'NONE'),
+            player_out_id=data.get('player_out_id'),
+            catcher_id=data.get('catcher_id'),
+            client_seq=client_seq,
+        )
+
+    runs = delivery.runs_batter + delivery.extras
+    wickets = 1 if delivery.is_wicket else 0
+    legal_balls = 1 if is_legal(delivery.extra_type) else 0
+    innings.total_runs += runs
+    innings.total_wickets += wickets
+    if legal_balls:
+        innings.legal_balls += 1
+        innings.last_bowler_id = delivery.bowler_id
+    completes_over = is_legal(delivery.extra_type) and innings.legal_balls % BALLS_PER_OVER == 0
+    with span('scorecard'):
+        apply_delivery(innings, delivery, completes_over)
+    with span('history'):
+        if completes_over:
+            take_snapshot(innings, delivery)
+        log_event(innings, event, delivery)
+    state = innings_state(match, innings)
+    if state:
+        with span('prediction'):
+            innings.recent_run_rate = update_recent_rate(innings.recent_run_rate, runs, legal_balls)
+            record_prediction(innings, delivery, state._replace(recent_run_rate=innings.recent_run_rate))
+
+    if data.get('declare', False):
+        innings.is_declared = True
+    if is_innings_over(match, innings) or innings.is_declared:
+        innings.is_completed = True
+    # Increments rather than the values computed above, so the counters stay exact even for a caller
+    # that did not take the match lock
+    Innings.objects.filter(pk=innings.pk).update(
+        total_runs=F('total_runs') + runs,
+        total_wickets=F('total_wickets') + wickets,
+        legal_balls=F('legal_balls') + legal_balls,
+        last_bowler_id=innings.last_bowler_id,
+        recent_run_rate=innings.recent_run_rate,
+        is_declared=innings.is_declared,
+        is_completed=innings.is_completed,
+    )
+
+    if innings.is_completed:
+        with span('innings_end'):
+            end_innings(match, innings)
+    if bump:
+        bump_version(match)
+    return delivery
+
+
+def record_batch(match, balls):
+    """Applies an ordered batch of queued balls, each tagged with the scorer's sequence number "seq".
+
+    Balls whose seq is already recorded for the match are skipped, so a retried batch is a no-op.
+    Returns (innings, last delivery, applied seqs, skipped seqs). The caller provides the transaction.
+    """
+    if not isinstance(balls, list) or not balls:
+        raise ScoringError("deliveries must be a non-empty list")
+    seqs = []
+    for ball in balls:
+        seq = ball.get('seq') if isinstance(ball, dict) else None
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq < 0:
+            raise ScoringError("Every delivery needs a non-negative integer seq")
+        if seqs and seq <= seqs[-1]:
+            raise ScoringError(f"seq {seq} is out of order")
+        seqs.append(seq)
+
+    recorded = set(Delivery.objects.filter(innings__match=match, client_seq__in=seqs)
+                   .values_list('client_seq', flat=True))
+    innings = match.innings.order_by('-innings_number').first()
+    delivery = None
+    applied, skipped = [], []
+    for ball, seq in zip(balls, seqs):
+        if seq in recorded:
+            skipped.append(seq)
+            continue
+        if innings is not None and innings.is_completed:
+            # The previous ball ended the innings, carry on with the one end_innings started (if any)
+            innings = match.innings.order_by('-innings_number').first()
+        try:
+            delivery = record_delivery(match, innings, ball, client_seq=seq, bump=False)
+        except ScoringError as e:
+            raise ScoringError(f"seq {seq}: {e}")
+        except KeyError as e:
+            raise ScoringError(f"seq {seq}: {e.args[0]} is required")
+        applied.append(seq)
+
+    if applied:
+        # One version bump for the whole batch: observers only need the final state
+        bump_version(match)
+    return innings, delivery, applied, skipped
+
+
+def end_innings(match, innings):
+    """Starts the next innings or decides the match. T20 has two innings, a Test match up to four.
+
+    Everything follows from the counters of the innings that just ended: the side batting next starts
+    with minus the lead of the side that just batted.
+    """
+    # The chart cache is warmed once per innings end; an undo that reopens the innings changes the key
+    enqueue('innings.charts', {'innings_id': innings.id},
+            key=f'innings.charts:{innings.id}:{match.last_undo_version}')
+    number = innings.innings_number
+    trail = -lead(innings)
+    if number == 1:
+        start_innings(match, 2, innings.bowling_team_id, innings.batting_team_id,
+                      target=1 - trail if match.format == 'T20' else None, lead_at_start=trail)
+    elif match.format == 'T20' or number == 4:
+        finish_chase(match, innings)
+    elif number == 2:
+        # The side that batted first bats again, unless it enforces the follow-on (see enforce_follow_on)
+        start_innings(match, 3, innings.bowling_team_id, innings.batting_team_id, lead_at_start=trail)
+    elif trail > 0:
+        # The side yet to bat twice is already ahead
+        complete_match(match, 'WIN', innings.bowling_team_id, 'INNINGS', trail)
+    else:
+        start_innings(match, 4, innings.bowling_team_id, innings.batting_team_id, target=1 - trail,
+                      lead_at_start=trail)
+
+
+def finish_chase(match, innings):
+    if innings.total_runs >= innings.target:
+        complete_match(match, 'WIN', innings.batting_team_id, 'WICKETS',
+                       wickets_limit(match, innings) - innings.total_wickets)
+    elif match.format == 'TEST' and innings.total_wickets < wickets_limit(match, innings):
+        # Declared short of the target with wickets in hand
+        complete_match(match, 'DRAW')
+    elif innings.total_runs == innings.target - 1:
+        complete_match(match, 'TIE')
+    else:
+        complete_match(match, 'WIN', innings.bowling_team_id, 'RUNS', innings.target - 1 - innings.total_runs)
+
+
+def complete_match(match, result, winner_id=None, win_by=None, win_margin=None):
+    match.status = 'COMPLETED'
+    match.result = result
+    match.winner_id = winner_id
+    match.win_by = win_by
+    match.win_margin = win_margin
+    match.save()
+
+    # Awards and the stats rollups run as background jobs (api.tasks), once per completion: a completion
+    # undone and scored again is another version
+    with span('jobs'):
+        for name in ('match.awards', 'match.stats'):
+            enqueue(name, {'match_id': match.id}, key=f'{name}:{match.id}:{match.version}')
+
+
+def declare_innings(match, innings):
+    if match.format != 'TEST':
+        raise ScoringError("Only Test match innings can be declared")
+    if not innings or innings.is_completed:
+        raise ScoringError("No active innings")
+    innings.is_declared = True
+    innings.is_completed = True
+    innings.save(update_fields=['is_declared', 'is_completed'])
+    end_innings(match, innings)
+    bump_version(match)
+
+
+def enforce_follow_on(match, innings):
+    """Swaps the sides of a third innings that has not started: the side that batted second bats again."""
+    if (match.format != 'TEST' or not innings or innings.innings_number != 3 or innings.follow_on
+            or innings.deliveries.exists()):
+        raise ScoringError("The follow-on can only be enforced before the third innings starts")
+    margin = follow_on_margin(match)
+    if innings.lead_at_start < margin:
+        raise ScoringError(f"The follow-on needs a first innings lead of at least {margin}")
+    innings.batting_team_id, innings.bowling_team_id = innings.bowling_team_id, innings.batting_team_id
+    innings.batting_team_size = Player.objects.filter(team_id=innings.batting_team_id).count()
+    innings.lead_at_start = -innings.lead_at_start
+    innings.follow_on = True
+    innings.save()
+    bump_version(match)
+
+
+def close_session(match, innings, now):
+    """Ends the current Test session. Stumps on the last scheduled day draws the match."""
+    if match.format != 'TEST' or match.status != 'LIVE':
+        raise ScoringError("Only a live Test match has sessions")
+    if match.day >= test_days(match) and match.session >= SESSIONS_PER_DAY:
+        if innings and not innings.is_completed:
+            # No more balls; undoing the last one reopens the innings and the match
+            innings.is_completed = True
+            innings.save(update_fields=['is_completed'])
+        complete_match(match, 'DRAW')
+    else:
+        if match.session < SESSIONS_PER_DAY:
+            match.session += 1
+        else:
+            match.day += 1
+            match.session = 1
+        match.session_started_at = now
+        match.session_start_balls = sum(i.legal_balls for i in match.innings.all())
+        match.save(update_fields=['day', 'session', 'session_started_at', 'session_start_balls'])
+    bump_version(match)
+
+
+def leave_rollups(match):
+    # Before an undo changes any line: the rollups subtract the lines that completion added
+    if match.status == 'COMPLETED':
+        remove_match_stats(match)
+
+
+def rejoin_rollups(match):
+    # An undo that leaves the match completed (a Test drawn at the close) counts its corrected lines again
+    if match.status == 'COMPLETED':
+        record_match_stats(match)
+
+
+def reopen(match, innings):
+    # The ball that completed the innings (and maybe the match) is gone, re-evaluate from the counters
+    if innings.is_completed and not is_innings_over(match, innings):
+        innings.is_completed = False
+        innings.is_declared = False
+        if match.status == 'COMPLETED':
+            match.status = 'LIVE'
+            match.result = None
+            match.winner = None
+            match.win_by = None
+            match.win_margin = None
+            match.best_batsman = None
+            match.best_bowler = None
+            match.man_of_match = None
+            match.save()
+
+
+def undo_last_delivery(match, innings):
+    if not innings:
+        raise ScoringError("No innings found")
+    last_delivery = Delivery.objects.filter(innings=innings).order_by('-over_number', '-ball_number', '-id').first()
+    if not last_delivery:
+        raise ScoringError("No deliveries to undo")
+    # Already loaded, spares the delete signals a lookup of the match
+    last_delivery.innings = innings
+
+    completed_over = is_legal(last_delivery.extra_type) and innings.legal_balls % BALLS_PER_OVER == 0
+    leave_rollups(match)
+    with span('scorecard'):
+        revert_delivery(innings, last_delivery, completed_over)
+    with span('history'):
+        log_undone(innings, [last_delivery])
+        # Also removes the snapshot taken if this ball ended an over
+        last_delivery.delete()
+        restore_state(innings)
+    if match.format == 'T20':
+        restore_recent_rate(innings)
+    reopen(match, innings)
+    rejoin_rollups(match)
+    innings.save()
+    bump_version(match, undo=True)
+
+
+def redo_delivery(match, innings):
+    if not innings:
+        raise ScoringError("No innings found")
+    event = next_redo(innings)
+    if event is None:
+        raise ScoringError("Nothing to redo")
+    # Recorded again through the normal path, so completion, the next innings and awards follow as usual
+    return record_delivery(match, innings, event.payload, client_seq=event.payload.get('client_seq'), event='REDO')
+
+
+def rewind_to_over(match, innings, over):
+    """Removes every ball from the start of the given over (0-based, like Delivery.over_number) onwards.
+
+    Each removed ball is logged as an UNDO, so redo steps forward through them again.
+    """
+    if not innings:
+        raise ScoringError("No innings found")
+    if over < 0 or over * BALLS_PER_OVER > innings.legal_balls:
+        raise ScoringError(f"Over {over} has not been bowled")
+    since = 0
+    if over:
+        snapshot = innings.snapshots.filter(legal_balls=over * BALLS_PER_OVER).first()
+        if snapshot is None:
+            raise ScoringError(f"No snapshot for the end of over {over - 1}")
+        since = snapshot.last_delivery_id
+
+    removed = list(Delivery.objects.filter(innings=innings, id__gt=since).order_by('-id'))
+    if not removed:
+        raise ScoringError("No deliveries to undo")
+    leave_rollups(match)
+    log_undone(innings, removed)
+    Delivery.objects.filter(id__in=[d.id for d in removed]).delete()
+
+    rebuild_innings(innings)
+    restore_state(innings)
+    if match.format == 'T20':
+        restore_recent_rate(innings)
+    reopen(match, innings)
+    rejoin_rollups(match)
+    innings.save()
+    bump_version(match, undo=True)
+    return removed
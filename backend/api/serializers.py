@@ -1,5 +1,8 @@
+from django.db.models import Prefetch
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Team, Player, Match, Innings, Delivery
+from .models import Team, Player, Match, Innings, Delivery, BattingLine, BowlingLine, Tournament, PlayerStats, TeamStats
+from .scoring import balls_remaining, innings_prediction, lead, over_rate, overs_display, required_run_rate, run_rate, runs_needed
 
 class PlayerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,12 +16,70 @@ class TeamSerializer(serializers.ModelSerializer):
         model = Team
         fields = ['id', 'name', 'players']
 
+class TournamentSerializer(serializers.ModelSerializer):
+    matches = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Tournament
+        fields = ['id', 'name', 'created_at', 'matches']
+
 class DeliverySerializer(serializers.ModelSerializer):
     class Meta:
         model = Delivery
         fields = '__all__'
 
-class InningsSerializer(serializers.ModelSerializer):
+class InningsProgressFields(serializers.Serializer):
+    # Derived from the legal ball counter so clients never parse or divide the "overs.balls" notation.
+    # innings.match is cached by the innings prefetches, these add no queries.
+    overs = serializers.SerializerMethodField()
+    run_rate = serializers.SerializerMethodField()
+    runs_needed = serializers.SerializerMethodField()
+    balls_remaining = serializers.SerializerMethodField()
+    required_run_rate = serializers.SerializerMethodField()
+    lead = serializers.SerializerMethodField()
+    projected_score = serializers.SerializerMethodField()
+    win_probability = serializers.SerializerMethodField()
+
+    def get_overs(self, obj):
+        return overs_display(obj.legal_balls)
+
+    def get_run_rate(self, obj):
+        return run_rate(obj.total_runs, obj.legal_balls)
+
+    def get_runs_needed(self, obj):
+        return runs_needed(obj)
+
+    def get_balls_remaining(self, obj):
+        return balls_remaining(obj.match, obj)
+
+    def get_required_run_rate(self, obj):
+        return required_run_rate(obj.match, obj)
+
+    def get_lead(self, obj):
+        return lead(obj)
+
+    def get_projected_score(self, obj):
+        return innings_prediction(obj.match, obj)[0]
+
+    def get_win_probability(self, obj):
+        # The batting side's, from the prediction table (see api.prediction)
+        return innings_prediction(obj.match, obj)[1]
+
+PROGRESS_FIELDS = ['legal_balls', 'overs', 'run_rate', 'target', 'runs_needed', 'balls_remaining', 'required_run_rate',
+                   'lead', 'follow_on', 'projected_score', 'win_probability']
+
+# Result and Test match day/session state, shared by the match payloads
+RESULT_FIELDS = ['result', 'win_by', 'win_margin']
+SESSION_FIELDS = ['days', 'day', 'session', 'over_rate']
+
+class OverRateField(serializers.Serializer):
+    # Overs per hour this session, from the innings counters (prefetched by every view that renders it)
+    over_rate = serializers.SerializerMethodField()
+
+    def get_over_rate(self, obj):
+        return over_rate(obj, timezone.now())
+
+class InningsSerializer(InningsProgressFields, serializers.ModelSerializer):
     batting_team_name = serializers.CharField(source='batting_team.name', read_only=True)
     bowling_team_name = serializers.CharField(source='bowling_team.name', read_only=True)
     deliveries = DeliverySerializer(many=True, read_only=True)
@@ -27,9 +88,39 @@ class InningsSerializer(serializers.ModelSerializer):
         model = Innings
         fields = ['id', 'match', 'innings_number', 'batting_team', 'bowling_team', 
                   'batting_team_name', 'bowling_team_name', 'is_declared', 'is_completed',
-                  'total_runs', 'total_wickets', 'overs_bowled', 'deliveries']
+                  'total_runs', 'total_wickets', *PROGRESS_FIELDS, 'deliveries']
 
-class MatchSerializer(serializers.ModelSerializer):
+class InningsSummarySerializer(InningsProgressFields, serializers.ModelSerializer):
+    class Meta:
+        model = Innings
+        fields = ['id', 'innings_number', 'batting_team', 'bowling_team', 'is_declared', 'is_completed',
+                  'total_runs', 'total_wickets', *PROGRESS_FIELDS]
+
+class LiveStateSerializer(OverRateField, serializers.ModelSerializer):
+    # Compact polling payload: no rosters and no deliveries, so its size does not grow during a match
+    innings = InningsSummarySerializer(many=True, read_only=True)
+    last_delivery_id = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Match
+        fields = ['id', 'format', 'custom_overs', 'last_man_standing', 'status', 'toss_winner', 'toss_decision',
+                  'winner', *RESULT_FIELDS, *SESSION_FIELDS, 'version', 'last_undo_version', 'last_delivery_id',
+                  'innings']
+
+class MatchSummarySerializer(serializers.ModelSerializer):
+    # List view projection: team names and innings totals, no rosters or deliveries
+    team_a_name = serializers.CharField(source='team_a.name', read_only=True)
+    team_b_name = serializers.CharField(source='team_b.name', read_only=True)
+    winner_name = serializers.CharField(source='winner.name', read_only=True, default=None)
+    innings = InningsSummarySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Match
+        fields = ['id', 'format', 'custom_overs', 'last_man_standing', 'tournament', 'status', 'created_at',
+                  'team_a', 'team_b', 'team_a_name', 'team_b_name', 'winner', 'winner_name', *RESULT_FIELDS,
+                  'innings']
+
+class MatchSerializer(OverRateField, serializers.ModelSerializer):
     team_a_details = TeamSerializer(source='team_a', read_only=True)
     team_b_details = TeamSerializer(source='team_b', read_only=True)
     innings = InningsSerializer(many=True, read_only=True)
@@ -41,10 +132,127 @@ class MatchSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Match
-        fields = ['id', 'format', 'custom_overs', 'last_man_standing', 'team_a', 'team_b', 
+        fields = ['id', 'format', 'custom_overs', 'last_man_standing', 'tournament', 'team_a', 'team_b',
                   'team_a_details', 'team_b_details', 'toss_winner', 'toss_decision', 
-                  'status', 'winner', 'winner_details', 
+                  'status', 'winner', 'winner_details', *RESULT_FIELDS, *SESSION_FIELDS,
                   'man_of_match', 'man_of_match_details',
                   'best_batsman', 'best_batsman_details',
                   'best_bowler', 'best_bowler_details',
-                  'innings']
+                  'version', 'last_undo_version', 'innings']
+
+class BattingLineSerializer(serializers.ModelSerializer):
+    player_name = serializers.CharField(source='player.name', read_only=True)
+    strike_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BattingLine
+        fields = ['player', 'player_name', 'runs', 'balls', 'fours', 'sixes', 'strike_rate',
+                  'is_out', 'wicket_type', 'dismissed_by', 'caught_by']
+
+    def get_strike_rate(self, obj):
+        return round(obj.runs * 100 / obj.balls, 2) if obj.balls else 0.0
+
+class BowlingLineSerializer(serializers.ModelSerializer):
+    player_name = serializers.CharField(source='player.name', read_only=True)
+    overs = serializers.SerializerMethodField()
+    economy = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BowlingLine
+        fields = ['player', 'player_name', 'overs', 'legal_balls', 'maidens', 'runs_conceded', 'wickets',
+                  'economy', 'dots', 'wides', 'no_balls']
+
+    def get_overs(self, obj):
+        return overs_display(obj.legal_balls)
+
+    def get_economy(self, obj):
+        return run_rate(obj.runs_conceded, obj.legal_balls)
+
+class InningsScorecardSerializer(InningsProgressFields, serializers.ModelSerializer):
+    batting_team_name = serializers.CharField(source='batting_team.name', read_only=True)
+    bowling_team_name = serializers.CharField(source='bowling_team.name', read_only=True)
+    extras = serializers.SerializerMethodField()
+    batting = BattingLineSerializer(source='batting_lines', many=True, read_only=True)
+    bowling = BowlingLineSerializer(source='bowling_lines', many=True, read_only=True)
+
+    class Meta:
+        model = Innings
+        fields = ['id', 'innings_number', 'batting_team', 'bowling_team', 'batting_team_name', 'bowling_team_name',
+                  'is_declared', 'is_completed', 'total_runs', 'total_wickets', *PROGRESS_FIELDS,
+                  'extras', 'batting', 'bowling']
+
+    def get_extras(self, obj):
+        return obj.total_runs - sum(line.runs for line in obj.batting_lines.all())
+
+class ScorecardSerializer(serializers.ModelSerializer):
+    innings = InningsScorecardSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Match
+        fields = ['id', 'format', 'status', 'team_a', 'team_b', 'winner', *RESULT_FIELDS,
+                  'man_of_match', 'best_batsman', 'best_bowler', 'innings']
+
+class PlayerStatsSerializer(serializers.ModelSerializer):
+    # Averages and rates are derived from the rolled-up counters, nothing here reads deliveries
+    player_name = serializers.CharField(source='player.name', read_only=True)
+    team = serializers.IntegerField(source='player.team_id', read_only=True)
+    team_name = serializers.CharField(source='player.team.name', read_only=True)
+    batting_average = serializers.SerializerMethodField()
+    strike_rate = serializers.SerializerMethodField()
+    bowling_average = serializers.SerializerMethodField()
+    economy = serializers.SerializerMethodField()
+    best_bowling = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PlayerStats
+        fields = ['player', 'player_name', 'team', 'team_name', 'tournament', 'matches',
+                  'batting_innings', 'runs', 'balls', 'fours', 'sixes', 'outs', 'fifties', 'hundreds',
+                  'highest_score', 'batting_average', 'strike_rate',
+                  'bowling_innings', 'legal_balls', 'maidens', 'runs_conceded', 'wickets', 'best_bowling',
+                  'bowling_average', 'economy', 'catches']
+
+    def get_batting_average(self, obj):
+        return round(obj.runs / obj.outs, 2) if obj.outs else None
+
+    def get_strike_rate(self, obj):
+        return round(obj.runs * 100 / obj.balls, 2) if obj.balls else 0.0
+
+    def get_bowling_average(self, obj):
+        return round(obj.runs_conceded / obj.wickets, 2) if obj.wickets else None
+
+    def get_economy(self, obj):
+        return run_rate(obj.runs_conceded, obj.legal_balls)
+
+    def get_best_bowling(self, obj):
+        return f"{obj.best_wickets}/{obj.best_runs}" if obj.best_runs is not None else None
+
+class TeamStatsSerializer(serializers.ModelSerializer):
+    team_name = serializers.CharField(source='team.name', read_only=True)
+    net_run_rate = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TeamStats
+        fields = ['team', 'team_name', 'tournament', 'played', 'won', 'lost', 'tied', 'drawn', 'runs_scored',
+                  'balls_faced', 'runs_conceded', 'balls_bowled', 'net_run_rate']
+
+    def get_net_run_rate(self, obj):
+        return round(run_rate(obj.runs_scored, obj.balls_faced) - run_rate(obj.runs_conceded, obj.balls_bowled), 3)
+
+def with_match_prefetch(queryset):
+    """Prefetch plan for MatchSerializer: a fixed number of queries however many players and deliveries."""
+    return queryset.select_related(
+        'team_a', 'team_b', 'winner', 'man_of_match', 'best_batsman', 'best_bowler',
+    ).prefetch_related(
+        'team_a__players', 'team_b__players', 'winner__players',
+        Prefetch('innings', queryset=Innings.objects.select_related('batting_team', 'bowling_team')
+                 .prefetch_related('deliveries')),
+    )
+
+def with_scorecard_prefetch(queryset):
+    """Prefetch plan for ScorecardSerializer."""
+    # Per-player lines are maintained ball by ball, so this reads a few rows per player instead of every delivery
+    innings = Innings.objects.select_related('batting_team', 'bowling_team').prefetch_related(
+        Prefetch('batting_lines', queryset=BattingLine.objects.select_related('player')),
+        Prefetch('bowling_lines', queryset=BowlingLine.objects.select_related('player')),
+    )
+    return queryset.prefetch_related(Prefetch('innings', queryset=innings))
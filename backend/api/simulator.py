@@ -0,0 +1,274 @@
+import json
+import random
+import threading
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .scoring import BALLS_PER_OVER
+
+# Deterministic ball-by-ball simulation through the real endpoints, for load tests and benchmarks.
+# Every outcome comes from a seeded Random, so the same seed scores the same match ball for ball.
+
+SCENARIOS = {
+    't20': {'format': 'T20', 'custom_overs': None, 'last_man_standing': False},
+    'custom': {'format': 'T20', 'custom_overs': 5, 'last_man_standing': False},
+    'last_man_standing': {'format': 'T20', 'custom_overs': 5, 'last_man_standing': True},
+}
+# (runs, weight) off the bat on a legal ball
+RUN_WEIGHTS = ((0, 35), (1, 30), (2, 10), (3, 2), (4, 15), (6, 8))
+# (extra type, probability); byes and leg byes also count towards the over
+EXTRA_RATES = (('WD', 0.04), ('NB', 0.02), ('LB', 0.02), ('B', 0.01))
+WICKET_RATE = 0.05
+WICKET_WEIGHTS = (('CAUGHT', 45), ('BOWLED', 20), ('LBW', 15), ('RUN_OUT', 10), ('STUMPED', 6), ('HIT_WICKET', 4))
+BOWLERS = 5
+
+
+class Recorder:
+    """Latency, query count and payload size per endpoint, collected from any number of threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def call(self, endpoint, request):
+        # The connection is per thread, so only this request's queries are captured
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = request()
+            elapsed = (time.perf_counter() - started) * 1000
+        size = len(response.content) if not response.streaming else 0
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((elapsed, len(ctx.captured_queries), size))
+        if response.status_code >= 400:
+            raise RuntimeError(f"{endpoint} returned {response.status_code}: {response.content[:200]!r}")
+        return response
+
+    def summary(self):
+        return {endpoint: summarize(samples) for endpoint, samples in sorted(self.samples.items())}
+
+
+def percentile(values, p):
+    # Nearest rank on sorted values
+    return values[min(len(values) - 1, max(0, int(round(p * len(values))) - 1))]
+
+
+def summarize(samples):
+    latencies = sorted(s[0] for s in samples)
+    queries = [s[1] for s in samples]
+    sizes = [s[2] for s in samples]
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+        'mean_bytes': round(sum(sizes) / len(sizes)),
+        'max_bytes': max(sizes),
+    }
+
+
+class SimulatedMatch:
+    """Creates a match and scores it to the end like the scorer UI: strike rotation, bowler changes,
+    extras, wickets with catchers and the occasional undo.
+    """
+
+    def __init__(self, recorder, seed, scenario='custom', players=11, undo_rate=0.02, client=None):
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.scenario = SCENARIOS[scenario]
+        self.players = players
+        self.undo_rate = undo_rate
+        self.client = client or Client()
+        self.match_id = None
+        self.data = None
+
+    def post(self, endpoint, url, payload=None):
+        response = self.recorder.call(endpoint, lambda: self.client.post(
+            url, json.dumps(payload or {}), content_type='application/json'))
+        return response.json()
+
+    def create(self):
+        tag = self.rng.randrange(10 ** 6)
+        data = self.post('create', '/api/matches/', {
+            **self.scenario,
+            'team_a': {'name': f'Sim A{tag}', 'players': [{'name': f'A{tag}-{i}'} for i in range(self.players)]},
+            'team_b': {'name': f'Sim B{tag}', 'players': [{'name': f'B{tag}-{i}'} for i in range(self.players)]},
+        })
+        self.match_id = data['id']
+        self.squads = {
+            data['team_a']: [p['id'] for p in data['team_a_details']['players']],
+            data['team_b']: [p['id'] for p in data['team_b_details']['players']],
+        }
+        winner = self.rng.choice((data['team_a'], data['team_b']))
+        self.data = self.post('toss', f'/api/matches/{self.match_id}/toss/', {
+            'winner_id': winner, 'decision': self.rng.choice(('BAT', 'BOWL')),
+        })
+        self.start_innings()
+        return self.match_id
+
+    @property
+    def innings(self):
+        return self.data['innings'][-1]
+
+    @property
+    def finished(self):
+        return self.data['status'] == 'COMPLETED'
+
+    def start_innings(self):
+        batters = self.squads[self.innings['batting_team']]
+        self.state = {
+            'striker': batters[0],
+            'non_striker': batters[1],
+            'next_batter': 2,
+            'innings': len(self.data['innings']),
+        }
+        self.batters = batters
+        self.bowlers = self.squads[self.innings['bowling_team']][-BOWLERS:]
+
+    def next_ball(self):
+        """The payload for the next ball and the state after it, without sending anything."""
+        rng = self.rng
+        state = dict(self.state)
+        over, ball = divmod(self.innings['legal_balls'], BALLS_PER_OVER)
+        bowler = self.bowlers[over % len(self.bowlers)]
+        payload = {
+            'over_number': over,
+            'ball_number': ball + 1,
+            'batsman_id': state['striker'],
+            'non_striker_id': state['non_striker'],
+            'bowler_id': bowler,
+            'runs_batter': 0,
+            'extras': 0,
+            'extra_type': 'NONE',
+        }
+
+        roll = rng.random()
+        for extra_type, rate in EXTRA_RATES:
+            if roll < rate:
+                payload['extra_type'] = extra_type
+                break
+            roll -= rate
+        runs = rng.choices([r for r, _ in RUN_WEIGHTS], [w for _, w in RUN_WEIGHTS])[0]
+        if payload['extra_type'] == 'WD':
+            payload['extras'] = 1
+        elif payload['extra_type'] == 'NB':
+            payload['extras'] = 1
+            payload['runs_batter'] = runs
+        elif payload['extra_type'] in ('B', 'LB'):
+            payload['extras'] = rng.choice((1, 1, 2, 4))
+        else:
+            payload['runs_batter'] = runs
+
+        legal = payload['extra_type'] not in ('WD', 'NB')
+        if legal and rng.random() < WICKET_RATE:
+            wicket_type = rng.choices([w for w, _ in WICKET_WEIGHTS], [w for _, w in WICKET_WEIGHTS])[0]
+            out = state['striker']
+            if wicket_type == 'RUN_OUT' and state['non_striker'] is not None and rng.random() < 0.5:
+                out = state['non_striker']
+            payload.update({'is_wicket': True, 'wicket_type': wicket_type, 'player_out_id': out})
+            if wicket_type == 'CAUGHT':
+                payload['catcher_id'] = rng.choice([p for p in self.squads[self.innings['bowling_team']]
+                                                    if p != bowler])
+            if wicket_type != 'RUN_OUT':
+                payload['runs_batter'] = 0
+
+        ran = payload['runs_batter'] + (payload['extras'] if payload['extra_type'] in ('B', 'LB') else 0)
+        if ran % 2 and state['non_striker'] is not None:
+            state['striker'], state['non_striker'] = state['non_striker'], state['striker']
+        if payload.get('is_wicket'):
+            incoming = self.batters[state['next_batter']] if state['next_batter'] < len(self.batters) else None
+            state['next_batter'] += 1
+            if payload['player_out_id'] == state['striker']:
+                state['striker'] = incoming
+            else:
+                state['non_striker'] = incoming
+            if state['striker'] is None:
+                # Last man standing: the survivor faces every ball
+                state['striker'], state['non_striker'] = state['non_striker'], None
+        if legal and ball + 1 == BALLS_PER_OVER and state['non_striker'] is not None:
+            state['striker'], state['non_striker'] = state['non_striker'], state['striker']
+        return payload, state
+
+    def step(self):
+        """Bowls one ball, sometimes undoing it straight away. Returns False once the match is over."""
+        payload, state = self.next_ball()
+        previous = self.state
+        self.data = self.post('bowl', f'/api/matches/{self.match_id}/bowl/', payload)
+        self.state = state
+        if self.finished:
+            return False
+        if len(self.data['innings']) != state['innings']:
+            self.start_innings()
+        elif self.rng.random() < self.undo_rate:
+            self.data = self.post('undo', f'/api/matches/{self.match_id}/undo/')
+            self.state = previous
+        return True
+
+    def play(self):
+        while self.step():
+            pass
+
+
+class Spectator:
+    """Polls the read endpoints of random matches the way the live page and history page do."""
+
+    ENDPOINTS = (('detail', '/api/matches/{}/'), ('live', '/api/matches/{}/live/'),
+                 ('scorecard', '/api/matches/{}/scorecard/'), ('charts', '/api/matches/{}/charts/'))
+
+    def __init__(self, recorder, seed, match_ids, client=None):
+        self.recorder = recorder
+        self.rng = random.Random(seed)
+        self.match_ids = match_ids
+        self.client = client or Client()
+
+    def poll(self):
+        match_id = self.rng.choice(self.match_ids)
+        for endpoint, url in self.ENDPOINTS:
+            self.recorder.call(endpoint, lambda: self.client.get(url.format(match_id)))
+        if self.rng.random() < 0.2:
+            self.recorder.call('list', lambda: self.client.get('/api/matches/'))
+
+    def watch(self, stop, interval=0.0):
+        while not stop.is_set():
+            self.poll()
+            if interval:
+                stop.wait(interval)
+
+
+def run_load(matches=6, spectators=20, seed=1, scenarios=tuple(SCENARIOS), players=11, poll_interval=0.0,
+             undo_rate=0.02):
+    """Scores every match to completion on its own thread while spectator threads poll. Returns the Recorder."""
+    recorder = Recorder()
+    simulated = [SimulatedMatch(recorder, seed * 1000 + i, scenarios[i % len(scenarios)], players, undo_rate)
+                 for i in range(matches)]
+    match_ids = [sim.create() for sim in simulated]
+    stop = threading.Event()
+    errors = []
+
+    def worker(target, *args):
+        try:
+            target(*args)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            connection.close()
+
+    watchers = [threading.Thread(target=worker, args=(Spectator(recorder, seed * 1000 + i, match_ids).watch,
+                                                      stop, poll_interval))
+                for i in range(spectators)]
+    scorers = [threading.Thread(target=worker, args=(sim.play,)) for sim in simulated]
+    for thread in watchers + scorers:
+        thread.start()
+    for thread in scorers:
+        thread.join()
+    stop.set()
+    for thread in watchers:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return recorder
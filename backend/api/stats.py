@@ -0,0 +1,203 @@
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import Match, Innings, Player, BattingLine, BowlingLine, PlayerStats, TeamStats
+
+PLAYER_COUNTERS = ('matches', 'batting_innings', 'runs', 'balls', 'fours', 'sixes', 'outs', 'fifties', 'hundreds',
+                   'bowling_innings', 'legal_balls', 'maidens', 'runs_conceded', 'wickets', 'catches')
+PLAYER_BESTS = ('highest_score', 'best_wickets', 'best_runs')
+TEAM_COUNTERS = ('played', 'won', 'lost', 'tied', 'drawn', 'runs_scored', 'balls_faced', 'runs_conceded',
+                 'balls_bowled')
+
+
+def scopes(tournament_id):
+    # Every match counts towards the career totals, and towards its tournament if it has one
+    return (None,) if tournament_id is None else (None, tournament_id)
+
+
+def empty_player():
+    return {**dict.fromkeys(PLAYER_COUNTERS, 0), 'highest_score': 0, 'best_wickets': 0, 'best_runs': None}
+
+
+def empty_team():
+    return dict.fromkeys(TEAM_COUNTERS, 0)
+
+
+def better_bowling(wickets, runs, row):
+    # Most wickets, then fewest runs
+    if row['best_runs'] is None or wickets > row['best_wickets']:
+        return True
+    return wickets == row['best_wickets'] and runs < row['best_runs']
+
+
+def add_batting_best(row, runs):
+    row['highest_score'] = max(row['highest_score'], runs)
+
+
+def add_bowling_best(row, wickets, runs):
+    if better_bowling(wickets, runs, row):
+        row['best_wickets'], row['best_runs'] = wickets, runs
+
+
+def collect(matches):
+    """Rollup field dicts for a queryset of completed matches.
+
+    Returns ({(player_id, tournament_id): fields}, {(team_id, tournament_id): fields}), where a None
+    tournament is the career scope. Five queries, however many matches the queryset covers.
+    """
+    players = defaultdict(empty_player)
+    teams = defaultdict(empty_team)
+    tournament_of = {}
+
+    match_rows = list(matches.values('id', 'tournament_id', 'team_a_id', 'team_b_id', 'winner_id', 'result'))
+    squads = defaultdict(list)
+    for player_id, team_id in (Player.objects.filter(Q(team_id__in=matches.values('team_a_id'))
+                                                     | Q(team_id__in=matches.values('team_b_id')))
+                               .values_list('id', 'team_id')):
+        squads[team_id].append(player_id)
+
+    for match in match_rows:
+        tournament_of[match['id']] = match['tournament_id']
+        for team_id in (match['team_a_id'], match['team_b_id']):
+            for scope in scopes(match['tournament_id']):
+                row = teams[(team_id, scope)]
+                row['played'] += 1
+                if match['result'] == 'DRAW':
+                    row['drawn'] += 1
+                elif match['winner_id'] is None:
+                    row['tied'] += 1
+                elif match['winner_id'] == team_id:
+                    row['won'] += 1
+                else:
+                    row['lost'] += 1
+                for player_id in squads[team_id]:
+                    players[(player_id, scope)]['matches'] += 1
+
+    for innings in Innings.objects.filter(match__in=matches).values(
+            'match_id', 'batting_team_id', 'bowling_team_id', 'total_runs', 'legal_balls'):
+        for scope in scopes(tournament_of[innings['match_id']]):
+            batting = teams[(innings['batting_team_id'], scope)]
+            batting['runs_scored'] += innings['total_runs']
+            batting['balls_faced'] += innings['legal_balls']
+            bowling = teams[(innings['bowling_team_id'], scope)]
+            bowling['runs_conceded'] += innings['total_runs']
+            bowling['balls_bowled'] += innings['legal_balls']
+
+    for line in BattingLine.objects.filter(innings__match__in=matches).values(
+            'player_id', 'runs', 'balls', 'fours', 'sixes', 'is_out', 'wicket_type', 'caught_by_id',
+            'innings__match_id'):
+        for scope in scopes(tournament_of[line['innings__match_id']]):
+            row = players[(line['player_id'], scope)]
+            row['batting_innings'] += 1
+            for field in ('runs', 'balls', 'fours', 'sixes'):
+                row[field] += line[field]
+            row['outs'] += line['is_out']
+            row['fifties'] += 50 <= line['runs'] < 100
+            row['hundreds'] += line['runs'] >= 100
+            add_batting_best(row, line['runs'])
+            if line['wicket_type'] == 'CAUGHT' and line['caught_by_id']:
+                players[(line['caught_by_id'], scope)]['catches'] += 1
+
+    for line in BowlingLine.objects.filter(innings__match__in=matches).values(
+            'player_id', 'legal_balls', 'maidens', 'runs_conceded', 'wickets', 'innings__match_id'):
+        for scope in scopes(tournament_of[line['innings__match_id']]):
+            row = players[(line['player_id'], scope)]
+            row['bowling_innings'] += 1
+            for field in ('legal_balls', 'maidens', 'runs_conceded', 'wickets'):
+                row[field] += line[field]
+            add_bowling_best(row, line['wickets'], line['runs_conceded'])
+
+    return players, teams
+
+
+def recorded_bests(player_ids):
+    """Best figures of the given players over the matches still counted in the rollups."""
+    bests = defaultdict(lambda: {'highest_score': 0, 'best_wickets': 0, 'best_runs': None})
+    for line in BattingLine.objects.filter(player_id__in=player_ids, innings__match__stats_recorded=True).values(
+            'player_id', 'runs', 'innings__match__tournament_id'):
+        for scope in scopes(line['innings__match__tournament_id']):
+            add_batting_best(bests[(line['player_id'], scope)], line['runs'])
+    for line in BowlingLine.objects.filter(player_id__in=player_ids, innings__match__stats_recorded=True).values(
+            'player_id', 'wickets', 'runs_conceded', 'innings__match__tournament_id'):
+        for scope in scopes(line['innings__match__tournament_id']):
+            add_bowling_best(bests[(line['player_id'], scope)], line['wickets'], line['runs_conceded'])
+    return bests
+
+
+def merge(model, owner, rows, counters, sign, bests=None):
+    """Adds (sign=1) or subtracts (sign=-1) rollup rows into the stats table, locking the rows it touches.
+
+    Best figures are kept as the maximum on the way in; on the way out they are replaced from bests.
+    """
+    if not rows:
+        return
+    owner_ids = {key[0] for key in rows}
+    tournament_ids = {key[1] for key in rows} - {None}
+    # Make sure every row exists, so concurrent completions only ever update
+    model.objects.bulk_create([model(**{f'{owner}_id': owner_id, 'tournament_id': tournament_id})
+                               for owner_id, tournament_id in rows], ignore_conflicts=True)
+    existing = (model.objects.select_for_update()
+                .filter(**{f'{owner}_id__in': owner_ids})
+                .filter(Q(tournament__isnull=True) | Q(tournament_id__in=tournament_ids)))
+
+    changed, emptied = [], []
+    for stats in existing:
+        key = (getattr(stats, f'{owner}_id'), stats.tournament_id)
+        if key not in rows:
+            continue
+        for field in counters:
+            setattr(stats, field, getattr(stats, field) + sign * rows[key][field])
+        if model is PlayerStats:
+            if sign > 0:
+                stats.highest_score = max(stats.highest_score, rows[key]['highest_score'])
+                if rows[key]['best_runs'] is not None and better_bowling(
+                        rows[key]['best_wickets'], rows[key]['best_runs'], {f: getattr(stats, f) for f in PLAYER_BESTS}):
+                    stats.best_wickets, stats.best_runs = rows[key]['best_wickets'], rows[key]['best_runs']
+            else:
+                for field, value in bests[key].items():
+                    setattr(stats, field, value)
+        (emptied if getattr(stats, counters[0]) <= 0 else changed).append(stats)
+
+    fields = list(counters) + (list(PLAYER_BESTS) if model is PlayerStats else [])
+    model.objects.bulk_update(changed, fields)
+    if emptied:
+        model.objects.filter(id__in=[stats.id for stats in emptied]).delete()
+
+
+def record_match_stats(match):
+    """Adds a completed match to the player and team rollups. Does nothing if it is already counted."""
+    if match.stats_recorded:
+        return
+    players, teams = collect(Match.objects.filter(pk=match.pk))
+    Match.objects.filter(pk=match.pk).update(stats_recorded=True)
+    match.stats_recorded = True
+    merge(PlayerStats, 'player', players, PLAYER_COUNTERS, 1)
+    merge(TeamStats, 'team', teams, TEAM_COUNTERS, 1)
+
+
+def remove_match_stats(match):
+    """Takes a match back out of the rollups, e.g. when undo reopens it. Call before its result is cleared."""
+    if not match.stats_recorded:
+        return
+    players, teams = collect(Match.objects.filter(pk=match.pk))
+    Match.objects.filter(pk=match.pk).update(stats_recorded=False)
+    match.stats_recorded = False
+    bests = recorded_bests({player_id for player_id, _ in players})
+    merge(PlayerStats, 'player', players, PLAYER_COUNTERS, -1, bests)
+    merge(TeamStats, 'team', teams, TEAM_COUNTERS, -1)
+
+
+def rebuild_stats():
+    """Recomputes every rollup from the completed matches. The caller provides the transaction."""
+    PlayerStats.objects.all().delete()
+    TeamStats.objects.all().delete()
+    Match.objects.exclude(status='COMPLETED').filter(stats_recorded=True).update(stats_recorded=False)
+    completed = Match.objects.filter(status='COMPLETED')
+    players, teams = collect(completed)
+    PlayerStats.objects.bulk_create([PlayerStats(player_id=player_id, tournament_id=tournament_id, **fields)
+                                     for (player_id, tournament_id), fields in players.items()], batch_size=500)
+    TeamStats.objects.bulk_create([TeamStats(team_id=team_id, tournament_id=tournament_id, **fields)
+                                   for (team_id, tournament_id), fields in teams.items()], batch_size=500)
+    completed.update(stats_recorded=True)
+    return len(players), len(teams)
@@ -0,0 +1,46 @@
+from django.db import transaction
+from django.db.models import F
+
+from .awards import compute_awards
+from .broadcast import publish_match_event
+from .charts import innings_charts
+from .jobs import task
+from .models import Innings, Match
+from .stats import record_match_stats
+
+# Post-processing queued by scoring (see api.jobs). A job may run after an undo reopened the match or after
+# it was deleted, so each one locks the match and checks it is still in the state that queued the job.
+
+
+def completed_match(match_id):
+    return Match.objects.select_for_update().filter(pk=match_id, status='COMPLETED').first()
+
+
+@task('match.awards')
+def match_awards(match_id):
+    match = completed_match(match_id)
+    if match is not None:
+        compute_awards(match)
+        # A new version, so polling and live clients refetch the match with its awards; the save drops the
+        # cached match responses (api.response_cache)
+        Match.objects.filter(pk=match.pk).update(version=F('version') + 1)
+        match.refresh_from_db(fields=['version'])
+        match.save(update_fields=['best_batsman', 'best_bowler', 'man_of_match'])
+        transaction.on_commit(lambda: publish_match_event(match, 'awards'))
+
+
+@task('match.stats')
+def match_stats(match_id):
+    # record_match_stats skips a match that is already counted
+    match = completed_match(match_id)
+    if match is not None:
+        record_match_stats(match)
+
+
+@task('innings.charts')
+def warm_innings_charts(innings_id):
+    # Folds the whole innings into the chart cache so the first chart read after it ends costs nothing
+    innings = Innings.objects.select_related('match').filter(pk=innings_id, is_completed=True).first()
+    if innings is not None:
+        innings_charts(innings.match, innings)
+
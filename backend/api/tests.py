@@ -1,3 +1,1885 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import importlib.util
+import io
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import Match, Player, Team, Tournament, Delivery, BattingLine, BowlingLine, InningsSnapshot, PlayerStats, TeamStats, BallPrediction, Job
+from .async_views import write_pool
+from .broadcast import InProcessBroadcaster, get_broadcaster
+from .db_router import PIN_HEADER, reading_replica
+from .export import UNKNOWN_CODE, innings_series, npy_header, read_npz
+from .instrumentation import registry, span
+from .jobs import ThreadPoolQueue, enqueue, get_queue, run_due, shutdown_queue, task
+from .history import build_snapshots, empty_state, replay
+from .prediction import PredictionModel, State, get_model, load_model
+from .scorecard import rebuild_innings
+from .scoring import record_delivery, undo_last_delivery
+from .simulator import SCENARIOS, Recorder, SimulatedMatch, run_load
+from .urls import build_urlpatterns
+
+# TestCase never commits, so the default queue would never run the post-processing these tests check
+INLINE_JOBS = {'BACKEND': 'api.jobs.ImmediateQueue'}
+
+
+def create_match(format='T20', custom_overs=2, players=4, last_man_standing=False):
+    client = APIClient()
+    payload = {
+        'format': format,
+        'custom_overs': custom_overs,
+        'last_man_standing': last_man_standing,
+        'team_a': {'name': 'Alpha', 'players': [{'name': f'A{i}'} for i in range(players)]},
+        'team_b': {'name': 'Bravo', 'players': [{'name': f'B{i}'} for i in range(players)]},
+    }
+    match = Match.objects.get(pk=client.post('/api/matches/', payload, format='json').data['id'])
+    client.post(f'/api/matches/{match.id}/toss/', {'winner_id': match.team_a_id, 'decision': 'BAT'}, format='json')
+    return match
+
+
+class BallFeeder:
+    """Posts balls for the current innings, keeping over/ball numbers and bowler rotation like the scorer UI."""
+
+    def __init__(self, match):
+        self.match = match
+        self.client = APIClient()
+
+    def innings(self):
+        return self.match.innings.order_by('-innings_number').first()
+
+    def bowl(self, runs=0, extra_type='NONE', extras=0, is_wicket=False, **extra):
+        innings = self.innings()
+        batters = list(Player.objects.filter(team_id=innings.batting_team_id).order_by('id'))
+        bowlers = list(Player.objects.filter(team_id=innings.bowling_team_id).order_by('id'))
+        over, ball = divmod(innings.legal_balls, 6)
+        payload = {
+            'over_number': over,
+            'ball_number': ball + 1,
+            'batsman_id': batters[0].id,
+            'non_striker_id': batters[1].id,
+            'bowler_id': bowlers[over % 2].id,
+            'runs_batter': runs,
+            'extras': extras,
+            'extra_type': extra_type,
+            'is_wicket': is_wicket,
+        }
+        if is_wicket:
+            payload.setdefault('wicket_type', 'BOWLED')
+            payload.setdefault('player_out_id', batters[0].id)
+        payload.update(extra)
+        return self.client.post(f'/api/matches/{self.match.id}/bowl/', payload, format='json')
+
+    def undo(self):
+        return self.client.post(f'/api/matches/{self.match.id}/undo/')
+
+    def scoring_queries(self):
+        """Scores a dot ball through the scoring engine and returns how many queries it took.
+
+        Request handling and response serialization are left out, only the write path is measured.
+        """
+        innings = self.innings()
+        over, ball = divmod(innings.legal_balls, 6)
+        batters = list(Player.objects.filter(team_id=innings.batting_team_id).order_by('id'))
+        bowlers = list(Player.objects.filter(team_id=innings.bowling_team_id).order_by('id'))
+        match = Match.objects.get(pk=self.match.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            record_delivery(match, innings, {
+                'over_number': over, 'ball_number': ball + 1,
+                'batsman_id': batters[0].id, 'non_striker_id': batters[1].id,
+                'bowler_id': bowlers[over % 2].id, 'runs_batter': 0,
+            })
+        return len(ctx.captured_queries)
+
+
+class BowlTests(TestCase):
+    def setUp(self):
+        self.match = create_match(custom_overs=2)
+        self.feeder = BallFeeder(self.match)
+
+    def test_counters_track_legal_balls(self):
+        self.feeder.bowl(runs=1)
+        self.feeder.bowl(extra_type='WD', extras=1)
+        self.feeder.bowl(runs=4)
+        innings = self.feeder.innings()
+        self.assertEqual(innings.legal_balls, 2)
+        self.assertEqual(innings.total_runs, 6)
+        self.assertEqual(innings.batting_team_size, 4)
+
+    def test_progress_is_derived_from_legal_balls(self):
+        for runs in (4, 0, 0, 0, 0, 2, 1, 0, 0, 0, 0, 0):
+            self.feeder.bowl(runs=runs)
+        self.feeder.bowl(extra_type='WD', extras=1)
+        self.feeder.bowl(runs=2)
+        first, second = self.client.get(f'/api/matches/{self.match.id}/').data['innings']
+        self.assertEqual((first['overs'], first['run_rate'], first['runs_needed']), ('2.0', 3.5, None))
+        # Chasing 8 off 12 balls: 3 scored from the first ball, 5 needed off 11
+        self.assertEqual(second['overs'], '0.1')
+        self.assertEqual((second['runs_needed'], second['balls_remaining']), (5, 11))
+        self.assertEqual(second['run_rate'], 18.0)
+        self.assertEqual(second['required_run_rate'], 2.73)
+
+    def test_bowler_cannot_bowl_consecutive_overs(self):
+        for _ in range(6):
+            self.feeder.bowl()
+        response = self.feeder.bowl(bowler_id=self.feeder.innings().last_bowler_id)
+        self.assertEqual(response.status_code, 400)
+
+    def test_first_innings_end_sets_target(self):
+        for _ in range(11):
+            self.feeder.bowl(runs=1)
+        self.feeder.bowl(runs=2)
+        second = self.feeder.innings()
+        self.assertEqual(second.innings_number, 2)
+        self.assertEqual(second.target, 14)
+
+    def test_chase_completes_match(self):
+        for _ in range(12):
+            self.feeder.bowl(runs=1)
+        for _ in range(3):
+            self.feeder.bowl(runs=6)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, 'COMPLETED')
+        self.assertEqual(self.match.winner_id, self.match.team_b_id)
+
+    def test_undo_restores_counters(self):
+        for _ in range(6):
+            self.feeder.bowl(runs=1)
+        first_over_bowler = self.feeder.innings().last_bowler_id
+        self.feeder.bowl(runs=2)
+        self.feeder.undo()
+        innings = self.feeder.innings()
+        self.assertEqual(innings.legal_balls, 6)
+        self.assertEqual(innings.total_runs, 6)
+        self.assertEqual(innings.last_bowler_id, first_over_bowler)
+
+    def test_query_count_does_not_grow_with_innings_length(self):
+        first = self.feeder.scoring_queries()
+        for _ in range(9):
+            self.feeder.bowl()
+        self.assertEqual(self.feeder.scoring_queries(), first)
+
+
+class LiveFeedTests(TestCase):
+    def setUp(self):
+        self.match = create_match(custom_overs=2)
+        self.feeder = BallFeeder(self.match)
+
+    def test_live_state_has_no_deliveries(self):
+        self.feeder.bowl(runs=4)
+        data = self.client.get(f'/api/matches/{self.match.id}/live/').data
+        self.assertNotIn('deliveries', data['innings'][0])
+        self.assertEqual(data['innings'][0]['total_runs'], 4)
+        self.assertEqual(data['last_delivery_id'], Delivery.objects.get().id)
+
+    def test_live_payload_and_queries_stay_constant(self):
+        self.feeder.bowl()
+        with CaptureQueriesContext(connection) as early:
+            early_size = len(self.client.get(f'/api/matches/{self.match.id}/live/').content)
+        for _ in range(8):
+            self.feeder.bowl()
+        with CaptureQueriesContext(connection) as late:
+            late_size = len(self.client.get(f'/api/matches/{self.match.id}/live/').content)
+        self.assertEqual(len(early), len(late))
+        # Only counters change, so the size can drift by a few digits at most
+        self.assertAlmostEqual(early_size, late_size, delta=8)
+
+    def test_delivery_feed_returns_only_new_balls(self):
+        self.feeder.bowl(runs=1)
+        since = Delivery.objects.get().id
+        self.feeder.bowl(runs=2)
+        self.feeder.bowl(runs=3)
+        data = self.client.get(f'/api/matches/{self.match.id}/deliveries/?since={since}').data
+        self.assertEqual([d['runs_batter'] for d in data['deliveries']], [2, 3])
+        self.assertFalse(data['has_more'])
+
+    def test_undo_marks_version_for_resync(self):
+        self.feeder.bowl()
+        version = self.client.get(f'/api/matches/{self.match.id}/live/').data['version']
+        self.feeder.undo()
+        data = self.client.get(f'/api/matches/{self.match.id}/live/').data
+        self.assertGreater(data['last_undo_version'], version)
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.broadcaster = InProcessBroadcaster()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def receive(self, subscription):
+        return json.loads(self.loop.run_until_complete(asyncio.wait_for(subscription.get(), 1)))
+
+    def test_event_reaches_every_subscriber_of_the_match(self):
+        subscriptions = [self.broadcaster.subscribe(1, loop=self.loop) for _ in range(3)]
+        other = self.broadcaster.subscribe(2, loop=self.loop)
+        self.broadcaster.publish(1, {'event': 'bowl'})
+        for subscription in subscriptions:
+            self.assertEqual(self.receive(subscription), {'event': 'bowl'})
+        self.assertTrue(other.queue.empty())
+
+    def test_unsubscribe_stops_delivery(self):
+        subscription = self.broadcaster.subscribe(1, loop=self.loop)
+        self.broadcaster.unsubscribe(subscription)
+        self.assertEqual(self.broadcaster.subscriber_count(1), 0)
+
+    def test_bowl_publishes_after_commit(self):
+        match = create_match()
+        subscription = get_broadcaster().subscribe(match.id, loop=self.loop)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                BallFeeder(match).bowl(runs=4)
+            event = self.receive(subscription)
+        finally:
+            get_broadcaster().unsubscribe(subscription)
+        self.assertEqual(event['event'], 'bowl')
+        self.assertEqual(event['delivery']['runs_batter'], 4)
+        self.assertEqual(event['innings']['total_runs'], 4)
+
+    def test_event_stream_requires_asgi(self):
+        match = create_match()
+        self.assertEqual(self.client.get(f'/api/matches/{match.id}/events/').status_code, 503)
+
+    async def test_event_stream_delivers_published_events(self):
+        match = await sync_to_async(create_match)()
+        response = await AsyncClient().get(f'/api/matches/{match.id}/events/')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+        # The subscription is registered once the stream starts, publish from a worker thread like a view would
+        await sync_to_async(get_broadcaster().publish, thread_sensitive=False)(match.id, {'event': 'undo'})
+        self.assertEqual(await anext(chunks), b'data: {"event": "undo"}\n\n')
+
+
+class ScorecardTests(TestCase):
+    def setUp(self):
+        self.match = create_match(custom_overs=3)
+        self.feeder = BallFeeder(self.match)
+
+    def lines(self, innings):
+        batting = {l.player_id: (l.runs, l.balls, l.fours, l.sixes, l.is_out, l.wicket_type)
+                   for l in BattingLine.objects.filter(innings=innings)}
+        bowling = {l.player_id: (l.legal_balls, l.maidens, l.runs_conceded, l.wickets, l.dots, l.wides, l.no_balls)
+                   for l in BowlingLine.objects.filter(innings=innings)}
+        return batting, bowling
+
+    def play_sample(self):
+        for _ in range(6):
+            self.feeder.bowl()
+        self.feeder.bowl(runs=4)
+        self.feeder.bowl(extra_type='WD', extras=1)
+        self.feeder.bowl(runs=6)
+        self.feeder.bowl(extra_type='LB', extras=1)
+        self.feeder.bowl(is_wicket=True, wicket_type='CAUGHT')
+
+    def test_incremental_lines_match_a_rebuild(self):
+        self.play_sample()
+        innings = self.feeder.innings()
+        incremental = self.lines(innings)
+        rebuild_innings(innings)
+        self.assertEqual(self.lines(innings), incremental)
+
+    def test_maiden_and_bowler_figures(self):
+        self.play_sample()
+        innings = self.feeder.innings()
+        first, second = BowlingLine.objects.filter(innings=innings)
+        self.assertEqual((first.legal_balls, first.maidens, first.runs_conceded), (6, 1, 0))
+        self.assertEqual((second.legal_balls, second.runs_conceded, second.wickets, second.wides), (4, 11, 1, 1))
+
+    def test_undo_reverts_lines(self):
+        self.play_sample()
+        innings = self.feeder.innings()
+        before = self.lines(innings)
+        self.feeder.bowl(runs=2)
+        self.feeder.undo()
+        self.assertEqual(self.lines(innings), before)
+
+    def test_mid_over_bowler_change_is_no_maiden(self):
+        innings = self.feeder.innings()
+        change = Player.objects.filter(team_id=innings.bowling_team_id).order_by('id')[2]
+        for ball in range(6):
+            response = self.feeder.bowl(**({'bowler_id': change.id} if ball >= 3 else {}))
+            self.assertEqual(response.status_code, 200)
+        incremental = self.lines(innings)
+        self.assertEqual(sorted(figures[:2] for figures in incremental[1].values()), [(3, 0), (3, 0)])
+        rebuild_innings(innings)
+        self.assertEqual(self.lines(innings), incremental)
+
+    def test_undo_of_maiden_completing_ball(self):
+        for _ in range(6):
+            self.feeder.bowl()
+        self.feeder.undo()
+        line = BowlingLine.objects.get(innings=self.feeder.innings())
+        self.assertEqual((line.legal_balls, line.maidens), (5, 0))
+
+    def test_scorecard_endpoint_uses_fixed_queries(self):
+        self.feeder.bowl(runs=1)
+        with CaptureQueriesContext(connection) as short:
+            self.client.get(f'/api/matches/{self.match.id}/scorecard/')
+        self.play_sample()
+        with CaptureQueriesContext(connection) as long:
+            data = self.client.get(f'/api/matches/{self.match.id}/scorecard/').data
+        self.assertEqual(len(short), len(long))
+        innings = data['innings'][0]
+        self.assertEqual(innings['extras'], 2)
+        self.assertEqual(innings['batting'][0]['runs'], 11)
+
+
+@override_settings(BACKGROUND_JOBS=INLINE_JOBS)
+class AwardTests(TestCase):
+    def setUp(self):
+        self.match = create_match(custom_overs=1)
+        self.feeder = BallFeeder(self.match)
+
+    def finish_match(self):
+        # First innings: A0 scores 10 off the first over
+        for runs in (4, 6, 0, 0, 0, 0):
+            self.feeder.bowl(runs=runs)
+        # Second innings: Alpha's first bowler takes two wickets and bowls the chase out
+        self.feeder.bowl(runs=1)
+        self.feeder.bowl(is_wicket=True)
+        self.feeder.bowl(is_wicket=True, player_out_id=Player.objects.get(name='B1').id)
+        for _ in range(3):
+            self.feeder.bowl()
+        self.match.refresh_from_db()
+
+    def test_awards_on_completion(self):
+        self.finish_match()
+        self.assertEqual(self.match.status, 'COMPLETED')
+        self.assertEqual(self.match.winner_id, self.match.team_a_id)
+        self.assertEqual(self.match.best_batsman.name, 'A0')
+        self.assertEqual(self.match.best_bowler.name, 'A0')
+        self.assertEqual(self.match.man_of_match.name, 'A0')
+
+    def test_final_ball_query_count_is_bounded(self):
+        for runs in (4, 6, 0, 0, 0, 0):
+            self.feeder.bowl(runs=runs)
+        for _ in range(4):
+            self.feeder.bowl()
+        ordinary_ball = self.feeder.scoring_queries()
+        with self.settings(BACKGROUND_JOBS={'BACKEND': 'api.jobs.DatabaseQueue'}):
+            final_ball = self.feeder.scoring_queries()
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, 'COMPLETED')
+        self.assertIsNone(self.match.man_of_match_id)
+        # Awards and the stats rollups are queued rather than run in the request: the final ball adds the
+        # innings and match updates, three job rows and the over-ending ball a snapshot
+        self.assertLessEqual(final_ball, ordinary_ball + 15)
+        self.assertEqual(run_due(), 3)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.man_of_match.name, 'A0')
+        self.assertTrue(self.match.stats_recorded)
+
+    def test_compute_awards_command_is_rerunnable(self):
+        self.finish_match()
+        Match.objects.filter(pk=self.match.pk).update(best_batsman=None, best_bowler=None, man_of_match=None)
+        call_command('compute_awards', stdout=StringIO())
+        call_command('compute_awards', self.match.id, stdout=StringIO())
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.best_batsman.name, 'A0')
+
+
+class QueryPlanTests(TestCase):
+    """Guards the Delivery indexes: hot-path queries must search an index and never sort in a temp structure."""
+
+    def setUp(self):
+        self.match = create_match()
+        self.feeder = BallFeeder(self.match)
+        for _ in range(3):
+            self.feeder.bowl()
+        self.innings = self.feeder.innings()
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Test tables are tiny, make the planner show the index it would use on a large table
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertIndexed(self, queryset, index):
+        plan = self.plan(queryset)
+        self.assertIn(index, plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn('Sort', plan)
+
+    def test_last_delivery_lookup(self):
+        self.assertIndexed(
+            Delivery.objects.filter(innings=self.innings).order_by('-over_number', '-ball_number', '-id'),
+            'delivery_innings_ball_idx',
+        )
+
+    def test_last_legal_delivery_lookup(self):
+        self.assertIndexed(
+            Delivery.objects.filter(innings=self.innings).exclude(extra_type__in=['WD', 'NB'])
+            .order_by('-over_number', '-ball_number', '-id'),
+            'delivery_innings_ball_idx',
+        )
+
+    def test_default_ordering_does_not_join_innings(self):
+        plan = self.plan(self.innings.deliveries.all())
+        self.assertIn('delivery_innings_ball_idx', plan)
+        self.assertNotIn('api_innings', plan)
+
+    def test_extra_type_filter(self):
+        plan = self.plan(Delivery.objects.filter(innings=self.innings, extra_type='WD').order_by())
+        self.assertRegex(plan, 'delivery_innings_(extra|ball)_idx')
+
+    def test_delta_feed(self):
+        self.assertIndexed(
+            Delivery.objects.filter(innings_id__in=[self.innings.id], id__gt=0).order_by('id'),
+            'delivery_innings_id_idx',
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """Per-endpoint query counts. A change here means a new query on a hot path, update deliberately."""
+
+    def setUp(self):
+        self.match = create_match()
+        self.feeder = BallFeeder(self.match)
+        for _ in range(3):
+            self.feeder.bowl()
+
+    def test_scoring_write_path(self):
+        # Includes the per-ball prediction row (see api.prediction)
+        self.assertEqual(self.feeder.scoring_queries(), 9)
+
+    def test_undo_write_path(self):
+        match = Match.objects.get(pk=self.match.pk)
+        innings = self.feeder.innings()
+        # Includes removing the ball's prediction and reading the recent run rate of the ball before it
+        with self.assertNumQueries(14):
+            undo_last_delivery(match, innings)
+
+    def test_live(self):
+        with self.assertNumQueries(4):
+            self.client.get(f'/api/matches/{self.match.id}/live/')
+
+    def test_delivery_feed(self):
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/matches/{self.match.id}/deliveries/?since=0')
+
+    def test_scorecard(self):
+        with self.assertNumQueries(5):
+            self.client.get(f'/api/matches/{self.match.id}/scorecard/')
+
+
+class MatchListTests(TestCase):
+    def setUp(self):
+        self.matches = [create_match() for _ in range(3)]
+        Match.objects.filter(pk=self.matches[0].pk).update(status='COMPLETED', format='TEST')
+
+    def test_list_uses_summary_projection(self):
+        BallFeeder(self.matches[1]).bowl(runs=4)
+        data = self.client.get('/api/matches/').data
+        self.assertIn('next', data)
+        entry = next(m for m in data['results'] if m['id'] == self.matches[1].id)
+        self.assertEqual(entry['team_a_name'], 'Alpha')
+        self.assertEqual(entry['innings'][0]['total_runs'], 4)
+        self.assertNotIn('team_a_details', entry)
+        self.assertNotIn('deliveries', entry['innings'][0])
+
+    def test_cursor_pagination(self):
+        first = self.client.get('/api/matches/?page_size=2').data
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(first['next']).data
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+
+    def test_filters(self):
+        ids = lambda query: [m['id'] for m in self.client.get(f'/api/matches/?{query}').data['results']]
+        self.assertEqual(ids('status=COMPLETED'), [self.matches[0].id])
+        self.assertEqual(ids('match_format=TEST'), [self.matches[0].id])
+        today = self.matches[0].created_at.date().isoformat()
+        self.assertEqual(len(ids(f'date={today}')), 3)
+        self.assertEqual(ids('date_to=2000-01-01'), [])
+        self.assertEqual(self.client.get('/api/matches/?date=yesterday').status_code, 400)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for match in self.matches:
+            BallFeeder(match).bowl()
+        with CaptureQueriesContext(connection) as one:
+            self.client.get('/api/matches/?page_size=1')
+        with CaptureQueriesContext(connection) as three:
+            self.client.get('/api/matches/?page_size=3')
+        self.assertEqual(len(one), len(three))
+
+
+class QueryScalingTests(TestCase):
+    """Every endpoint must cost the same number of queries for a small and a large match."""
+
+    def setUp(self):
+        self.small = create_match(players=4, custom_overs=5)
+        self.large = create_match(players=11, custom_overs=5)
+        for _ in range(2):
+            BallFeeder(self.small).bowl(runs=1)
+        for _ in range(20):
+            BallFeeder(self.large).bowl(runs=1)
+
+    def queries(self, request):
+        with CaptureQueriesContext(connection) as ctx:
+            response = request()
+        self.assertLess(response.status_code, 400)
+        return len(ctx.captured_queries)
+
+    def assertFlat(self, request_for):
+        self.assertEqual(self.queries(lambda: request_for(self.small)), self.queries(lambda: request_for(self.large)))
+
+    def test_retrieve(self):
+        self.assertFlat(lambda m: self.client.get(f'/api/matches/{m.id}/'))
+
+    def test_list(self):
+        small = self.queries(lambda: self.client.get('/api/matches/?page_size=1'))
+        self.assertEqual(small, self.queries(lambda: self.client.get('/api/matches/')))
+
+    def test_live_and_feeds(self):
+        for action in ('live', 'deliveries', 'scorecard'):
+            self.assertFlat(lambda m: self.client.get(f'/api/matches/{m.id}/{action}/'))
+
+    def test_bowl(self):
+        # Both matches are mid-over with existing batting and bowling lines, so the write path is identical
+        self.assertFlat(lambda m: BallFeeder(m).bowl(runs=2))
+
+    def test_undo(self):
+        self.assertFlat(lambda m: BallFeeder(m).undo())
+
+    def test_toss(self):
+        fresh = [create_match(players=n, custom_overs=5) for n in (4, 11)]
+        counts = []
+        for match in fresh:
+            match.innings.all().delete()
+            counts.append(self.queries(lambda: self.client.post(
+                f'/api/matches/{match.id}/toss/', {'winner_id': match.team_b_id, 'decision': 'BOWL'},
+                content_type='application/json')))
+        self.assertEqual(counts[0], counts[1])
+
+
+def match_payload(players, team_a=None):
+    return {
+        'format': 'T20',
+        'custom_overs': 5,
+        'team_a': team_a or {'name': 'Alpha', 'players': [{'name': f'A{i}'} for i in range(players)]},
+        'team_b': {'name': 'Bravo', 'players': [{'name': f'B{i}'} for i in range(players)]},
+    }
+
+
+FIXTURE = {
+    'name': 'Summer Cup',
+    'format': 'T20',
+    'custom_overs': 10,
+    'teams': [
+        {'name': 'Alpha', 'players': [{'name': f'A{i}', 'is_captain': i == 0} for i in range(11)]},
+        {'name': 'Bravo', 'players': [{'name': f'B{i}'} for i in range(11)]},
+        {'name': 'Charlie', 'players': [{'name': f'C{i}'} for i in range(11)]},
+    ],
+    'matches': [
+        {'team_a': 'Alpha', 'team_b': 'Bravo'},
+        {'team_a': 'Bravo', 'team_b': 'Charlie'},
+        {'team_a': 'Charlie', 'team_b': 'Alpha', 'custom_overs': 20},
+    ],
+}
+
+FIXTURE_CSV = """team,player,is_captain,opponent
+Alpha,A0,yes,
+Alpha,A1,,
+Bravo,B0,,
+Bravo,B1,true,
+Alpha,,,Bravo
+"""
+
+
+class FixtureTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def queries(self, request):
+        with CaptureQueriesContext(connection) as ctx:
+            response = request()
+        self.assertLess(response.status_code, 400, response.data)
+        return len(ctx.captured_queries)
+
+    def test_create_match_queries_do_not_grow_with_squad_size(self):
+        small = self.queries(lambda: self.client.post('/api/matches/', match_payload(4), format='json'))
+        large = self.queries(lambda: self.client.post('/api/matches/', match_payload(11), format='json'))
+        self.assertEqual(small, large)
+
+    def test_create_match_reuses_existing_team(self):
+        first = Match.objects.get(pk=self.client.post('/api/matches/', match_payload(4), format='json').data['id'])
+        response = self.client.post('/api/matches/', match_payload(4, team_a={'id': first.team_a_id}), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['team_a'], first.team_a_id)
+        self.assertEqual(Player.objects.filter(team_id=first.team_a_id).count(), 4)
+
+    def test_unknown_team_rolls_back(self):
+        teams = Team.objects.count()
+        response = self.client.post('/api/matches/', {**match_payload(4), 'team_b': {'id': 9999}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Team.objects.count(), teams)
+
+    def test_unknown_tournament_is_rejected(self):
+        for tournament in (9999, 'cup'):
+            response = self.client.post('/api/matches/', {**match_payload(4), 'tournament': tournament}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Team.objects.exists())
+        cup = Tournament.objects.create(name='Cup')
+        response = self.client.post('/api/matches/', {**match_payload(4), 'tournament': cup.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(cup.matches.count(), 1)
+
+    def test_import_json(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/tournaments/import/', FIXTURE, format='json')
+        self.assertEqual(response.status_code, 201)
+        tournament = Tournament.objects.get(pk=response.data['id'])
+        self.assertEqual(tournament.name, 'Summer Cup')
+        self.assertEqual(tournament.matches.count(), 3)
+        self.assertEqual(Player.objects.filter(team__name='Charlie').count(), 11)
+        self.assertEqual(sorted(tournament.matches.values_list('custom_overs', flat=True)), [10, 10, 20])
+        # Bulk inserts: the query count does not depend on the number of teams, players or matches
+        self.assertLess(len(ctx.captured_queries), 15)
+
+    def test_import_reuses_existing_team(self):
+        alpha = Team.objects.create(name='Alpha')
+        fixture = {**FIXTURE, 'teams': [{'id': alpha.id}, *FIXTURE['teams'][1:]]}
+        response = self.client.post('/api/tournaments/import/', fixture, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Team.objects.filter(name='Alpha').count(), 1)
+        self.assertEqual(Match.objects.filter(team_a=alpha).count() + Match.objects.filter(team_b=alpha).count(), 2)
+
+    def test_import_csv_upload(self):
+        upload = SimpleUploadedFile('cup.csv', FIXTURE_CSV.encode(), content_type='text/csv')
+        response = self.client.post('/api/tournaments/import/', {'file': upload, 'name': 'CSV Cup', 'custom_overs': '8'})
+        self.assertEqual(response.status_code, 201)
+        match = Tournament.objects.get(name='CSV Cup').matches.get()
+        self.assertEqual(match.custom_overs, 8)
+        self.assertTrue(Player.objects.get(name='B1').is_captain)
+
+    def test_invalid_fixture_writes_nothing(self):
+        fixture = {**FIXTURE, 'matches': [*FIXTURE['matches'], {'team_a': 'Alpha', 'team_b': 'Delta'}]}
+        response = self.client.post('/api/tournaments/import/', fixture, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Team.objects.exists())
+        self.assertFalse(Tournament.objects.exists())
+
+    def test_fixture_must_be_an_object(self):
+        response = self.client.post('/api/tournaments/import/', [FIXTURE], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Tournament.objects.exists())
+
+    def test_player_without_a_name_is_rejected(self):
+        teams = [{'name': 'Alpha', 'players': [{'name': 'A0'}, {'is_captain': True}]}, *FIXTURE['teams'][1:]]
+        response = self.client.post('/api/tournaments/import/', {**FIXTURE, 'teams': teams}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Team.objects.exists())
+        payload = match_payload(2, team_a={'name': 'Alpha', 'players': [{'name': ''}]})
+        self.assertEqual(self.client.post('/api/matches/', payload, format='json').status_code, 400)
+        self.assertFalse(Team.objects.exists())
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'cup.csv'
+            path.write_text(FIXTURE_CSV)
+            out = StringIO()
+            call_command('import_fixture', str(path), '--overs', '6', stdout=out)
+        tournament = Tournament.objects.get(name='cup')
+        self.assertEqual(tournament.matches.get().custom_overs, 6)
+        self.assertIn('1 matches', out.getvalue())
+
+
+def queued_balls(match, count, first_seq=1, innings_number=1, start_ball=0, **extra):
+    """Balls as an offline scorer would queue them: two bowlers alternating overs, dot balls unless overridden."""
+    innings = match.innings.get(innings_number=innings_number)
+    batters = list(Player.objects.filter(team_id=innings.batting_team_id).order_by('id'))
+    bowlers = list(Player.objects.filter(team_id=innings.bowling_team_id).order_by('id'))
+    balls = []
+    for i in range(start_ball, start_ball + count):
+        over, ball = divmod(i, 6)
+        balls.append({
+            'seq': first_seq + i - start_ball,
+            'over_number': over,
+            'ball_number': ball + 1,
+            'batsman_id': batters[0].id,
+            'non_striker_id': batters[1].id,
+            'bowler_id': bowlers[over % 2].id,
+            'runs_batter': 1,
+            **extra,
+        })
+    return balls
+
+
+class BowlBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.match = create_match(custom_overs=5)
+
+    def post(self, balls):
+        return self.client.post(f'/api/matches/{self.match.id}/bowl_batch/', {'deliveries': balls}, format='json')
+
+    def test_applies_batch_with_one_version_bump(self):
+        version = Match.objects.get(pk=self.match.pk).version
+        response = self.post(queued_balls(self.match, 12))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['applied'], list(range(1, 13)))
+        self.assertEqual(response.data['version'], version + 1)
+        self.assertEqual(response.data['innings'][0]['total_runs'], 12)
+        innings = self.match.innings.get()
+        self.assertEqual(innings.legal_balls, 12)
+        self.assertEqual(BattingLine.objects.get(innings=innings, runs__gt=0).runs, 12)
+
+    def test_retry_is_idempotent(self):
+        balls = queued_balls(self.match, 8)
+        self.post(balls[:5])
+        version = Match.objects.get(pk=self.match.pk).version
+        response = self.post(balls)
+        self.assertEqual(response.data['skipped'], [1, 2, 3, 4, 5])
+        self.assertEqual(response.data['applied'], [6, 7, 8])
+
+        response = self.post(balls)
+        self.assertEqual(response.data['applied'], [])
+        self.assertEqual(response.data['version'], version + 1)
+        self.assertEqual(Delivery.objects.filter(innings__match=self.match).count(), 8)
+
+    def test_invalid_ball_rejects_whole_batch(self):
+        balls = queued_balls(self.match, 8)
+        balls[6]['bowler_id'] = balls[0]['bowler_id']
+        response = self.post(balls)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('seq 7', response.data['error'])
+        self.assertFalse(Delivery.objects.filter(innings__match=self.match).exists())
+        self.assertEqual(self.match.innings.get().legal_balls, 0)
+
+    def test_sequence_must_increase(self):
+        balls = queued_balls(self.match, 3)
+        balls[2]['seq'] = 1
+        self.assertEqual(self.post(balls).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+
+    def test_batch_rolls_over_into_second_innings(self):
+        self.post(queued_balls(self.match, 30))
+        response = self.post(queued_balls(self.match, 3, first_seq=31, innings_number=2))
+        self.assertEqual(response.status_code, 200)
+        first, second = self.match.innings.order_by('innings_number')
+        self.assertTrue(first.is_completed)
+        self.assertEqual(second.target, 31)
+        self.assertEqual(second.legal_balls, 3)
+
+    def test_batch_ending_the_match(self):
+        self.post(queued_balls(self.match, 30))
+        response = self.post(queued_balls(self.match, 16, first_seq=31, innings_number=2, runs_batter=2))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'COMPLETED')
+        # The chase is over, a ball queued after it cannot be applied
+        response = self.post(queued_balls(self.match, 1, first_seq=100, innings_number=2, start_ball=16))
+        self.assertEqual(response.status_code, 400)
+
+
+class HistoryTests(TestCase):
+    def setUp(self):
+        self.match = create_match(custom_overs=3)
+        self.feeder = BallFeeder(self.match)
+
+    def post(self, action, data=None):
+        return self.client.post(f'/api/matches/{self.match.id}/{action}/', data or {}, content_type='application/json')
+
+    def state(self):
+        innings = self.feeder.innings()
+        lines = sorted(BattingLine.objects.filter(innings=innings).values_list('player_id', 'runs', 'balls'))
+        bowling = sorted(BowlingLine.objects.filter(innings=innings).values_list('player_id', 'legal_balls', 'maidens'))
+        return (innings.legal_balls, innings.total_runs, innings.total_wickets, innings.last_bowler_id, lines, bowling)
+
+    def assertConsistent(self):
+        # Counters and snapshots must match a replay of the remaining balls from scratch
+        innings = self.feeder.innings()
+        deliveries = list(innings.deliveries.order_by('id'))
+        state = empty_state()
+        for delivery in deliveries:
+            replay(state, delivery)
+        self.assertEqual(state, {f: getattr(innings, f) for f in state})
+        expected = build_snapshots(deliveries, 6)
+        actual = list(InningsSnapshot.objects.filter(innings=innings).order_by('legal_balls').values(
+            'last_delivery_id', 'legal_balls', 'total_runs', 'total_wickets', 'last_bowler_id'))
+        self.assertEqual(actual, expected)
+
+    def test_undo_across_over_restores_from_snapshot(self):
+        for runs in (1, 2, 3, 4, 6, 1):
+            self.feeder.bowl(runs=runs)
+        self.feeder.bowl(extra_type='WD', extras=1)
+        self.feeder.bowl(runs=2)
+        for _ in range(3):
+            self.feeder.undo()
+        innings = self.feeder.innings()
+        self.assertEqual((innings.legal_balls, innings.total_runs), (5, 16))
+        self.assertConsistent()
+
+    def test_redo_restores_undone_balls(self):
+        for runs in (1, 4, 0, 6, 2, 1, 3):
+            self.feeder.bowl(runs=runs)
+        before = self.state()
+        self.feeder.undo()
+        self.feeder.undo()
+        self.assertEqual(self.post('redo').status_code, 200)
+        self.assertEqual(self.post('redo').status_code, 200)
+        self.assertEqual(self.state(), before)
+        self.assertEqual(self.post('redo').status_code, 400)
+        self.assertConsistent()
+
+    def test_new_ball_clears_redo(self):
+        self.feeder.bowl(runs=4)
+        self.feeder.undo()
+        self.feeder.bowl(runs=1)
+        self.assertEqual(self.post('redo').status_code, 400)
+        self.assertEqual(self.feeder.innings().total_runs, 1)
+
+    def test_rewind_to_over(self):
+        for i in range(15):
+            self.feeder.bowl(runs=i % 3)
+        response = self.post('rewind', {'over': 1})
+        self.assertEqual(response.status_code, 200)
+        innings = self.feeder.innings()
+        self.assertEqual(innings.legal_balls, 6)
+        self.assertEqual(innings.total_runs, 6)
+        self.assertConsistent()
+
+        # Redo steps forward again one ball at a time, in the order they were bowled
+        self.post('redo')
+        delivery = innings.deliveries.order_by('-id').first()
+        self.assertEqual((delivery.over_number, delivery.ball_number, delivery.runs_batter), (1, 1, 0))
+        for _ in range(8):
+            self.assertEqual(self.post('redo').status_code, 200)
+        self.assertEqual(self.feeder.innings().total_runs, 15)
+        self.assertConsistent()
+
+    def test_rewind_rejects_unbowled_over(self):
+        self.feeder.bowl()
+        self.assertEqual(self.post('rewind', {'over': 2}).status_code, 400)
+        self.assertEqual(self.post('rewind', {'over': 'x'}).status_code, 400)
+
+    def test_undo_and_redo_of_match_winning_ball(self):
+        for _ in range(18):
+            self.feeder.bowl(runs=1)
+        for _ in range(5):
+            self.feeder.bowl(runs=4)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, 'COMPLETED')
+        winner, man_of_match = self.match.winner_id, self.match.man_of_match_id
+
+        self.feeder.undo()
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, 'LIVE')
+        self.post('redo')
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.status, self.match.winner_id, self.match.man_of_match_id),
+                         ('COMPLETED', winner, man_of_match))
+
+
+@override_settings(BACKGROUND_JOBS=INLINE_JOBS)
+class StatsTests(TestCase):
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name='Cup')
+        self.teams = None
+
+    def play(self, first_innings_runs, chase_runs):
+        """One-over match between the same two squads. A0 scores every first innings run, B0 faces the chase."""
+        payload = match_payload(4)
+        if self.teams:
+            payload['team_a'], payload['team_b'] = ({'id': team_id} for team_id in self.teams)
+        payload.update(custom_overs=1, tournament=self.tournament.id)
+        match = Match.objects.get(pk=self.client.post('/api/matches/', payload,
+                                                      content_type='application/json').data['id'])
+        self.teams = (match.team_a_id, match.team_b_id)
+        self.client.post(f'/api/matches/{match.id}/toss/', {'winner_id': match.team_a_id, 'decision': 'BAT'},
+                         content_type='application/json')
+        feeder = BallFeeder(match)
+        for runs in first_innings_runs:
+            feeder.bowl(runs=runs)
+        for runs in chase_runs:
+            if match.innings.count() == 2 and feeder.innings().is_completed:
+                break
+            if runs == 'W':
+                feeder.bowl(is_wicket=True, wicket_type='CAUGHT', catcher_id=Player.objects.get(name='A2').id)
+            else:
+                feeder.bowl(runs=runs)
+        match.refresh_from_db()
+        return match
+
+    def stats(self, name, tournament=None):
+        return PlayerStats.objects.get(player=Player.objects.get(name=name), tournament=tournament)
+
+    def test_completed_match_is_rolled_up(self):
+        match = self.play((4, 6, 0, 0, 0, 1), ('W', 1, 2, 0, 0, 0))
+        self.assertEqual(match.status, 'COMPLETED')
+        a0 = self.stats('A0')
+        self.assertEqual((a0.matches, a0.runs, a0.balls, a0.fours, a0.sixes, a0.highest_score), (1, 11, 6, 1, 1, 11))
+        self.assertEqual(self.stats('A0', self.tournament).runs, 11)
+        bowler = self.stats('A0')  # Alpha's first bowler is A0 as well
+        self.assertEqual((bowler.wickets, bowler.best_wickets, bowler.best_runs), (1, 1, 3))
+        self.assertEqual(self.stats('A2').catches, 1)
+        alpha = TeamStats.objects.get(team=match.team_a, tournament=None)
+        self.assertEqual((alpha.played, alpha.won, alpha.runs_scored, alpha.balls_faced), (1, 1, 11, 6))
+
+    def test_reopening_a_match_removes_it(self):
+        self.play((4, 0, 0, 0, 0, 0), (0, 0, 0, 0, 0, 0))
+        first = self.play((50, 2, 0, 0, 0, 0), (0, 0, 0, 0, 0, 0))
+        self.assertEqual(self.stats('A0').runs, 56)
+        self.assertEqual(self.stats('A0').highest_score, 52)
+        self.assertEqual(self.stats('A0').fifties, 1)
+
+        BallFeeder(first).undo()
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'LIVE')
+        a0 = self.stats('A0')
+        self.assertEqual((a0.matches, a0.runs, a0.highest_score, a0.fifties), (1, 4, 4, 0))
+
+        self.client.post(f'/api/matches/{first.id}/redo/')
+        self.assertEqual(self.stats('A0').runs, 56)
+        self.assertEqual(self.stats('A0').highest_score, 52)
+
+    def test_undoing_a_winning_six_takes_it_out_of_the_rollups(self):
+        self.play((5, 0, 0, 0, 0, 0), (6,))
+        second = self.play((5, 0, 0, 0, 0, 0), (6,))
+        self.assertEqual(self.stats('B0').runs, 12)
+        BallFeeder(second).undo()
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'LIVE')
+        b0, bowler = self.stats('B0'), self.stats('A0')
+        self.assertEqual((b0.matches, b0.runs, b0.sixes), (1, 6, 1))
+        self.assertEqual((bowler.legal_balls, bowler.runs_conceded), (1, 6))
+
+        self.client.post(f'/api/matches/{second.id}/redo/')
+        self.assertEqual(self.stats('B0').runs, 12)
+        response = self.client.post(f'/api/matches/{second.id}/rewind/', {'over': 0}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        b0, bowler = self.stats('B0'), self.stats('A0')
+        self.assertEqual((b0.runs, bowler.legal_balls, bowler.runs_conceded), (6, 1, 6))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.play((4, 6, 0, 0, 0, 1), ('W', 1, 2, 0, 0, 0))
+        self.play((1, 1, 1, 0, 0, 0), (6, 6))
+        fields = [f.name for f in PlayerStats._meta.fields if f.name != 'id']
+        players = lambda: sorted(PlayerStats.objects.values_list(*fields), key=repr)
+        teams = lambda: sorted(TeamStats.objects.values_list('team', 'tournament', 'played', 'won', 'runs_scored'),
+                               key=repr)
+        incremental = (players(), teams())
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertEqual((players(), teams()), incremental)
+
+    def test_completion_cost_does_not_grow_with_match_size(self):
+        def final_ball_queries(players, overs):
+            match = create_match(custom_overs=overs, players=players)
+            feeder = BallFeeder(match)
+            for _ in range(overs * 6):
+                feeder.bowl(runs=1)
+            for _ in range(overs * 6 - 1):
+                feeder.bowl()
+            return feeder.scoring_queries()
+        self.assertEqual(final_ball_queries(4, 1), final_ball_queries(11, 3))
+
+    def test_leaderboards(self):
+        self.play((4, 6, 0, 0, 0, 1), ('W', 1, 2, 0, 0, 0))
+        self.play((6, 6, 6, 0, 0, 0), (1, 0, 0, 0, 0, 0))
+        with self.assertNumQueries(1):
+            batting = self.client.get('/api/stats/batting/?limit=2').data
+        self.assertEqual([(row['player_name'], row['runs']) for row in batting], [('A0', 29), ('B0', 4)])
+        bowling = self.client.get(f'/api/stats/bowling/?tournament={self.tournament.id}').data
+        self.assertEqual(bowling[0]['player_name'], 'A0')
+        self.assertEqual(bowling[0]['best_bowling'], '1/3')
+        teams = self.client.get('/api/stats/teams/').data
+        self.assertEqual([(row['team_name'], row['won'], row['lost']) for row in teams], [('Alpha', 2, 0), ('Bravo', 0, 2)])
+        self.assertEqual(self.client.get('/api/stats/batting/?limit=x').status_code, 400)
+        for limit in (0, -1):
+            self.assertEqual(self.client.get(f'/api/stats/batting/?limit={limit}').status_code, 400)
+
+        player = Player.objects.get(name='A0')
+        career, cup = self.client.get(f'/api/players/{player.id}/stats/').data
+        self.assertIsNone(career['tournament'])
+        self.assertEqual(cup['tournament'], self.tournament.id)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.match = create_match(custom_overs=2)
+        self.feeder = BallFeeder(self.match)
+        for runs in (1, 4, 0, 6, 0, 2):
+            self.feeder.bowl(runs=runs)
+        self.feeder.bowl(extra_type='WD', extras=1)
+        self.feeder.bowl(is_wicket=True, wicket_type='CAUGHT', catcher_id=Player.objects.get(name='B3').id)
+        self.feeder.bowl(extra_type='LB', extras=2)
+
+    def export(self, **params):
+        response = self.client.get('/api/matches/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return read_npz(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_npz_columns_match_deliveries(self):
+        columns = self.export(match=self.match.id)
+        deliveries = list(Delivery.objects.order_by('id'))
+        self.assertEqual(list(columns['id']), [d.id for d in deliveries])
+        self.assertEqual(list(columns['runs_batter']), [d.runs_batter for d in deliveries])
+        self.assertEqual([columns['extra_type_labels'][code] for code in columns['extra_type']],
+                         [d.extra_type for d in deliveries])
+        self.assertEqual([columns['wicket_type_labels'][code] for code in columns['wicket_type']],
+                         [d.wicket_type for d in deliveries])
+        self.assertEqual(columns['catcher_id'][7], Player.objects.get(name='B3').id)
+        self.assertEqual(columns['catcher_id'][0], -1)
+        self.assertEqual(set(columns['match_id']), {self.match.id})
+
+    def test_chunked_command_export_is_identical(self):
+        other = create_match()
+        BallFeeder(other).bowl(runs=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'season.npz'
+            call_command('export_deliveries', str(path), '--chunk-size', '2', stdout=StringIO())
+            with open(path, 'rb') as fileobj:
+                chunked = read_npz(fileobj)
+        self.assertEqual(chunked, self.export())
+        self.assertEqual(len(chunked['id']), 10)
+        self.assertEqual(list(self.export(match=other.id)['runs_batter']), [3])
+
+    def test_npy_headers_are_aligned(self):
+        for length in (0, 7, 10 ** 6):
+            self.assertEqual(len(npy_header('<i8', length)) % 64, 0)
+
+    def test_unknown_type_and_missing_pyarrow(self):
+        self.assertEqual(self.client.get('/api/matches/export/', {'type': 'csv'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/matches/export/', {'match': 'x'}).status_code, 400)
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.assertEqual(self.client.get('/api/matches/export/', {'type': 'parquet'}).status_code, 400)
+
+    def test_over_series(self):
+        series = innings_series(self.export())[self.feeder.innings().id]
+        # Over 0: 1+4+0+6+0+2, over 1: a wide, a wicket and two leg byes
+        self.assertEqual(series['manhattan'], [13, 3])
+        self.assertEqual(series['worm'], [13, 16])
+        self.assertEqual(series['run_rate'], [13.0, 12.0])
+        self.assertEqual(series['wickets'], [0, 1])
+
+    def test_labels_outside_the_tables_export_as_unknown(self):
+        # A legacy row: streaming must not fail halfway through on a value the label tables do not know
+        Delivery.objects.filter(extra_type='LB').update(extra_type='PEN', wicket_type='HANDLED')
+        columns = self.export()
+        self.assertEqual(list(columns['extra_type']).count(UNKNOWN_CODE), 1)
+        self.assertEqual(list(columns['wicket_type']).count(UNKNOWN_CODE), 1)
+        self.assertEqual(len(columns['id']), 9)
+
+
+class ChartTests(TestCase):
+    def setUp(self):
+        # Test databases reuse innings ids, so entries from an earlier test must not be picked up
+        cache.clear()
+        self.match = create_match(custom_overs=3)
+        self.feeder = BallFeeder(self.match)
+
+    def charts(self):
+        return self.client.get(f'/api/matches/{self.match.id}/charts/').data['innings']
+
+    def uncached(self):
+        cache.clear()
+        return self.charts()
+
+    def test_series(self):
+        for runs in (1, 4, 0, 6, 0, 2):
+            self.feeder.bowl(runs=runs)
+        self.feeder.bowl(extra_type='WD', extras=1)
+        self.feeder.bowl(is_wicket=True)
+        self.feeder.bowl(runs=3)
+        (charts,) = self.charts()
+        self.assertEqual(charts['manhattan'], [13, 4])
+        self.assertEqual(charts['worm'], [13, 17])
+        self.assertEqual(charts['run_rate'], [13.0, 12.75])
+        self.assertEqual(charts['wickets'], [0, 1])
+        self.assertEqual(charts['fall_of_wickets'], [
+            {'wicket': 1, 'runs': 14, 'overs': '1.1', 'player_out': Player.objects.get(name='A0').id},
+        ])
+        first, second = charts['partnerships']
+        self.assertEqual((first['runs'], first['balls'], first['is_unbroken']), (14, 7, False))
+        self.assertEqual((second['wicket'], second['runs'], second['balls'], second['is_unbroken']), (2, 3, 1, True))
+
+    def test_completed_overs_are_cached(self):
+        for runs in range(8):
+            self.feeder.bowl(runs=runs % 3)
+        self.charts()
+        innings = self.feeder.innings()
+        self.assertEqual(cache.get(f'charts:{innings.id}:0')['next_over'], 1)
+        self.feeder.bowl(runs=4)
+        self.assertEqual(self.charts(), self.uncached())
+
+    def test_undo_of_cached_over(self):
+        for _ in range(6):
+            self.feeder.bowl(runs=1)
+        self.assertEqual(self.charts()[0]['manhattan'], [6])
+        self.feeder.undo()
+        self.feeder.bowl(runs=6)
+        self.assertEqual(self.charts()[0]['manhattan'], [11])
+        self.assertEqual(self.charts(), self.uncached())
+
+    def test_queries_do_not_grow_with_innings_length(self):
+        self.feeder.bowl()
+        self.charts()
+        with CaptureQueriesContext(connection) as early:
+            self.charts()
+        for _ in range(12):
+            self.feeder.bowl(runs=1)
+        self.charts()
+        with CaptureQueriesContext(connection) as late:
+            self.charts()
+        self.assertEqual(len(early), len(late))
+
+    def test_both_innings(self):
+        for _ in range(18):
+            self.feeder.bowl(runs=1)
+        self.feeder.bowl(runs=4)
+        first, second = self.charts()
+        self.assertEqual(first['worm'], [6, 12, 18])
+        self.assertEqual(second['manhattan'], [4])
+        self.assertEqual(self.charts(), self.uncached())
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.match = create_match(custom_overs=1)
+        self.feeder = BallFeeder(self.match)
+        for _ in range(6):
+            self.feeder.bowl(runs=1)
+        for _ in range(5):
+            self.feeder.bowl()
+        self.url = f'/api/matches/{self.match.id}/'
+
+    def complete(self):
+        self.feeder.bowl()
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.status, 'COMPLETED')
+
+    def test_completed_match_is_served_without_queries(self):
+        self.complete()
+        first = self.client.get(self.url)
+        self.client.get(f'{self.url}scorecard/')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+            self.client.get(f'{self.url}scorecard/')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match(self):
+        self.complete()
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_live_match_is_not_cached(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertGreater(len(ctx), 0)
+        self.assertNotIn('ETag', response)
+
+    def test_undo_and_edits_invalidate(self):
+        self.complete()
+        self.client.get(self.url)
+        self.client.get(f'{self.url}scorecard/')
+        self.feeder.undo()
+        self.assertEqual(self.client.get(self.url).data['status'], 'LIVE')
+        self.assertEqual(self.client.get(f'{self.url}scorecard/').data['status'], 'LIVE')
+
+        self.complete()
+        self.client.get(self.url)
+        team = Team.objects.get(pk=self.match.team_a_id)
+        team.name = 'Renamed'
+        team.save()
+        self.assertEqual(self.client.get(self.url).data['team_a_details']['name'], 'Renamed')
+        self.match.toss_decision = 'BOWL'
+        self.match.save()
+        self.assertEqual(self.client.get(self.url).data['toss_decision'], 'BOWL')
+
+    def test_list_is_invalidated_by_any_match(self):
+        other = create_match()
+        self.client.get('/api/matches/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/matches/')
+        BallFeeder(other).bowl(runs=4)
+        entry = next(m for m in self.client.get('/api/matches/').data['results'] if m['id'] == other.id)
+        self.assertEqual(entry['innings'][0]['total_runs'], 4)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_zero_timeout_stores_nothing(self):
+        self.complete()
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertGreater(len(ctx), 0)
+        self.assertEqual(response.status_code, 304)
+
+
+class ConcurrentScoringTests(TransactionTestCase):
+    """Several scorer devices posting to one match at once, each on its own connection."""
+
+    THREADS = 4
+    BALLS_PER_THREAD = 6
+
+    def setUp(self):
+        self.match = create_match(custom_overs=10, players=6)
+
+    def run_scorers(self, scorer):
+        errors = []
+
+        def run():
+            try:
+                for _ in range(self.BALLS_PER_THREAD):
+                    scorer()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assertConsistent(self):
+        innings = BallFeeder(self.match).innings()
+        deliveries = list(Delivery.objects.filter(innings=innings))
+        self.assertEqual(innings.legal_balls, len(deliveries))
+        self.assertEqual(innings.total_runs, sum(d.runs_batter for d in deliveries))
+        self.assertEqual(Match.objects.get(pk=self.match.pk).version, 1 + len(deliveries))
+        return deliveries
+
+    def test_no_lost_updates(self):
+        accepted = []
+
+        def scorer():
+            # Devices racing on the same ball may be refused (e.g. the bowler rule), never lost
+            response = BallFeeder(self.match).bowl(runs=1)
+            self.assertIn(response.status_code, (200, 400))
+            if response.status_code == 200:
+                accepted.append(response)
+
+        self.run_scorers(scorer)
+        self.assertEqual(len(self.assertConsistent()), len(accepted))
+
+    def test_stale_version_is_refused(self):
+        # Devices that send the version they scored from retry on 409 until they have seen the latest ball
+        def scorer():
+            feeder = BallFeeder(self.match)
+            while True:
+                version = feeder.client.get(f'/api/matches/{self.match.id}/live/').data['version']
+                response = feeder.bowl(runs=2, expected_version=version)
+                if response.status_code != 409:
+                    self.assertEqual(response.status_code, 200)
+                    return
+
+        self.run_scorers(scorer)
+        deliveries = self.assertConsistent()
+        self.assertEqual(len(deliveries), self.THREADS * self.BALLS_PER_THREAD)
+        self.assertEqual(len({(d.over_number, d.ball_number) for d in deliveries}), len(deliveries))
+
+    def test_conflict_writes_nothing(self):
+        feeder = BallFeeder(self.match)
+        feeder.bowl(runs=1)
+        response = feeder.bowl(runs=4, expected_version=1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(feeder.undo().status_code, 200)
+        self.assertEqual(Delivery.objects.count(), 0)
+
+    def test_version_sent_as_text(self):
+        feeder = BallFeeder(self.match)
+        feeder.bowl(runs=1)
+        self.assertEqual(feeder.bowl(runs=4, expected_version='2').status_code, 200)
+        # Form-encoded, every value arrives as a string
+        url = f'/api/matches/{self.match.id}/undo/'
+        self.assertEqual(feeder.client.post(url, {'expected_version': '3'}).status_code, 200)
+        response = feeder.client.post(url, {'expected_version': 'latest'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expected_version', response.data['error'])
+
+
+class SimulatorTests(TestCase):
+    def play(self, seed, scenario, players=6):
+        simulated = SimulatedMatch(Recorder(), seed, scenario, players=players, undo_rate=0.1)
+        simulated.create()
+        simulated.play()
+        return Match.objects.get(pk=simulated.match_id), simulated.recorder
+
+    def outcomes(self, match):
+        return list(Delivery.objects.filter(innings__match=match).order_by('id').values_list(
+            'innings__innings_number', 'over_number', 'ball_number', 'runs_batter', 'extras', 'extra_type',
+            'wicket_type'))
+
+    def test_same_seed_scores_the_same_match(self):
+        first, _ = self.play(7, 'custom')
+        second, _ = self.play(7, 'custom')
+        self.assertEqual(first.status, 'COMPLETED')
+        self.assertEqual(self.outcomes(first), self.outcomes(second))
+        self.assertNotEqual(self.outcomes(first), self.outcomes(self.play(8, 'custom')[0]))
+
+    def test_scenarios_play_to_completion(self):
+        for seed, scenario in enumerate(SCENARIOS):
+            match, recorder = self.play(seed, scenario, players=4)
+            self.assertEqual(match.status, 'COMPLETED')
+            self.assertEqual(match.last_man_standing, scenario == 'last_man_standing')
+            summary = recorder.summary()
+            self.assertLessEqual(summary['bowl']['p50_ms'], summary['bowl']['p99_ms'])
+        caught = Delivery.objects.filter(wicket_type='CAUGHT')
+        self.assertTrue(caught.exists())
+        self.assertFalse(caught.filter(catcher__isnull=True).exists())
+
+
+class LoadTests(TransactionTestCase):
+    def test_run_load(self):
+        recorder = run_load(matches=2, spectators=2, scenarios=('custom',), players=4)
+        summary = recorder.summary()
+        self.assertEqual(Match.objects.filter(status='COMPLETED').count(), 2)
+        self.assertEqual(summary['create']['requests'], 2)
+        for endpoint in ('bowl', 'detail', 'live', 'scorecard', 'charts'):
+            self.assertGreater(summary[endpoint]['requests'], 0)
+            self.assertGreater(summary[endpoint]['max_queries'], 0)
+
+
+@override_settings(REQUEST_METRICS={'ENABLED': True, 'SLOW_REQUEST_MS': 60000})
+class InstrumentationTests(TestCase):
+    # Every instrumented request is logged to the console handler of api.requests; assertLogs captures the
+    # lines instead
+    def setUp(self):
+        with self.assertLogs('api.requests', 'INFO'):
+            self.match = create_match()
+        self.feeder = BallFeeder(self.match)
+        registry.reset()
+
+    def test_metrics_endpoint(self):
+        with self.assertLogs('api.requests', 'INFO'):
+            self.feeder.bowl(runs=4)
+            text = self.client.get('/api/metrics').content.decode()
+        self.assertIn('sbfc_http_requests_total{view="match-bowl",method="POST",status="200"} 1', text)
+        self.assertIn('sbfc_http_request_duration_seconds_count{view="match-bowl"} 1', text)
+        self.assertRegex(text, r'sbfc_http_db_queries_total\{view="match-bowl"\} [1-9]')
+        for name in ('insert_delivery', 'scorecard', 'history', 'serialize'):
+            self.assertIn(f'sbfc_span_duration_seconds_count{{span="{name}"}} 1', text)
+
+    def test_request_log(self):
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            self.feeder.bowl(runs=1)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['view'], record['status']), ('match-bowl', 200))
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('insert_delivery', record['spans'])
+        self.assertNotIn('sql', record)
+
+    @override_settings(REQUEST_METRICS={'ENABLED': True, 'SLOW_REQUEST_MS': 0})
+    def test_slow_request_logs_sql(self):
+        with self.assertLogs('api.requests', 'WARNING') as logs:
+            self.client.get(f'/api/matches/{self.match.id}/live/')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(len(record['sql']), record['queries'])
+
+    @override_settings(REQUEST_METRICS={'ENABLED': False})
+    def test_disabled(self):
+        self.feeder.bowl()
+        self.assertEqual(self.client.get('/api/metrics').status_code, 404)
+        self.assertEqual(registry.requests, {})
+        # Outside an instrumented request every span is the same no-op
+        self.assertIs(span('awards'), span('stats'))
+
+
+class CompactFormatTests(TestCase):
+    COMPACT = 'application/vnd.sbfc.compact+json'
+
+    def setUp(self):
+        self.match = create_match(custom_overs=10)
+        self.feeder = BallFeeder(self.match)
+        for runs in (1, 4, 0, 6, 0, 2) * 5:
+            self.feeder.bowl(runs=runs)
+        self.feeder.bowl(extra_type='WD', extras=1)
+        self.feeder.bowl(is_wicket=True, wicket_type='CAUGHT', catcher_id=Player.objects.get(name='B3').id)
+        self.url = f'/api/matches/{self.match.id}/'
+
+    def unpack(self, data):
+        codes = data['delivery_format']
+        rows = []
+        for row in data['innings'][0]['deliveries']:
+            delivery = dict(zip(codes['columns'], row))
+            delivery['extra_type'] = codes['extra_type'][delivery['extra_type']]
+            delivery['wicket_type'] = codes['wicket_type'][delivery['wicket_type']]
+            delivery['is_wicket'] = bool(delivery['is_wicket'])
+            rows.append(delivery)
+        return rows
+
+    def test_compact_json_round_trips(self):
+        plain = self.client.get(self.url).json()
+        response = self.client.get(self.url, HTTP_ACCEPT=self.COMPACT)
+        self.assertEqual(response['Content-Type'], self.COMPACT)
+        expected = [{k: v for k, v in d.items() if k != 'timestamp'} for d in plain['innings'][0]['deliveries']]
+        self.assertEqual(self.unpack(response.json()), expected)
+        self.assertEqual(response.json()['innings'][0]['total_runs'], plain['innings'][0]['total_runs'])
+        feed = self.client.get(f'{self.url}deliveries/?format=compact').json()
+        self.assertEqual(len(feed['deliveries']), 32)
+        self.assertIsInstance(feed['deliveries'][0], list)
+
+    def test_unknown_labels_are_packed_as_unknown(self):
+        # bowl does not check the labels it stores, one stray value must not break the match's responses
+        Delivery.objects.filter(extra_type='WD').update(extra_type='PEN', wicket_type='HANDLED')
+        cache.clear()
+        response = self.client.get(self.url, HTTP_ACCEPT=self.COMPACT)
+        self.assertEqual(response.status_code, 200)
+        codes = response.json()['delivery_format']['columns']
+        rows = response.json()['innings'][0]['deliveries']
+        self.assertEqual(sum(row[codes.index('extra_type')] == UNKNOWN_CODE for row in rows), 1)
+        self.assertEqual(sum(row[codes.index('wicket_type')] == UNKNOWN_CODE for row in rows), 1)
+
+    @skipUnless(importlib.util.find_spec('msgpack'), "msgpack is not installed")
+    def test_msgpack(self):
+        import msgpack
+        response = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(self.url, HTTP_ACCEPT=self.COMPACT).json())
+
+    def test_gzip(self):
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        # Compressed payload plus packed deliveries: an order of magnitude below the plain JSON
+        compact = self.client.get(self.url, HTTP_ACCEPT=self.COMPACT, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertLess(len(compact.content) * 10, len(plain.content))
+        self.assertNotIn('Content-Encoding', self.client.get(f'{self.url}live/', HTTP_ACCEPT_ENCODING='identity'))
+
+    def test_malformed_accept_encoding(self):
+        for header in ('br;q=1.2.3', 'gzip;q=.'):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Content-Encoding', response)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br;q=1.2.3, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    @skipUnless(importlib.util.find_spec('brotli'), "brotli is not installed")
+    def test_brotli(self):
+        import brotli
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.client.get(self.url).content)
+
+    def test_streaming_responses_are_not_compressed(self):
+        response = self.client.get('/api/matches/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        b''.join(response.streaming_content)
+
+
+@override_settings(BACKGROUND_JOBS=INLINE_JOBS)
+class TestMatchTests(TestCase):
+    def setUp(self):
+        # Four-player squads: three wickets end an innings
+        self.match = create_match(format='TEST', custom_overs=None)
+        self.feeder = BallFeeder(self.match)
+        self.url = f'/api/matches/{self.match.id}/'
+
+    def all_out(self, runs):
+        if runs:
+            self.feeder.bowl(runs=runs)
+        for _ in range(3):
+            self.feeder.bowl(is_wicket=True)
+
+    def test_four_innings_chase(self):
+        self.all_out(10)
+        self.all_out(5)
+        third = self.feeder.innings()
+        self.assertEqual((third.innings_number, third.batting_team_id, third.lead_at_start),
+                         (3, self.match.team_a_id, 5))
+        self.all_out(6)
+        fourth = self.feeder.innings()
+        self.assertEqual((fourth.batting_team_id, fourth.target, fourth.lead_at_start), (self.match.team_b_id, 12, -11))
+        self.feeder.bowl(is_wicket=True)
+        data = self.feeder.bowl(runs=12).data
+        self.assertEqual((data['result'], data['winner'], data['win_by'], data['win_margin']),
+                         ('WIN', self.match.team_b_id, 'WICKETS', 2))
+        self.assertEqual([i['lead'] for i in data['innings']], [10, -5, 11, 1])
+
+    def test_follow_on_and_innings_win(self):
+        Match.objects.filter(pk=self.match.pk).update(days=1)
+        self.all_out(80)
+        self.all_out(4)
+        data = self.client.post(f'{self.url}follow-on/').data
+        third = data['innings'][2]
+        self.assertEqual((third['batting_team'], third['lead'], third['follow_on']), (self.match.team_b_id, -76, True))
+        self.all_out(10)
+        self.match.refresh_from_db()
+        self.assertEqual((self.match.result, self.match.winner_id, self.match.win_by, self.match.win_margin),
+                         ('WIN', self.match.team_a_id, 'INNINGS', 66))
+        self.assertEqual(self.match.innings.count(), 3)
+
+    def test_follow_on_needs_the_margin(self):
+        self.all_out(150)
+        self.all_out(0)
+        # Five days by default: 200 runs
+        response = self.client.post(f'{self.url}follow-on/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('200', response.data['error'])
+        self.feeder.bowl(runs=1)
+        self.assertEqual(self.client.post(f'{self.url}follow-on/').status_code, 400)
+
+    def test_declaration(self):
+        self.feeder.bowl(runs=30)
+        data = self.client.post(f'{self.url}declare/').data
+        self.assertTrue(data['innings'][0]['is_declared'])
+        self.assertEqual(data['innings'][1]['lead'], -30)
+        self.assertIsNone(data['innings'][1]['target'])
+        t20 = create_match()
+        self.assertEqual(self.client.post(f'/api/matches/{t20.id}/declare/').status_code, 400)
+
+    def test_sessions_end_in_a_draw(self):
+        Match.objects.filter(pk=self.match.pk).update(days=1)
+        self.feeder.bowl(runs=4)
+        self.feeder.bowl(runs=2)
+        data = self.client.post(f'{self.url}session/').data
+        self.assertEqual((data['day'], data['session'], data['status']), (1, 2, 'LIVE'))
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.session_start_balls, 2)
+        self.assertEqual(self.client.get(f'{self.url}live/').data['over_rate'], 0.0)
+        self.client.post(f'{self.url}session/')
+        data = self.client.post(f'{self.url}session/').data
+        self.assertEqual((data['status'], data['result'], data['winner']), ('COMPLETED', 'DRAW', None))
+        self.assertEqual(self.feeder.bowl(runs=1).status_code, 400)
+        self.assertEqual(TeamStats.objects.get(team_id=self.match.team_a_id, tournament=None).drawn, 1)
+
+
+class PredictionTests(TestCase):
+    def setUp(self):
+        self.match = create_match()
+        self.feeder = BallFeeder(self.match)
+
+    def test_model(self):
+        model = PredictionModel.prior()
+        # 20 overs, 10 wickets
+        self.assertEqual(model.predict(State(150, 3, 120, 150, 1.2, 10, 120)), (150, 1.0))
+        self.assertEqual(model.predict(State(148, 10, 100, 150, 1.2, 10, 120))[1], 0.0)
+        self.assertEqual(model.predict(State(149, 4, 120, 150, 1.2, 10, 120))[1], 0.5)
+        easy = model.predict(State(100, 2, 90, 120, 1.2, 10, 120))[1]
+        hard = model.predict(State(100, 8, 90, 160, 1.2, 10, 120))[1]
+        self.assertGreater(easy, 0.9)
+        self.assertLess(hard, 0.1)
+        # A first innings on par is even, a flying start is not
+        projected, probability = model.predict(State(0, 0, 0, None, None, 10, 120))
+        self.assertAlmostEqual(probability, 0.5)
+        self.assertGreater(model.predict(State(60, 0, 30, None, 2.0, 10, 120))[1], 0.6)
+
+    def test_series_follows_bowl_and_undo(self):
+        for runs in (4, 6, 1):
+            self.feeder.bowl(runs=runs)
+        innings = self.feeder.innings()
+        rates = list(innings.predictions.values_list('recent_run_rate', flat=True))
+        self.assertEqual(len(rates), 3)
+        self.assertEqual(innings.recent_run_rate, rates[-1])
+        self.feeder.undo()
+        innings.refresh_from_db()
+        self.assertEqual(innings.recent_run_rate, rates[1])
+        series = self.client.get(f'/api/matches/{self.match.id}/prediction/').data
+        self.assertEqual([row[:2] for row in series['innings'][0]['balls']], [[1, 4], [2, 10]])
+        live = self.client.get(f'/api/matches/{self.match.id}/live/').data['innings'][0]
+        self.assertEqual(live['win_probability'], series['innings'][0]['balls'][-1][4])
+
+    def test_chase_decided(self):
+        self.feeder.bowl(runs=5)
+        for _ in range(3):
+            self.feeder.bowl(is_wicket=True)
+        data = self.feeder.bowl(runs=6).data
+        self.assertEqual(data['status'], 'COMPLETED')
+        self.assertEqual(data['innings'][1]['win_probability'], 1.0)
+
+    def test_unlimited_innings_have_no_prediction(self):
+        match = create_match(format='TEST', custom_overs=None)
+        BallFeeder(match).bowl(runs=4)
+        self.assertFalse(BallPrediction.objects.filter(innings__match=match).exists())
+        innings = self.client.get(f'/api/matches/{match.id}/live/').data['innings'][0]
+        self.assertEqual((innings['projected_score'], innings['win_probability']), (None, None))
+
+    def test_calibration(self):
+        for seed in range(3):
+            simulated = SimulatedMatch(Recorder(), seed, 'custom', players=6)
+            simulated.create()
+            simulated.play()
+        BallPrediction.objects.update(win_probability=-1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / 'model.json')
+            self.addCleanup(get_model.cache_clear)
+            with override_settings(PREDICTION_MODEL_PATH=path):
+                call_command('calibrate_prediction', rebuild=True, stdout=StringIO())
+                self.assertEqual(get_model().to_json(), load_model(path).to_json())
+            self.assertNotEqual(load_model(path).to_json(), PredictionModel.prior().to_json())
+        self.assertFalse(BallPrediction.objects.filter(win_probability=-1).exists())
+        self.assertEqual(BallPrediction.objects.count(), Delivery.objects.filter(innings__match__format='T20').count())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    # A second SQLite file as the replica, added once the test databases exist; each test still runs in a
+    # transaction on both. Nothing replicates into it: what a request reads shows which database served it.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {**connections.settings['default'],
+                                           'NAME': str(Path(cls.directory.name) / 'replica.sqlite3')}
+        cls.test_databases = cls.databases
+        cls.databases = {*cls.databases, 'replica'}
+        with connections['replica'].schema_editor() as editor:
+            for model in apps.get_app_config('api').get_models():
+                editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.databases = cls.test_databases
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.match = create_match()
+        self.url = f'/api/matches/{self.match.id}/'
+
+    def test_spectator_reads_go_to_the_replica(self):
+        Team.objects.using('replica').create(name='Replica XI')
+        self.assertEqual([team['name'] for team in self.client.get('/api/teams/').data], ['Replica XI'])
+        self.assertEqual(self.client.get(f'{self.url}live/').status_code, 404)
+
+    def test_writers_read_their_writes(self):
+        scorer = APIClient()
+        response = scorer.post(f'{self.url}undo/')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PIN_HEADER, response)
+        response = BallFeeder(self.match).bowl(runs=4)
+        self.assertIn(PIN_HEADER, response)
+        scorer.credentials(**{'HTTP_X_PRIMARY_UNTIL': response[PIN_HEADER]})
+        self.assertEqual(scorer.get(f'{self.url}live/').data['innings'][0]['total_runs'], 4)
+        # The cookie pins clients that keep cookies, like the browser on the same site
+        bowled = BallFeeder(self.match)
+        bowled.bowl(runs=1)
+        self.assertEqual(bowled.client.get(f'{self.url}live/').status_code, 200)
+        # An expired pin
+        self.assertEqual(APIClient().get(f'{self.url}live/', HTTP_X_PRIMARY_UNTIL='1').status_code, 404)
+
+    def test_writes_and_cache_fills_use_the_primary(self):
+        self.assertEqual(self.client.get('/api/matches/').data['results'][0]['id'], self.match.id)
+        self.assertFalse(Match.objects.using('replica').exists())
+
+    def test_server_error_does_not_leave_the_thread_on_the_replica(self):
+        with mock.patch('api.views.TeamViewSet.list', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.get('/api/teams/')
+        self.assertFalse(reading_replica())
+        self.assertTrue(Match.objects.filter(pk=self.match.pk).exists())
+
+
+class AsyncUrls:
+    # The URLs as cricket_backend/asgi.py serves them (settings.ASYNC_API)
+    urlpatterns = [path('api/', include(build_urlpatterns(True)))]
+
+
+@override_settings(ROOT_URLCONF=AsyncUrls)
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Written through the sync views: the write pool's connections are outside the test transaction
+        with override_settings(ROOT_URLCONF='cricket_backend.urls'):
+            self.match = create_match(custom_overs=1)
+            self.feeder = BallFeeder(self.match)
+            for runs in (1, 4, 0):
+                self.feeder.bowl(runs=runs)
+        self.url = f'/api/matches/{self.match.id}/'
+
+    async def test_same_payloads_as_the_sync_views(self):
+        for url in (self.url, f'{self.url}live/', f'{self.url}scorecard/', '/api/matches/?status=LIVE'):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            with override_settings(ROOT_URLCONF='cricket_backend.urls'):
+                expected = await sync_to_async(self.client.get)(url)
+            self.assertEqual(response.json(), expected.json())
+
+    async def test_errors_and_negotiation(self):
+        response = await self.async_client.get('/api/matches/0/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'No Match matches the given query.'})
+        response = await self.async_client.get('/api/matches/?date=yesterday')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date', response.json())
+        response = await self.async_client.get(f'{self.url}live/', headers={'Accept': 'text/csv'})
+        self.assertEqual(response.status_code, 406)
+        response = await self.async_client.get(self.url, headers={'Accept': 'application/vnd.sbfc.compact+json'})
+        self.assertEqual(response.json()['delivery_format']['columns'][0], 'id')
+
+    async def test_completed_match_is_cached(self):
+        # Three more balls end the first innings, six dots the chase
+        with override_settings(ROOT_URLCONF='cricket_backend.urls'):
+            for _ in range(9):
+                await sync_to_async(self.feeder.bowl)()
+        first = await self.async_client.get(self.url)
+        self.assertEqual(first.json()['status'], 'COMPLETED')
+        # Shared with the sync views
+        with override_settings(ROOT_URLCONF='cricket_backend.urls'):
+            self.assertEqual((await sync_to_async(self.client.get)(self.url))['ETag'], first['ETag'])
+        response = await self.async_client.get(self.url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual((response.status_code, response.content), (304, b''))
+
+    @override_settings(REQUEST_METRICS={'ENABLED': True, 'SLOW_REQUEST_MS': 60000})
+    async def test_async_middleware(self):
+        registry.reset()
+        client = AsyncClient()
+        with self.assertLogs('api.requests', 'INFO'):
+            response = await client.get(self.url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['id'], self.match.id)
+        # Queries made by the ORM's worker thread are counted for the request
+        self.assertGreater(registry.queries['match-detail'], 0)
+
+
+@override_settings(ROOT_URLCONF=AsyncUrls)
+class AsyncWriteTests(TransactionTestCase):
+    def test_scoring_runs_in_the_write_pool(self):
+        match = create_match(custom_overs=1)
+        innings = BallFeeder(match).innings()
+        batters = list(Player.objects.filter(team_id=innings.batting_team_id).order_by('id'))
+        bowler = Player.objects.filter(team_id=innings.bowling_team_id).first()
+        payload = {'over_number': 0, 'ball_number': 1, 'batsman_id': batters[0].id,
+                   'non_striker_id': batters[1].id, 'bowler_id': bowler.id, 'runs_batter': 6}
+        threads = []
+
+        def recording(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return record_delivery(*args, **kwargs)
+
+        with mock.patch('api.views.record_delivery', recording):
+            response = async_to_sync(AsyncClient().post)(f'/api/matches/{match.id}/bowl/', payload,
+                                                         content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['innings'][0]['total_runs'], 6)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('scoring-write'))
+
+
+@task('test.flaky', max_attempts=2)
+def flaky_task(message):
+    raise RuntimeError(message)
+
+
+@override_settings(BACKGROUND_JOBS={'BACKEND': 'api.jobs.DatabaseQueue'})
+class JobTests(TestCase):
+    def finish_match(self, match):
+        feeder = BallFeeder(match)
+        for _ in range(12):
+            feeder.bowl()
+        match.refresh_from_db()
+        return feeder
+
+    def test_enqueue_with_a_key_is_idempotent(self):
+        first = enqueue('match.stats', {'match_id': 1}, key='match.stats:1:1')
+        second = enqueue('match.stats', {'match_id': 1}, key='match.stats:1:1')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failing_job_is_retried_then_failed(self):
+        job = enqueue('test.flaky', {'message': 'boom'})
+        with self.assertLogs('api.jobs', 'WARNING'):
+            self.assertEqual(run_due(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('PENDING', 1))
+        self.assertGreater(job.run_after, timezone.now())
+        # Not due again until the backoff has passed
+        self.assertEqual(run_due(), 0)
+        with self.assertLogs('api.jobs', 'ERROR'):
+            self.assertEqual(run_due(timezone.now() + timedelta(minutes=1)), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+    def test_completion_queues_post_processing(self):
+        match = create_match(custom_overs=1)
+        self.finish_match(match)
+        self.assertEqual(match.status, 'COMPLETED')
+        self.assertFalse(match.stats_recorded)
+        self.assertEqual(sorted(Job.objects.values_list('name', flat=True)),
+                         ['innings.charts', 'innings.charts', 'match.awards', 'match.stats'])
+        self.assertEqual(run_due(), 4)
+        match.refresh_from_db()
+        self.assertTrue(match.stats_recorded)
+        self.assertIsNotNone(match.man_of_match_id)
+        self.assertFalse(Job.objects.exclude(status='DONE').exists())
+
+    def test_jobs_of_an_undone_completion_do_nothing(self):
+        match = create_match(custom_overs=1)
+        self.finish_match(match).undo()
+        match.refresh_from_db()
+        self.assertEqual(match.status, 'LIVE')
+        run_due()
+        match.refresh_from_db()
+        self.assertFalse(match.stats_recorded)
+        self.assertIsNone(match.man_of_match_id)
+        self.assertFalse(PlayerStats.objects.exists())
+
+
+class ThreadPoolQueueTests(TransactionTestCase):
+    def test_jobs_run_on_a_worker_after_commit(self):
+        ran = threading.Event()
+        threads = []
+
+        @task('test.record')
+        def record():
+            threads.append(threading.current_thread().name)
+            ran.set()
+
+        queue = ThreadPoolQueue(workers=1)
+        with transaction.atomic():
+            job = queue.enqueue('test.record', {})
+            self.assertFalse(ran.wait(0.2))
+        self.assertTrue(ran.wait(5))
+        queue.shutdown()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'DONE')
+        self.assertTrue(threads[0].startswith('jobs'))
+
+    @override_settings(BACKGROUND_JOBS={'BACKEND': 'api.jobs.ThreadPoolQueue', 'OPTIONS': {'workers': 1}})
+    def test_awards_reach_clients_after_completion(self):
+        match = create_match(custom_overs=1)
+        feeder = BallFeeder(match)
+        with mock.patch('api.tasks.publish_match_event') as publish:
+            for _ in range(12):
+                feeder.bowl()
+            queue = get_queue()
+            shutdown_queue()
+        self.assertIsNot(get_queue(), queue)
+        # A wake-up after the shutdown, e.g. a retry timer, is dropped
+        queue.wake()
+        match.refresh_from_db()
+        self.assertEqual(match.status, 'COMPLETED')
+        self.assertIsNotNone(match.man_of_match_id)
+        self.assertTrue(match.stats_recorded)
+        # The awards are a new version of the match, announced like any other change
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args.args[0].version, match.version)
+        self.assertEqual(feeder.client.get(f'/api/matches/{match.id}/').json()['version'], match.version)
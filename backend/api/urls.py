@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MatchViewSet, TeamViewSet, PlayerViewSet
+from .async_views import async_urlpatterns
+from .instrumentation import metrics_view
+from .views import MatchViewSet, TeamViewSet, PlayerViewSet, TournamentViewSet, StatsViewSet, match_events
 
 router = DefaultRouter()
 router.register(r'matches', MatchViewSet)
 router.register(r'teams', TeamViewSet)
 router.register(r'players', PlayerViewSet)
+router.register(r'tournaments', TournamentViewSet)
+router.register(r'stats', StatsViewSet, basename='stats')
 
-urlpatterns = [
-    path('', include(router.urls)),
-]
+
+def build_urlpatterns(async_api):
+    # Same URLs either way; under ASYNC_API the match reads are async views (see api.async_views)
+    return [
+        path('metrics', metrics_view, name='metrics'),
+        path('matches/<int:pk>/events/', match_events, name='match-events'),
+        path('', include(async_urlpatterns(router.urls) if async_api else router.urls)),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.ASYNC_API)
@@ -1,44 +1,144 @@
+import asyncio
+import json
+import tempfile
+
 from rest_framework import viewsets, status, decorators
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
+from django.db.models import F, Max, Prefetch
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Match, Team, Player, Innings, Delivery
-from .serializers import MatchSerializer, TeamSerializer, PlayerSerializer, InningsSerializer, DeliverySerializer
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Match, Team, Player, Innings, Delivery, Tournament, PlayerStats, TeamStats
+from .serializers import MatchSerializer, TeamSerializer, PlayerSerializer, InningsSerializer, DeliverySerializer, LiveStateSerializer, ScorecardSerializer, MatchSummarySerializer, TournamentSerializer, PlayerStatsSerializer, TeamStatsSerializer, with_match_prefetch, with_scorecard_prefetch
+from .pagination import MatchCursorPagination
+from .fixtures import FixtureError, resolve_team, resolve_tournament, parse_fixture_csv, import_fixture
+from .broadcast import get_broadcaster, publish_match_event
+from .charts import match_charts
+from .db_router import ReplicaReadMixin
+from .prediction import match_series
+from .instrumentation import span
+from .response_cache import cached_response
+from .export import iter_chunks, iter_npz, write_parquet
+from .scoring import ScoringError, VersionConflict, check_version, start_innings, record_delivery, record_batch, undo_last_delivery, redo_delivery, rewind_to_over, declare_innings, enforce_follow_on, close_session
+
+DELIVERY_FEED_LIMIT = 500
+EVENT_STREAM_KEEPALIVE = 15
+LEADERBOARD_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
+# Actions that change the match; they lock its row (see api.scoring.lock_match) before reading anything else
+SCORING_ACTIONS = ('toss', 'bowl', 'bowl_batch', 'undo', 'redo', 'rewind', 'declare', 'follow_on', 'session')
+
+def match_list_queryset(queryset, params):
+    """The match list with its filters, shared with the async list view (api.async_views)."""
+    queryset = queryset.select_related('team_a', 'team_b', 'winner').prefetch_related(
+        Prefetch('innings', queryset=Innings.objects.order_by('innings_number'))
+    )
+    # ?format= is taken by DRF for choosing the renderer, hence match_format
+    if params.get('status'):
+        queryset = queryset.filter(status=params['status'])
+    if params.get('match_format'):
+        queryset = queryset.filter(format=params['match_format'])
+    for param, lookup in (('date', 'created_at__date'), ('date_from', 'created_at__date__gte'),
+                          ('date_to', 'created_at__date__lte')):
+        if params.get(param):
+            try:
+                day = parse_date(params[param])
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValidationError({param: "Expected a date as YYYY-MM-DD"})
+            queryset = queryset.filter(**{lookup: day})
+    return queryset
 
-class MatchViewSet(viewsets.ModelViewSet):
+class MatchViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Match.objects.all()
     serializer_class = MatchSerializer
+    pagination_class = MatchCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            return with_match_prefetch(queryset)
+        if self.action in SCORING_ACTIONS:
+            # Same lock as api.scoring.lock_match, taken by get_object inside the action's transaction
+            return queryset.select_for_update()
+        if self.action != 'list':
+            # The other detail actions only take the match row from get_object and read what they render
+            # themselves (scorecard lines, chart cache, delivery feed)
+            return queryset
+
+        # Teams and winner joined, innings prefetched: two queries per page whatever the page holds
+        return match_list_queryset(queryset, self.request.query_params)
+
+    def get_object(self):
+        match = super().get_object()
+        if self.action in SCORING_ACTIONS:
+            # Optional {"expected_version": N}: refuse writes from a scorer that has not seen the latest ball
+            check_version(match, self.request.data.get('expected_version'))
+        return match
+
+    def handle_exception(self, exc):
+        if isinstance(exc, VersionConflict):
+            return Response({"error": str(exc), "version": exc.version}, status=status.HTTP_409_CONFLICT)
+        if isinstance(exc, ScoringError):
+            # Raised before the action's own handling, e.g. by check_version in get_object
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().handle_exception(exc)
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return MatchSummarySerializer
+        return super().get_serializer_class()
+
+    @cached_response('list')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response('detail')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def match_response(self, match, status=status.HTTP_200_OK):
+        # Re-read with the prefetch plan so the response reflects the writes without N+1 queries
+        with span('serialize'):
+            match = with_match_prefetch(Match.objects.all()).get(pk=match.pk)
+            data = MatchSerializer(match, context=self.get_serializer_context()).data
+        return Response(data, status=status)
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         data = request.data
-        
-        # Create Team A
-        team_a_data = data.get('team_a')
-        team_a = Team.objects.create(name=team_a_data['name'])
-        for p in team_a_data['players']:
-            Player.objects.create(name=p['name'], team=team_a, is_captain=p.get('is_captain', False))
-            
-        # Create Team B
-        team_b_data = data.get('team_b')
-        team_b = Team.objects.create(name=team_b_data['name'])
-        for p in team_b_data['players']:
-            Player.objects.create(name=p['name'], team=team_b, is_captain=p.get('is_captain', False))
-            
+
+        # New squads are inserted in bulk; {"id": ...} reuses an existing team and its players
+        try:
+            team_a = resolve_team(data.get('team_a'))
+            team_b = resolve_team(data.get('team_b'))
+            tournament = resolve_tournament(data.get('tournament'))
+        except FixtureError as e:
+            transaction.set_rollback(True)
+            return Response({"error": str(e)}, status=400)
+
         # Create Match
         match = Match.objects.create(
             format=data['format'],
             custom_overs=data.get('custom_overs'),
             last_man_standing=data.get('last_man_standing', False),
+            days=data.get('days'),
+            tournament=tournament,
             team_a=team_a,
             team_b=team_b,
             status='SETUP'
         )
         
-        serializer = self.get_serializer(match)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.match_response(match, status=status.HTTP_201_CREATED)
 
     @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
     def toss(self, request, pk=None):
         match = self.get_object()
         winner_id = request.data.get('winner_id')
@@ -47,238 +147,299 @@ class MatchViewSet(viewsets.ModelViewSet):
         match.toss_winner_id = winner_id
         match.toss_decision = decision
         match.status = 'LIVE'
+        match.version += 1
+        if match.format == 'TEST':
+            match.session_started_at = timezone.now()
         match.save()
         
         # Initialize First Innings
         batting_team_id = winner_id if decision == 'BAT' else (match.team_a_id if match.team_b_id == winner_id else match.team_b_id)
         bowling_team_id = match.team_b_id if batting_team_id == match.team_a_id else match.team_a_id
         
-        Innings.objects.create(
-            match=match,
-            innings_number=1,
-            batting_team_id=batting_team_id,
-            bowling_team_id=bowling_team_id
-        )
+        innings = start_innings(match, 1, batting_team_id, bowling_team_id)
+        transaction.on_commit(lambda: publish_match_event(match, 'toss', innings))
         
-        return Response(self.get_serializer(match).data)
+        return self.match_response(match)
 
     @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
     def bowl(self, request, pk=None):
         match = self.get_object()
         innings = match.innings.order_by('-innings_number').first()
-        if not innings or innings.is_completed:
-            return Response({"error": "No active innings"}, status=400)
+        try:
+            delivery = record_delivery(match, innings, request.data)
+        except ScoringError as e:
+            return Response({"error": str(e)}, status=400)
 
-        data = request.data
-        
-        # Enforce: a bowler cannot bowl consecutive overs
-        # Determine start of over and previous over's bowler from last legal ball
-        prev_legal_qs = Delivery.objects.filter(innings=innings).exclude(extra_type__in=['WD', 'NB']).order_by('-over_number', '-ball_number')
-        legal_balls_before = prev_legal_qs.count()
-        start_of_over = (legal_balls_before % 6) == 0
-        last_legal = prev_legal_qs.first()
-        if start_of_over and last_legal and data.get('bowler_id') == last_legal.bowler_id:
-            return Response({"error": "Bowler cannot bowl consecutive overs"}, status=400)
-        
-        # Create Delivery
-        delivery = Delivery.objects.create(
-            innings=innings,
-            over_number=data['over_number'],
-            ball_number=data['ball_number'],
-            batsman_id=data['batsman_id'],
-            # Allow this to be None for Last Man Standing
-            non_striker_id=data.get('non_striker_id'), 
-            bowler_id=data['bowler_id'],
-            runs_batter=data.get('runs_batter', 0),
-            extras=data.get('extras', 0),
-            extra_type=data.get('extra_type', 'NONE'),
-            is_wicket=data.get('is_wicket', False),
-            wicket_type=data.get('wicket_type', 'NONE'),
-            player_out_id=data.get('player_out_id'),
-            catcher_id=data.get('catcher_id')
-        )
-        
-        # Update Innings Stats
-        total_runs = innings.total_runs + delivery.runs_batter + delivery.extras
-        innings.total_runs = total_runs
-        
-        if delivery.is_wicket:
-            innings.total_wickets += 1
-            
-        # Update Overs
-        # Logic: If legal delivery (not WD or NB), increment ball count
-        is_legal = delivery.extra_type not in ['WD', 'NB']
-        if is_legal:
-            # Simple float representation for overs (e.g. 0.1, 0.2 ... 0.5, 1.0)
-            # This is tricky with float math, better to store balls and convert.
-            # But for now, let's just use the current over_number and ball_number from FE or calculate
-            # We will rely on FE to send correct over/ball number or calculate it here.
-            # Let's calculate from DB count of legal deliveries
-            legal_balls = Delivery.objects.filter(innings=innings, extra_type__in=['NONE', 'B', 'LB']).count()
-            overs = legal_balls // 6
-            balls = legal_balls % 6
-            innings.overs_bowled = float(f"{overs}.{balls}")
-            
-        innings.save()
-        
-        # Check logic for Innings End (All out or Overs limit)
-        team_size = innings.batting_team.players.count()
-        is_all_out = innings.total_wickets >= (team_size if match.last_man_standing else max(0, team_size - 1))
-        
-        is_overs_limit = False
-        # Calculate max overs (handle custom_overs or default T20)
-        max_overs = match.custom_overs if match.custom_overs else 20
-        
-        if match.format == 'T20' and innings.overs_bowled >= max_overs:
-            is_overs_limit = True
-
-        # Check if Target reached (for 2nd innings)
-        is_target_reached = False
-        if innings.innings_number == 2:
-            first_inn = match.innings.get(innings_number=1)
-            if innings.total_runs > first_inn.total_runs:
-                is_target_reached = True
-                
-        if is_all_out or is_overs_limit or is_target_reached or data.get('declare', False):
-            innings.is_completed = True
-            innings.save()
-            
-            # Start Next Innings if applicable
-            if match.format == 'T20' and innings.innings_number == 1:
-                Innings.objects.create(
-                    match=match,
-                    innings_number=2,
-                    batting_team=innings.bowling_team,
-                    bowling_team=innings.batting_team
-                )
-            elif match.format == 'T20' and innings.innings_number == 2:
-                match.status = 'COMPLETED'
-                # Determine winner
-                inn1 = match.innings.get(innings_number=1)
-                inn2 = innings
-                if inn1.total_runs > inn2.total_runs:
-                    match.winner = inn1.batting_team
-                elif inn2.total_runs > inn1.total_runs:
-                    match.winner = inn2.batting_team
-                
-                # Calculate Awards
-                all_deliveries = Delivery.objects.filter(innings__match=match)
-                
-                # Best Batsman
-                batsmen_stats = {} # id -> {runs: 0, balls: 0}
-                for d in all_deliveries:
-                    if d.batsman_id not in batsmen_stats:
-                        batsmen_stats[d.batsman_id] = {'runs': 0, 'balls': 0}
-                    batsmen_stats[d.batsman_id]['runs'] += d.runs_batter
-                    if d.extra_type != 'WD':
-                        batsmen_stats[d.batsman_id]['balls'] += 1
-                
-                if batsmen_stats:
-                    # Sort by Runs (desc), then Balls (asc)
-                    best_batsman_id = sorted(
-                        batsmen_stats.keys(), 
-                        key=lambda pid: (-batsmen_stats[pid]['runs'], batsmen_stats[pid]['balls'])
-                    )[0]
-                    match.best_batsman_id = best_batsman_id
-                
-                # Best Bowler
-                bowler_stats = {} # id -> {wickets: 0, runs: 0}
-                for d in all_deliveries:
-                    if d.bowler_id not in bowler_stats:
-                        bowler_stats[d.bowler_id] = {'wickets': 0, 'runs': 0}
-                    
-                    if d.is_wicket and d.wicket_type != 'RUN_OUT':
-                        bowler_stats[d.bowler_id]['wickets'] += 1
-                    
-                    # Calculate runs conceded (batter runs + extras)
-                    # Note: Byes/LegByes usually don't count to bowler, but for simplicity here we might include or exclude.
-                    # Standard: Wides/NoBalls count to bowler.
-                    run_cost = d.runs_batter
-                    if d.extra_type in ['WD', 'NB']:
-                        run_cost += d.extras
-                    bowler_stats[d.bowler_id]['runs'] += run_cost
-
-                if bowler_stats:
-                    # Sort by Wickets (desc), then Runs Conceded (asc)
-                    best_bowler_id = sorted(
-                        bowler_stats.keys(),
-                        key=lambda pid: (-bowler_stats[pid]['wickets'], bowler_stats[pid]['runs'])
-                    )[0]
-                    match.best_bowler_id = best_bowler_id
-                
-                # Man of Match (Simple: Max runs + 20 * wickets)
-                mom_points = {}
-                for pid, stats in batsmen_stats.items():
-                    mom_points[pid] = mom_points.get(pid, 0) + stats['runs']
-                for pid, stats in bowler_stats.items():
-                    mom_points[pid] = mom_points.get(pid, 0) + (stats['wickets'] * 20)
-                
-                if mom_points:
-                    mom_id = max(mom_points, key=mom_points.get)
-                    match.man_of_match_id = mom_id
-
-                match.save()
-            # Add TEST logic similarly...
-
-        return Response(self.get_serializer(match).data)
+        transaction.on_commit(lambda: publish_match_event(match, 'bowl', innings, delivery))
+
+        return self.match_response(match)
+
+    @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
+    def bowl_batch(self, request, pk=None):
+        # Catch-up for offline scorers: every queued ball in one transaction, all or nothing.
+        # Only the final live state is returned, clients that need the balls read /deliveries/.
+        match = self.get_object()
+        try:
+            innings, delivery, applied, skipped = record_batch(match, request.data.get('deliveries'))
+        except ScoringError as e:
+            transaction.set_rollback(True)
+            return Response({"error": str(e)}, status=400)
+
+        if applied:
+            transaction.on_commit(lambda: publish_match_event(match, 'bowl', innings, delivery))
+
+        return Response({**self.live_state(match), 'applied': applied, 'skipped': skipped})
+
+    @decorators.action(detail=False, methods=['get'])
+    def export(self, request):
+        # Columnar delivery dump for season analysis: ?type=npz (default) or parquet, optionally narrowed
+        # with ?match= or ?tournament=. Rows are read in chunks, memory does not grow with the export.
+        deliveries = Delivery.objects.all()
+        for param, lookup in (('match', 'innings__match_id'), ('tournament', 'innings__match__tournament_id')):
+            if request.query_params.get(param):
+                try:
+                    deliveries = deliveries.filter(**{lookup: int(request.query_params[param])})
+                except ValueError:
+                    return Response({"error": f"{param} must be an id"}, status=400)
+
+        file_type = request.query_params.get('type', 'npz')
+        if file_type == 'npz':
+            response = StreamingHttpResponse(iter_npz(iter_chunks(deliveries)), content_type='application/zip')
+        elif file_type == 'parquet':
+            # Parquet writes its footer last, so it goes through a temporary file
+            output = tempfile.TemporaryFile()
+            try:
+                write_parquet(iter_chunks(deliveries), output)
+            except ImproperlyConfigured as e:
+                output.close()
+                return Response({"error": str(e)}, status=400)
+            output.seek(0)
+            response = FileResponse(output, content_type='application/vnd.apache.parquet')
+        else:
+            return Response({"error": "type must be npz or parquet"}, status=400)
+        response['Content-Disposition'] = f'attachment; filename="deliveries.{file_type}"'
+        return response
 
     @decorators.action(detail=True, methods=['get'])
+    @cached_response('scorecard')
     def scorecard(self, request, pk=None):
+        match = with_scorecard_prefetch(Match.objects.all()).get(pk=self.get_object().pk)
+        return Response(ScorecardSerializer(match).data)
+
+    @decorators.action(detail=True, methods=['get'])
+    def charts(self, request, pk=None):
+        # Worm, Manhattan, run rate, fall of wickets and partnerships per innings; completed overs come from cache
+        return Response(match_charts(self.get_object()))
+
+    @decorators.action(detail=True, methods=['get'])
+    def prediction(self, request, pk=None):
+        # Projected score and win probability after every ball, stored as the balls were scored
+        return Response(match_series(self.get_object()))
+
+    @decorators.action(detail=True, methods=['get'])
+    def live(self, request, pk=None):
+        return Response(self.live_state(self.get_object()))
+
+    def live_state(self, match):
+        innings = list(match.innings.all())
+        match.last_delivery_id = Delivery.objects.filter(innings__in=innings).aggregate(last=Max('id'))['last']
+        return LiveStateSerializer(match).data
+
+    @decorators.action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        # Delta feed: balls bowled after ?since=<delivery id>. Undo removes balls, so clients whose
+        # version predates last_undo_version have to resync from the full match instead.
         match = self.get_object()
-        # Return detailed scorecard data
-        # This can be computed or retrieved.
-        # For simplicity, returning the match serialization which includes innings/deliveries is often enough, 
-        # but aggregated stats per player are better.
-        return Response(self.get_serializer(match).data)
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response({"error": "since must be a delivery id"}, status=400)
+
+        innings_ids = list(match.innings.values_list('id', flat=True))
+        deliveries = list(Delivery.objects.filter(innings_id__in=innings_ids, id__gt=since)
+                          .order_by('id')[:DELIVERY_FEED_LIMIT + 1])
+        return Response({
+            'version': match.version,
+            'last_undo_version': match.last_undo_version,
+            'has_more': len(deliveries) > DELIVERY_FEED_LIMIT,
+            'deliveries': DeliverySerializer(deliveries[:DELIVERY_FEED_LIMIT], many=True).data,
+        })
 
     @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
     def undo(self, request, pk=None):
         match = self.get_object()
         innings = match.innings.order_by('-innings_number').first()
-        if not innings:
-            return Response({"error": "No innings found"}, status=400)
-        last_delivery = Delivery.objects.filter(innings=innings).order_by('-over_number', '-ball_number', '-id').first()
-        if not last_delivery:
-            return Response({"error": "No deliveries to undo"}, status=400)
-        
-        innings.total_runs = max(0, innings.total_runs - (last_delivery.runs_batter + last_delivery.extras))
-        if last_delivery.is_wicket:
-            innings.total_wickets = max(0, innings.total_wickets - 1)
-        last_delivery.delete()
-        
-        legal_balls = Delivery.objects.filter(innings=innings).exclude(extra_type__in=['WD', 'NB']).count()
-        overs = legal_balls // 6
-        balls = legal_balls % 6
-        innings.overs_bowled = float(f"{overs}.{balls}")
-        
-        # If innings was completed due to last ball, re-evaluate completion
-        team_size = innings.batting_team.players.count()
-        is_all_out = innings.total_wickets >= (team_size if match.last_man_standing else max(0, team_size - 1))
-        max_overs = match.custom_overs if match.custom_overs else 20
-        is_overs_limit = (match.format == 'T20' and innings.overs_bowled >= max_overs)
-        is_target_reached = False
-        if innings.innings_number == 2:
-            inn1 = match.innings.get(innings_number=1)
-            if innings.total_runs > inn1.total_runs:
-                is_target_reached = True
-        
-        if innings.is_completed and not (is_all_out or is_overs_limit or is_target_reached):
-            innings.is_completed = False
-            if match.status == 'COMPLETED':
-                match.status = 'LIVE'
-                match.winner = None
-                match.best_batsman = None
-                match.best_bowler = None
-                match.man_of_match = None
-                match.save()
-        
-        innings.save()
-        return Response(self.get_serializer(match).data)
+        try:
+            undo_last_delivery(match, innings)
+        except ScoringError as e:
+            return Response({"error": str(e)}, status=400)
+
+        transaction.on_commit(lambda: publish_match_event(match, 'undo', innings))
+
+        return self.match_response(match)
+
+    @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
+    def redo(self, request, pk=None):
+        match = self.get_object()
+        innings = match.innings.order_by('-innings_number').first()
+        try:
+            delivery = redo_delivery(match, innings)
+        except ScoringError as e:
+            return Response({"error": str(e)}, status=400)
+
+        transaction.on_commit(lambda: publish_match_event(match, 'bowl', innings, delivery))
+
+        return self.match_response(match)
+
+    @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
+    def rewind(self, request, pk=None):
+        # Back to the start of {"over": N}; the removed balls can be redone one at a time
+        match = self.get_object()
+        innings = match.innings.order_by('-innings_number').first()
+        try:
+            over = int(request.data.get('over'))
+        except (TypeError, ValueError):
+            return Response({"error": "over must be a number"}, status=400)
+        try:
+            rewind_to_over(match, innings, over)
+        except ScoringError as e:
+            return Response({"error": str(e)}, status=400)
+
+        transaction.on_commit(lambda: publish_match_event(match, 'undo', innings))
+
+        return self.match_response(match)
+
+    def innings_action(self, request, apply, event):
+        # Test match state changes that act on the current innings and record no ball
+        match = self.get_object()
+        innings = match.innings.order_by('-innings_number').first()
+        try:
+            apply(match, innings)
+        except ScoringError as e:
+            return Response({"error": str(e)}, status=400)
 
-class TeamViewSet(viewsets.ModelViewSet):
+        transaction.on_commit(lambda: publish_match_event(match, event, innings))
+
+        return self.match_response(match)
+
+    @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
+    def declare(self, request, pk=None):
+        return self.innings_action(request, declare_innings, 'declare')
+
+    @decorators.action(detail=True, methods=['post'], url_path='follow-on')
+    @transaction.atomic
+    def follow_on(self, request, pk=None):
+        return self.innings_action(request, enforce_follow_on, 'follow_on')
+
+    @decorators.action(detail=True, methods=['post'])
+    @transaction.atomic
+    def session(self, request, pk=None):
+        # Close of play for the session; stumps on the last day draws the match
+        return self.innings_action(
+            request, lambda match, innings: close_session(match, innings, timezone.now()), 'session')
+
+class TournamentViewSet(viewsets.ModelViewSet):
+    queryset = Tournament.objects.prefetch_related('matches')
+    serializer_class = TournamentSerializer
+
+    @decorators.action(detail=False, methods=['post'], url_path='import')
+    def import_fixture(self, request):
+        # JSON fixture in the body, or an uploaded .json/.csv file
+        upload = request.FILES.get('file')
+        try:
+            if upload is None:
+                data = request.data
+            elif upload.name.endswith('.csv'):
+                options = {key: request.POST[key] for key in ('name', 'format', 'custom_overs', 'last_man_standing')
+                           if key in request.POST}
+                data = parse_fixture_csv(upload.read().decode('utf-8-sig'), **options)
+            else:
+                data = json.loads(upload.read())
+            tournament = import_fixture(data)
+        except (FixtureError, ValueError) as e:
+            return Response({"error": str(e)}, status=400)
+        return Response(self.get_serializer(tournament).data, status=status.HTTP_201_CREATED)
+
+class TeamViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
 
-class PlayerViewSet(viewsets.ModelViewSet):
+class PlayerViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
+
+    @decorators.action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        # Career totals first, then one row per tournament
+        player = self.get_object()
+        rows = (PlayerStats.objects.filter(player=player).select_related('player__team')
+                .order_by(F('tournament_id').asc(nulls_first=True)))
+        return Response(PlayerStatsSerializer(rows, many=True).data)
+
+class StatsViewSet(viewsets.ViewSet):
+    # Leaderboards read the rollup tables only: an index range scan and LIMIT, however many matches exist.
+    # ?tournament=<id> narrows to one tournament, the default is career totals.
+
+    def scoped(self, queryset):
+        params = self.request.query_params
+        try:
+            limit = min(int(params.get('limit', LEADERBOARD_LIMIT)), LEADERBOARD_MAX_LIMIT)
+            tournament = int(params['tournament']) if params.get('tournament') else None
+        except ValueError:
+            raise ValidationError({"error": "limit and tournament must be numbers"})
+        if limit < 1:
+            raise ValidationError({"error": "limit must be at least 1"})
+        if tournament is None:
+            return queryset.filter(tournament__isnull=True), limit
+        return queryset.filter(tournament_id=tournament), limit
+
+    @decorators.action(detail=False, methods=['get'])
+    def batting(self, request):
+        rows, limit = self.scoped(PlayerStats.objects.filter(runs__gt=0).select_related('player__team'))
+        rows = rows.order_by('-runs', 'balls', 'player_id')[:limit]
+        return Response(PlayerStatsSerializer(rows, many=True).data)
+
+    @decorators.action(detail=False, methods=['get'])
+    def bowling(self, request):
+        rows, limit = self.scoped(PlayerStats.objects.filter(wickets__gt=0).select_related('player__team'))
+        rows = rows.order_by('-wickets', 'runs_conceded', 'player_id')[:limit]
+        return Response(PlayerStatsSerializer(rows, many=True).data)
+
+    @decorators.action(detail=False, methods=['get'])
+    def teams(self, request):
+        rows, limit = self.scoped(TeamStats.objects.select_related('team'))
+        rows = rows.order_by('-won', 'lost', 'team_id')[:limit]
+        return Response(TeamStatsSerializer(rows, many=True).data)
+
+async def match_events(request, pk):
+    # Server-sent events: one small event per toss/ball/undo instead of full-match polling
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Live events are only available on the ASGI server"}, status=503)
+    if not await Match.objects.filter(pk=pk).aexists():
+        raise Http404
+
+    broadcaster = get_broadcaster()
+    subscription = broadcaster.subscribe(pk)
+
+    async def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscription.get(), EVENT_STREAM_KEEPALIVE)
+                    yield f'data: {payload}\n\n'
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
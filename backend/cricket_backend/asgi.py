@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cricket_backend.settings')
+# Serve match reads with the async views (api.async_views) instead of through the sync bridge
+os.environ.setdefault('ASYNC_API', 'true')
 
 application = get_asgi_application()
@@ -1,5 +1,7 @@
+import importlib.util
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers as default_cors_headers
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,8 +34,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', # Must be at the top
+    'api.instrumentation.RequestMetricsMiddleware', # Removes itself unless REQUEST_METRICS is enabled
+    'api.compression.CompressionMiddleware', # brotli or gzip, before anything that reads the body
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # Add for static files
+    'api.static.StaticFilesMiddleware', # WhiteNoise, async-capable so ASGI requests stay off the sync thread
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,12 +78,46 @@ WSGI_APPLICATION = 'cricket_backend.wsgi.application'
 # Database Configuration
 # This uses the DATABASE_URL environment variable (PostgreSQL) on Render 
 # and defaults to local SQLite if DATABASE_URL is not found.
-DATABASES = {
-    'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
-        conn_max_age=600
-    )
-}
+# DATABASE_POOLED=true when the URLs point at pgbouncer in transaction pooling mode: server-side cursors
+# do not survive between transactions there.
+DATABASE_POOLED = os.environ.get('DATABASE_POOLED', 'False').lower() == 'true'
+
+
+def database(url):
+    config = dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    if DATABASE_POOLED:
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    if config['ENGINE'] == 'django.db.backends.sqlite3':
+        # SQLite ignores select_for_update; taking the write lock when the transaction begins serializes
+        # scoring writes the same way (see api.scoring.lock_match)
+        config.setdefault('OPTIONS', {}).update({'transaction_mode': 'IMMEDIATE', 'timeout': 20})
+    return config
+
+
+DATABASES = {'default': database(os.environ.get('DATABASE_URL', f"sqlite:///{BASE_DIR / 'db.sqlite3'}"))}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # A file, unlike the shared in-memory database, lets concurrent test connections wait for the lock
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+# Optional read replicas for spectator reads (see api.db_router), comma separated URLs. Two SQLite files
+# work locally too, copy the primary to the replica to "replicate". Tests read the primary through them.
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**database(url.strip()), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+# How long a client that wrote keeps reading from the primary
+DATABASE_REPLICA_PIN_SECONDS = float(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 5))
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+# Lets cross-origin scorer clients read the pin and send it back (see api.db_router)
+CORS_EXPOSE_HEADERS = ['X-Primary-Until']
+CORS_ALLOW_HEADERS = [*default_cors_headers, 'x-primary-until']
+
+# Async match reads on the ASGI server (see api.async_views); cricket_backend/asgi.py turns this on. Scoring
+# writes and the other sync match views then run in a pool of SCORING_WRITE_THREADS threads, each of which
+# holds its own database connection.
+ASYNC_API = os.environ.get('ASYNC_API', 'False').lower() == 'true'
+SCORING_WRITE_THREADS = int(os.environ.get('SCORING_WRITE_THREADS', 4))
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -102,4 +140,64 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # WhiteNoise storage optimization
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Live scoring push channel. Set LIVE_BROADCAST_REDIS_URL to relay events between server processes.
+LIVE_BROADCASTER = {'BACKEND': 'api.broadcast.InProcessBroadcaster', 'OPTIONS': {}}
+if os.environ.get('LIVE_BROADCAST_REDIS_URL'):
+    LIVE_BROADCASTER = {
+        'BACKEND': 'api.broadcast.RedisBroadcaster',
+        'OPTIONS': {'url': os.environ['LIVE_BROADCAST_REDIS_URL']},
+    }
+
+# Background jobs (see api.jobs): awards, stats rollups and chart warming after a match or innings ends.
+# The default runs them on JOB_WORKERS threads of the web process; with api.jobs.DatabaseQueue they wait
+# for `manage.py run_jobs`, with api.jobs.ImmediateQueue they run inline.
+BACKGROUND_JOBS = {
+    'BACKEND': os.environ.get('BACKGROUND_JOBS_BACKEND', 'api.jobs.ThreadPoolQueue'),
+    'OPTIONS': {'workers': int(os.environ.get('JOB_WORKERS', 2))},
+}
+
+# Clients opt in to the compact encodings with Accept: application/vnd.sbfc.compact+json or
+# application/msgpack (the latter only when the msgpack package is installed), see api.renderers
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.CompactJSONRenderer',
+        *(['api.renderers.MsgpackRenderer'] if importlib.util.find_spec('msgpack') else []),
+    ],
+}
+
+# Per-request timing, query counts and scoring spans at /api/metrics (see api.instrumentation).
+# Off unless REQUEST_METRICS=true; requests slower than REQUEST_METRICS_SLOW_MS log their SQL.
+REQUEST_METRICS = {
+    'ENABLED': os.environ.get('REQUEST_METRICS', 'False').lower() == 'true',
+    'SLOW_REQUEST_MS': int(os.environ.get('REQUEST_METRICS_SLOW_MS', 500)),
+}
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'api.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False}},
+}
+
+# Response cache for completed matches and list pages (see api.response_cache). Local memory by default,
+# set CACHE_REDIS_URL to share it between server processes.
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        },
+    }
+# Seconds a cached response lives. Invalidation only reaches the cache of the process that handled the
+# write, so with local memory and several server processes the others keep serving the old response until
+# it expires: entries are only long-lived with a shared cache. 0 stores nothing (ETags still work).
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get(
+    'RESPONSE_CACHE_TIMEOUT', 24 * 60 * 60 if os.environ.get('CACHE_REDIS_URL') else 5))
+
+# Expected-runs table written by `manage.py calibrate_prediction` (see api.prediction); the built-in prior
+# is used while the file does not exist
+PREDICTION_MODEL_PATH = os.environ.get('PREDICTION_MODEL_PATH', str(BASE_DIR / 'prediction_model.json'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
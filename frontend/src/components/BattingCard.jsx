@@ -1,26 +1,25 @@
 import React from 'react';
 
-const BattingCard = ({ match, innings, striker, setStriker, nonStriker, setNonStriker }) => {
+const BattingCard = ({ match, innings, card, striker, setStriker, nonStriker, setNonStriker }) => {
   if (!innings) return <div className="bg-white/5 p-4 rounded-xl">Waiting for Innings...</div>;
 
   const battingTeamId = innings.batting_team;
   const battingTeam = match.team_a === battingTeamId ? match.team_a_details : match.team_b_details;
   const players = battingTeam.players;
+  const bowlingTeam = match.team_a === innings.bowling_team ? match.team_a_details : match.team_b_details;
 
-  // Helper to get dismissal info for a player
-  const getDismissalInfo = (playerId) => {
-    const wicketBall = innings.deliveries?.find(d => d.is_wicket && d.player_out === playerId);
-    if (!wicketBall) return null;
+  // Figures come from the innings scorecard (card), the backend's per-batter lines
+  const lineFor = (playerId) => card?.batting.find(line => line.player === playerId);
+  const fielderName = (playerId) => bowlingTeam.players.find(p => p.id === playerId)?.name;
 
-    const type = wicketBall.wicket_type;
-    // Find bowler name from the team details
-    const bowlingTeam = match.team_a === innings.bowling_team ? match.team_a_details : match.team_b_details;
-    const bowler = bowlingTeam.players.find(p => p.id === wicketBall.bowler);
-    const bowlerName = bowler ? bowler.name : 'bowler';
-    const catcher = wicketBall.catcher ? bowlingTeam.players.find(p => p.id === wicketBall.catcher) : null;
-    const catcherName = catcher ? catcher.name : null;
+  // Helper to get dismissal info for a batting line
+  const getDismissalInfo = (line) => {
+    if (!line?.is_out) return null;
 
-    switch (type) {
+    const bowlerName = fielderName(line.dismissed_by) || 'bowler';
+    const catcherName = line.caught_by ? fielderName(line.caught_by) : null;
+
+    switch (line.wicket_type) {
       case 'BOWLED': return `b ${bowlerName}`;
       case 'CAUGHT': return catcherName ? `c ${catcherName} b ${bowlerName}` : `c b ${bowlerName}`;
       case 'LBW': return `lbw b ${bowlerName}`;
@@ -31,19 +30,14 @@ const BattingCard = ({ match, innings, striker, setStriker, nonStriker, setNonSt
     }
   };
 
-  const getStats = (playerId) => {
-    if (!innings.deliveries) return { runs: 0, balls: 0, fours: 0, sixes: 0 };
-    const ballsFaced = innings.deliveries.filter(d => d.batsman === playerId);
-    const runs = ballsFaced.reduce((sum, d) => sum + d.runs_batter, 0);
-    const balls = ballsFaced.filter(d => d.extra_type !== 'WD').length;
-    const fours = ballsFaced.filter(d => d.runs_batter === 4).length;
-    const sixes = ballsFaced.filter(d => d.runs_batter === 6).length;
-    return { runs, balls, fours, sixes };
+  const getStats = (line) => {
+    if (!line) return { runs: 0, balls: 0, fours: 0, sixes: 0, sr: '0.0' };
+    return { runs: line.runs, balls: line.balls, fours: line.fours, sixes: line.sixes, sr: line.strike_rate.toFixed(1) };
   };
 
-  const outPlayerIds = innings?.deliveries
-    ?.filter(d => d.is_wicket && d.player_out)
-    .map(d => d.player_out) || [];
+  const outPlayerIds = card?.batting
+    .filter(line => line.is_out)
+    .map(line => line.player) || [];
 
   return (
     <div className="bg-white/5 p-4 rounded-xl border border-white/10">
@@ -60,11 +54,11 @@ const BattingCard = ({ match, innings, striker, setStriker, nonStriker, setNonSt
 
       <div className="space-y-2 max-h-80 overflow-y-auto">
         {players.map(player => {
-          const stats = getStats(player.id);
+          const line = lineFor(player.id);
+          const stats = getStats(line);
           const isStriker = striker?.id === player.id;
           const isNonStriker = nonStriker?.id === player.id;
-          const dismissal = getDismissalInfo(player.id);
-          const sr = stats.balls > 0 ? ((stats.runs / stats.balls) * 100).toFixed(1) : '0.0';
+          const dismissal = getDismissalInfo(line);
 
           return (
             <div key={player.id} className={`grid grid-cols-12 items-start p-2 rounded ${isStriker || isNonStriker ? 'bg-white/10' : ''}`}>
@@ -91,7 +85,7 @@ const BattingCard = ({ match, innings, striker, setStriker, nonStriker, setNonSt
               <div className="col-span-1 text-center">{stats.balls}</div>
               <div className="col-span-1 text-center text-gray-400">{stats.fours}</div>
               <div className="col-span-1 text-center text-gray-400">{stats.sixes}</div>
-              <div className="col-span-2 text-center text-gray-400">{sr}</div>
+              <div className="col-span-2 text-center text-gray-400">{stats.sr}</div>
             </div>
           );
         })}
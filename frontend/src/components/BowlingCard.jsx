@@ -1,6 +1,6 @@
 import React from 'react';
 
-const BowlingCard = ({ match, innings, bowler, setBowler }) => {
+const BowlingCard = ({ match, innings, card, bowler, setBowler }) => {
   if (!innings) return <div className="bg-white/5 p-4 rounded-xl">Waiting for Innings...</div>;
 
   const bowlingTeamId = innings.bowling_team;
@@ -8,36 +8,14 @@ const BowlingCard = ({ match, innings, bowler, setBowler }) => {
   const bowlingTeam = match.team_a === bowlingTeamId ? match.team_a_details : match.team_b_details;
   const players = bowlingTeam.players;
 
-  // Compute previous over bowler from last legal ball
+  // Previous over bowler from last legal ball
   const deliveries = innings.deliveries || [];
   const lastLegal = [...deliveries].reverse().find(d => !['WD', 'NB'].includes(d.extra_type));
   const prevOverBowlerId = lastLegal ? lastLegal.bowler : null;
-  const legalCount = deliveries.filter(d => !['WD', 'NB'].includes(d.extra_type)).length;
-  const startOfOver = legalCount % 6 === 0;
+  const startOfOver = innings.legal_balls % 6 === 0;
 
-  const getStats = (playerId) => {
-    if (!innings.deliveries) return { overs: 0, maidens: 0, runs: 0, wickets: 0 };
-    
-    const ballsBowled = innings.deliveries.filter(d => d.bowler === playerId);
-    
-    // Valid balls for overs count (exclude WD, NB)
-    const validBalls = ballsBowled.filter(d => !['WD', 'NB'].includes(d.extra_type)).length;
-    const overs = Math.floor(validBalls / 6);
-    const balls = validBalls % 6;
-    const oversDisplay = `${overs}.${balls}`;
-    
-    // Runs conceded: batter runs + extras (if bowled by bowler: WD, NB count, Byes/LB don't)
-    // Simplified: All extras count against bowler in T20 usually except Byes/LB.
-    const runsConceded = ballsBowled.reduce((sum, d) => {
-        let r = d.runs_batter;
-        if (['WD', 'NB'].includes(d.extra_type)) r += d.extras;
-        return sum + r;
-    }, 0);
-    
-    const wickets = ballsBowled.filter(d => d.is_wicket && d.wicket_type !== 'RUN_OUT').length;
-    
-    return { overs: oversDisplay, maidens: 0, runs: runsConceded, wickets };
-  };
+  // Figures come from the innings scorecard (card), the backend's per-bowler lines
+  const lineFor = (playerId) => card?.bowling.find(line => line.player === playerId);
 
   return (
     <div className="bg-white/5 p-4 rounded-xl border border-white/10">
@@ -54,9 +32,9 @@ const BowlingCard = ({ match, innings, bowler, setBowler }) => {
 
       <div className="space-y-2 max-h-60 overflow-y-auto">
         {players.map(player => {
-          const stats = getStats(player.id);
+          const line = lineFor(player.id);
           // Filter out bowlers who haven't bowled yet unless active
-          if (stats.overs === "0.0" && bowler?.id !== player.id) return null;
+          if (!line && bowler?.id !== player.id) return null;
           
           const isCurrentBowler = bowler?.id === player.id;
           
@@ -66,11 +44,11 @@ const BowlingCard = ({ match, innings, bowler, setBowler }) => {
                 <span className="truncate">{player.name}</span>
                 {isCurrentBowler && <span className="text-white text-xs">●</span>}
               </div>
-              <div className="col-span-1 text-center">{stats.overs}</div>
-              <div className="col-span-1 text-center text-gray-400">{stats.maidens}</div>
-              <div className="col-span-1 text-center">{stats.runs}</div>
-              <div className="col-span-1 text-center font-bold">{stats.wickets}</div>
-              <div className="col-span-2 text-center text-gray-400">-</div>
+              <div className="col-span-1 text-center">{line ? line.overs : '0.0'}</div>
+              <div className="col-span-1 text-center text-gray-400">{line ? line.maidens : 0}</div>
+              <div className="col-span-1 text-center">{line ? line.runs_conceded : 0}</div>
+              <div className="col-span-1 text-center font-bold">{line ? line.wickets : 0}</div>
+              <div className="col-span-2 text-center text-gray-400">{line ? line.economy.toFixed(2) : '-'}</div>
             </div>
           );
         })}
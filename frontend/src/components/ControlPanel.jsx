@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import WicketModal from './WicketModal';
 
-const ControlPanel = ({ onBowl, striker, nonStriker, bowlingTeamPlayers, onUndo }) => {
+const ControlPanel = ({ onBowl, striker, nonStriker, bowlingTeamPlayers, onUndo, onRedo }) => {
   const [isWicketModalOpen, setIsWicketModalOpen] = useState(false);
 
   const handleRun = (runs) => {
@@ -40,13 +40,14 @@ const ControlPanel = ({ onBowl, striker, nonStriker, bowlingTeamPlayers, onUndo
             </button>
           ))}
         </div>
-        <div className="grid grid-cols-6 gap-2">
+        <div className="grid grid-cols-4 md:grid-cols-7 gap-2">
           <button onClick={() => handleExtra('WD')} className="border border-white/40 text.white font-bold py-2 rounded-full hover:bg-white hover:text-black transition">WD</button>
           <button onClick={() => handleExtra('NB')} className="border border-white/40 text-white font-bold py-2 rounded-full hover:bg-white hover:text-black transition">NB</button>
           <button onClick={() => handleExtra('B')} className="border border-white/40 text-white font-bold py-2 rounded-full hover:bg-white hover:text-black transition">Bye</button>
           <button onClick={() => handleExtra('LB')} className="border border-white/40 text-white font-bold py-2 rounded-full hover:bg-white hover:text-black transition">LB</button>
           <button onClick={() => setIsWicketModalOpen(true)} className="border border-white/60 text-white font-bold py-2 rounded-full hover:bg-white hover:text-black transition">WICKET</button>
           <button onClick={onUndo} className="border border-red-400 text-red-300 font-bold py-2 rounded-full hover:bg-red-500 hover:text-white transition">UNDO</button>
+          <button onClick={onRedo} className="border border-white/40 text-white font-bold py-2 rounded-full hover:bg-white hover:text-black transition">REDO</button>
         </div>
       </div>
       <WicketModal 
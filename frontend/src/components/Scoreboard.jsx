@@ -8,7 +8,6 @@ const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 const Scoreboard = ({ match, onUpdate }) => {
   const currentInnings = match.innings.find(i => !i.is_completed) || match.innings[match.innings.length - 1];
   const isMatchComplete = match.status === 'COMPLETED';
-  const maxOvers = match.custom_overs ? match.custom_overs : (match.format === 'T20' ? 20 : null);
 
   // State for current players
   const [striker, setStriker] = useState(null);
@@ -19,6 +18,18 @@ const Scoreboard = ({ match, onUpdate }) => {
   const [fireName, setFireName] = useState('');
   const [showHattrick, setShowHattrick] = useState(false);
   const [hattrickName, setHattrickName] = useState('');
+  const [scorecard, setScorecard] = useState(null);
+
+  // Batting and bowling figures come from the scorecard the backend keeps ball by ball, reloaded when the
+  // match moves to a new version
+  useEffect(() => {
+    let stale = false;
+    axios.get(`${API_URL}/api/matches/${match.id}/scorecard/`)
+      .then((response) => { if (!stale) setScorecard(response.data); })
+      .catch((error) => console.error("Error fetching scorecard:", error));
+    return () => { stale = true; };
+  }, [match.id, match.version]);
+  const currentCard = scorecard?.innings.find(i => i.id === currentInnings?.id);
   
   // Derived state from deliveries
   useEffect(() => {
@@ -175,6 +186,16 @@ const Scoreboard = ({ match, onUpdate }) => {
       alert("Error undoing last ball");
     }
   };
+
+  const handleRedo = async () => {
+    try {
+      await axios.post(`${API_URL}/api/matches/${match.id}/redo/`);
+      onUpdate();
+    } catch (error) {
+      console.error(error);
+      alert(error.response?.data?.error || "Error redoing ball");
+    }
+  };
   
   return (
     <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
@@ -184,38 +205,29 @@ const Scoreboard = ({ match, onUpdate }) => {
            <h2 className="text-2xl md:text-4xl font-bold">
              {currentInnings ? currentInnings.total_runs : 0}/{currentInnings ? currentInnings.total_wickets : 0}
            </h2>
-           <p className="text-gray-300 text-sm md:text-base">Overs: {currentInnings ? currentInnings.overs_bowled : 0}</p>
-           {currentInnings && currentInnings.innings_number === 2 && (
-             <>
-               {(() => {
-                 const firstInn = match.innings.find(i => i.innings_number === 1);
-                 const target = (firstInn?.total_runs || 0) + 1;
-                 const deliveries = currentInnings.deliveries || [];
-                 const legal = deliveries.filter(d => !['WD','NB'].includes(d.extra_type)).length;
-                 const totalBalls = maxOvers ? maxOvers * 6 : null;
-                 const ballsLeft = totalBalls !== null ? Math.max(totalBalls - legal, 0) : null;
-                 const runsNeeded = Math.max(target - (currentInnings.total_runs || 0), 0);
-                 return (
-                   <div className="mt-1">
-                     <p className="text-sm md:text-base font-semibold">Target: {target}</p>
-                     {ballsLeft !== null && (
-                       <p className="text-xs md:text-sm text-gray-300">Needs {runsNeeded} from {ballsLeft} balls</p>
-                     )}
-                   </div>
-                 );
-               })()}
-             </>
+           <p className="text-gray-300 text-sm md:text-base">Overs: {currentInnings ? currentInnings.overs : '0.0'}</p>
+           {currentInnings && currentInnings.target !== null && (
+             <div className="mt-1">
+               <p className="text-sm md:text-base font-semibold">Target: {currentInnings.target}</p>
+               {currentInnings.balls_remaining !== null && (
+                 <p className="text-xs md:text-sm text-gray-300">
+                   Needs {currentInnings.runs_needed} from {currentInnings.balls_remaining} balls
+                   {currentInnings.required_run_rate !== null && ` (RRR ${currentInnings.required_run_rate.toFixed(2)})`}
+                 </p>
+               )}
+             </div>
            )}
         </div>
         <div className="text-right min-w-0">
           <p className="text-lg md:text-xl font-bold break-words">{currentInnings ? currentInnings.batting_team_name : 'Batting'}</p>
-          <p className="text-xs md:text-sm text-gray-400">Run Rate: {currentInnings && currentInnings.overs_bowled > 0 ? (currentInnings.total_runs / currentInnings.overs_bowled).toFixed(2) : '0.00'}</p>
+          <p className="text-xs md:text-sm text-gray-400">Run Rate: {currentInnings ? currentInnings.run_rate.toFixed(2) : '0.00'}</p>
         </div>
       </div>
 
       <BattingCard 
         match={match} 
         innings={currentInnings} 
+        card={currentCard}
         striker={striker} 
         setStriker={setStriker}
         nonStriker={nonStriker}
@@ -225,6 +237,7 @@ const Scoreboard = ({ match, onUpdate }) => {
       <BowlingCard 
         match={match} 
         innings={currentInnings} 
+        card={currentCard}
         bowler={bowler}
         setBowler={setBowler}
       />
@@ -258,6 +271,7 @@ const Scoreboard = ({ match, onUpdate }) => {
             nonStriker={nonStriker}
             bowlingTeamPlayers={(match.team_a === (currentInnings?.bowling_team) ? match.team_a_details : match.team_b_details)?.players || []}
             onUndo={handleUndo}
+            onRedo={handleRedo}
           />
         </div>
       )}
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import TossModal from '../components/TossModal';
@@ -14,11 +14,17 @@ const Dashboard = () => {
   const [match, setMatch] = useState(null);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
+  const matchRef = useRef(null);
+
+  const showMatch = (data) => {
+    matchRef.current = data;
+    setMatch(data);
+  };
 
   const fetchMatch = async () => {
     try {
       const response = await axios.get(`${API_URL}/api/matches/${id}/`);
-      setMatch(response.data);
+      showMatch(response.data);
     } catch (error) {
       console.error("Error fetching match:", error);
     } finally {
@@ -26,12 +32,75 @@ const Dashboard = () => {
     }
   };
 
+  const lastDeliveryId = (current) =>
+    current.innings.reduce((last, inn) => inn.deliveries.reduce((max, d) => Math.max(max, d.id), last), 0);
+
+  // Applies the compact live state to the loaded match and appends the balls bowled since the last one we
+  // have. Undo and rewind remove balls (last_undo_version moves) and a status change brings rosters,
+  // results and awards the live state does not carry, so those resync from the full match.
+  const applyLive = async (live) => {
+    const current = matchRef.current;
+    if (!current || live.version === current.version) return;
+    if (live.last_undo_version !== current.last_undo_version || live.status !== current.status) {
+      await fetchMatch();
+      return;
+    }
+    const feed = (await axios.get(`${API_URL}/api/matches/${id}/deliveries/`, {
+      params: { since: lastDeliveryId(current) },
+    })).data;
+    if (feed.has_more || feed.last_undo_version !== current.last_undo_version) {
+      await fetchMatch();
+      return;
+    }
+
+    const newBalls = {};
+    feed.deliveries.forEach((d) => (newBalls[d.innings] ||= []).push(d));
+    const teamName = (teamId) =>
+      [current.team_a_details, current.team_b_details].find((team) => team.id === teamId)?.name;
+    const innings = live.innings.map((summary) => {
+      const loaded = current.innings.find((inn) => inn.id === summary.id) || {
+        match: current.id,
+        batting_team_name: teamName(summary.batting_team),
+        bowling_team_name: teamName(summary.bowling_team),
+        deliveries: [],
+      };
+      return { ...loaded, ...summary, deliveries: [...loaded.deliveries, ...(newBalls[summary.id] || [])] };
+    });
+    showMatch({ ...current, ...live, innings });
+  };
+
+  // Poll the compact live state; a ball costs the live state plus that ball, not the whole match
+  const pollLive = async () => {
+    try {
+      const response = await axios.get(`${API_URL}/api/matches/${id}/live/`);
+      await applyLive(response.data);
+    } catch (error) {
+      console.error("Error polling match:", error);
+    }
+  };
+
   useEffect(() => {
     fetchMatch();
-    const interval = setInterval(fetchMatch, 5000); // Poll every 5s for updates
+    const interval = setInterval(pollLive, 5000); // Poll every 5s for updates
     return () => clearInterval(interval);
   }, [id]);
 
+  // Push channel (ASGI deployments only): update as soon as a ball is scored
+  useEffect(() => {
+    if (!window.EventSource) return;
+    const source = new EventSource(`${API_URL}/api/matches/${id}/events/`);
+    source.onmessage = (e) => {
+      const event = JSON.parse(e.data);
+      const current = matchRef.current;
+      if (!current || event.version === current.version) return;
+      // A missed event (version gap) or an undo: the delta feed cannot patch that up
+      if (event.event === 'undo' || event.version !== current.version + 1) fetchMatch();
+      else pollLive();
+    };
+    source.onerror = () => source.close(); // Fall back to polling
+    return () => source.close();
+  }, [id]);
+
   if (loading) return <div className="flex h-screen items-center justify-center bg-black text-white overflow-x-hidden">Loading...</div>;
   if (!match) return <div className="flex h-screen items-center justify-center bg-black text-white overflow-x-hidden">Match not found</div>;
 
@@ -56,7 +125,7 @@ const Dashboard = () => {
 
       {(match.status === 'LIVE' || match.status === 'COMPLETED') && (
         <>
-          <Scoreboard match={match} onUpdate={fetchMatch} />
+          <Scoreboard match={match} onUpdate={pollLive} />
           {match.status === 'COMPLETED' && <MatchSummary match={match} />}
         </>
       )}
@@ -8,15 +8,18 @@ const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 const History = () => {
   const navigate = useNavigate();
   const [matches, setMatches] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [details, setDetails] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
  
-  const fetchMatches = async () => {
+  // The list endpoint returns slim summaries, newest first, one cursor page at a time
+  const fetchMatches = async (url = `${API_URL}/api/matches/?status=COMPLETED`) => {
     setError(null);
     try {
-      const resp = await axios.get(`${API_URL}/api/matches/`);
-      const completed = (resp.data || []).filter(m => m.status === 'COMPLETED');
-      setMatches(completed.reverse());
+      const resp = await axios.get(url);
+      setMatches(prev => url === nextPage ? [...prev, ...resp.data.results] : resp.data.results);
+      setNextPage(resp.data.next);
     } catch {
       setError('Failed to load history');
     } finally {
@@ -27,6 +30,20 @@ const History = () => {
   useEffect(() => {
     fetchMatches();
   }, []);
+
+  // Full scorecards are only loaded for the matches the user opens
+  const toggleScorecard = async (id) => {
+    if (details[id]) {
+      setDetails(prev => ({ ...prev, [id]: undefined }));
+      return;
+    }
+    try {
+      const resp = await axios.get(`${API_URL}/api/matches/${id}/`);
+      setDetails(prev => ({ ...prev, [id]: resp.data }));
+    } catch {
+      setError('Failed to load scorecard');
+    }
+  };
  
   const dismissalText = (match, innings, playerId) => {
     const wicketBall = innings.deliveries?.find(d => d.is_wicket && d.player_out === playerId);
@@ -108,6 +125,88 @@ const History = () => {
     return entries;
   };
  
+  const renderScorecard = (match) => (
+    <>
+      <div className="grid grid-cols-1 gap-3">
+        {match.innings.map(inn => {
+          const battingTeam = match.team_a === inn.batting_team ? match.team_a_details : match.team_b_details;
+          const bowlingTeam = match.team_a === inn.bowling_team ? match.team_a_details : match.team_b_details;
+          return (
+            <div key={inn.id} className="bg-black/20 rounded-lg p-2 md:p-3">
+              <div className="flex justify-between items-center mb-2">
+                <div className="text-sm md:text-base font-bold">{inn.batting_team_name}</div>
+                <div className="text-sm md:text-base">{inn.total_runs}/{inn.total_wickets} • {inn.overs} ov</div>
+              </div>
+              <div className="mt-2">
+                <div className="grid grid-cols-12 text-[10px] md:text-xs text-gray-400 mb-1 uppercase font-bold">
+                  <div className="col-span-6">Batsman</div>
+                  <div className="col-span-1 text-center">R</div>
+                  <div className="col-span-1 text-center">B</div>
+                  <div className="col-span-1 text-center">4s</div>
+                  <div className="col-span-1 text-center">6s</div>
+                  <div className="col-span-2 text-center">SR</div>
+                </div>
+                <div className="space-y-1">
+                  {battingTeam.players.map(p => {
+                    const b = calcBatting(inn, p.id);
+                    const dism = dismissalText(match, inn, p.id);
+                    const show = b.ballCount > 0 || inn.deliveries?.some(d => d.player_out === p.id);
+                    if (!show) return null;
+                    return (
+                      <div key={p.id} className="grid grid-cols-12 items-center p-1 rounded">
+                        <div className="col-span-6">
+                          <span className="font-bold text-xs md:text-sm">{p.name}</span>
+                          <span className="text-gray-400 text-[10px] md:text-xs ml-1">• {dism}</span>
+                        </div>
+                        <div className="col-span-1 text-center font-bold">{b.runs}</div>
+                        <div className="col-span-1 text-center">{b.ballCount}</div>
+                        <div className="col-span-1 text-center text-gray-400">{b.fours}</div>
+                        <div className="col-span-1 text-center text-gray-400">{b.sixes}</div>
+                        <div className="col-span-2 text-center text-gray-300">{b.sr}</div>
+                      </div>
+                    );
+                  })}
+                </div>
+              </div>
+              <div className="mt-3">
+                <div className="grid grid-cols-12 text-[10px] md:text-xs text-gray-400 mb-1 uppercase font-bold">
+                  <div className="col-span-6">Bowler</div>
+                  <div className="col-span-2 text-center">O</div>
+                  <div className="col-span-2 text-center">R</div>
+                  <div className="col-span-2 text-center">W</div>
+                </div>
+                <div className="space-y-1">
+                  {bowlingTeam.players.map(p => {
+                    const bw = calcBowling(inn, p.id);
+                    if (bw.ballsBowled === 0) return null;
+                    return (
+                      <div key={p.id} className="grid grid-cols-12 items-center p-1 rounded">
+                        <div className="col-span-6 font-bold text-xs md:text-sm">{p.name}</div>
+                        <div className="col-span-2 text-center">{bw.overs}</div>
+                        <div className="col-span-2 text-center">{bw.conceded}</div>
+                        <div className="col-span-2 text-center font-bold">{bw.wickets}</div>
+                      </div>
+                    );
+                  })}
+                </div>
+              </div>
+            </div>
+          );
+        })}
+      </div>
+      {match.innings.map(inn => {
+        const fow = fallOfWickets(match, inn);
+        if (!fow.length) return null;
+        return (
+          <div key={`fow-${inn.id}`} className="mt-2 bg-black/20 p-2 rounded">
+            <div className="text-[10px] md:text-xs text-gray-400 uppercase font-bold mb-1">Fall of Wickets</div>
+            <div className="text-xs md:text-sm text-gray-200">{fow.join(', ')}</div>
+          </div>
+        );
+      })}
+    </>
+  );
+ 
   return (
     <div className="relative min-h-screen text-white overflow-x-hidden">
       <div className="absolute inset-0 bg-[url('https://images.unsplash.com/photo-1547347298-4074fc259a31?auto=format&fit=crop&w=1600&q=60')] bg-cover bg-center filter grayscale"></div>
@@ -124,103 +223,55 @@ const History = () => {
         {error && <div className="bg-red-500/80 text-white p-3 rounded mb-4 text-center">{error}</div>}
  
         <div className="grid grid-cols-1 gap-3">
-          {matches.map(match => (
-            <div key={match.id} className="bg-white/10 rounded-xl border border-white/10 p-3 md:p-4">
+          {matches.map(summary => {
+            const match = details[summary.id];
+            return (
+            <div key={summary.id} className="bg-white/10 rounded-xl border border-white/10 p-3 md:p-4">
               <div className="flex justify-between items-center mb-2">
-                <div className="font-bold text-sm md:text-base break-words">{match.team_a_details.name} vs {match.team_b_details.name}/ Match{match.id}</div>
-                <div className="text-xs md:text-sm text-gray-300">{match.format}</div>
+                <div className="font-bold text-sm md:text-base break-words">{summary.team_a_name} vs {summary.team_b_name}/ Match{summary.id}</div>
+                <div className="text-xs md:text-sm text-gray-300">{summary.format}</div>
               </div>
-              <div className="grid grid-cols-1 gap-3">
-                {match.innings.map(inn => {
-                  const battingTeam = match.team_a === inn.batting_team ? match.team_a_details : match.team_b_details;
-                  const bowlingTeam = match.team_a === inn.bowling_team ? match.team_a_details : match.team_b_details;
-                  return (
-                    <div key={inn.id} className="bg-black/20 rounded-lg p-2 md:p-3">
-                      <div className="flex justify-between items-center mb-2">
-                        <div className="text-sm md:text-base font-bold">{inn.batting_team_name}</div>
-                        <div className="text-sm md:text-base">{inn.total_runs}/{inn.total_wickets} • {inn.overs_bowled} ov</div>
-                      </div>
-                      <div className="mt-2">
-                        <div className="grid grid-cols-12 text-[10px] md:text-xs text-gray-400 mb-1 uppercase font-bold">
-                          <div className="col-span-6">Batsman</div>
-                          <div className="col-span-1 text-center">R</div>
-                          <div className="col-span-1 text-center">B</div>
-                          <div className="col-span-1 text-center">4s</div>
-                          <div className="col-span-1 text-center">6s</div>
-                          <div className="col-span-2 text-center">SR</div>
-                        </div>
-                        <div className="space-y-1">
-                          {battingTeam.players.map(p => {
-                            const b = calcBatting(inn, p.id);
-                            const dism = dismissalText(match, inn, p.id);
-                            const show = b.ballCount > 0 || inn.deliveries?.some(d => d.player_out === p.id);
-                            if (!show) return null;
-                            return (
-                              <div key={p.id} className="grid grid-cols-12 items-center p-1 rounded">
-                                <div className="col-span-6">
-                                  <span className="font-bold text-xs md:text-sm">{p.name}</span>
-                                  <span className="text-gray-400 text-[10px] md:text-xs ml-1">• {dism}</span>
-                                </div>
-                                <div className="col-span-1 text-center font-bold">{b.runs}</div>
-                                <div className="col-span-1 text-center">{b.ballCount}</div>
-                                <div className="col-span-1 text-center text-gray-400">{b.fours}</div>
-                                <div className="col-span-1 text-center text-gray-400">{b.sixes}</div>
-                                <div className="col-span-2 text-center text-gray-300">{b.sr}</div>
-                              </div>
-                            );
-                          })}
-                        </div>
-                      </div>
-                      <div className="mt-3">
-                        <div className="grid grid-cols-12 text-[10px] md:text-xs text-gray-400 mb-1 uppercase font-bold">
-                          <div className="col-span-6">Bowler</div>
-                          <div className="col-span-2 text-center">O</div>
-                          <div className="col-span-2 text-center">R</div>
-                          <div className="col-span-2 text-center">W</div>
-                        </div>
-                        <div className="space-y-1">
-                          {bowlingTeam.players.map(p => {
-                            const bw = calcBowling(inn, p.id);
-                            if (bw.ballsBowled === 0) return null;
-                            return (
-                              <div key={p.id} className="grid grid-cols-12 items-center p-1 rounded">
-                                <div className="col-span-6 font-bold text-xs md:text-sm">{p.name}</div>
-                                <div className="col-span-2 text-center">{bw.overs}</div>
-                                <div className="col-span-2 text-center">{bw.conceded}</div>
-                                <div className="col-span-2 text-center font-bold">{bw.wickets}</div>
-                              </div>
-                            );
-                          })}
-                        </div>
-                      </div>
+              {!match && (
+                <div className="grid grid-cols-1 gap-1">
+                  {summary.innings.map(inn => (
+                    <div key={inn.id} className="flex justify-between items-center bg-black/20 rounded-lg p-2 md:p-3">
+                      <div className="text-sm md:text-base font-bold">{inn.batting_team === summary.team_a ? summary.team_a_name : summary.team_b_name}</div>
+                      <div className="text-sm md:text-base">{inn.total_runs}/{inn.total_wickets} • {inn.overs} ov</div>
                     </div>
-                  );
-                })}
-              </div>
+                  ))}
+                </div>
+              )}
+              {match && renderScorecard(match)}
               <div className="mt-3 flex justify-between items-center">
                 <div className="text-xs md:text-sm text-gray-300">
-                  Winner: {match.winner_details ? match.winner_details.name : 'Tie'}{resultText(match) ? ` • ${resultText(match)}` : ''}
+                  Winner: {summary.winner_name || 'Tie'}{match && resultText(match) ? ` • ${resultText(match)}` : ''}
+                </div>
+                <div className="flex gap-2">
+                  <button
+                    onClick={() => toggleScorecard(summary.id)}
+                    className="px-3 py-2 bg-white/10 text-white font-bold rounded-lg text-xs md:text-sm hover:bg-white/20 border border-white/20 transition"
+                  >
+                    {match ? 'Hide' : 'Scorecard'}
+                  </button>
+                  <button
+                    onClick={() => navigate(`/match/${summary.id}`)}
+                    className="px-3 py-2 bg-white text-black font-bold rounded-lg text-xs md:text-sm hover:bg-black hover:text-white border border-white/20 transition"
+                  >
+                    View
+                  </button>
                 </div>
-                <button
-                  onClick={() => navigate(`/match/${match.id}`)}
-                  className="px-3 py-2 bg-white text-black font-bold rounded-lg text-xs md:text-sm hover:bg-black hover:text-white border border-white/20 transition"
-                >
-                  View
-                </button>
               </div>
-              
-              {match.innings.map(inn => {
-                const fow = fallOfWickets(match, inn);
-                if (!fow.length) return null;
-                return (
-                  <div key={`fow-${inn.id}`} className="mt-2 bg-black/20 p-2 rounded">
-                    <div className="text-[10px] md:text-xs text-gray-400 uppercase font-bold mb-1">Fall of Wickets</div>
-                    <div className="text-xs md:text-sm text-gray-200">{fow.join(', ')}</div>
-                  </div>
-                );
-              })}
             </div>
-          ))}
+            );
+          })}
+          {nextPage && (
+            <button
+              onClick={() => fetchMatches(nextPage)}
+              className="px-3 py-2 bg-white/10 hover:bg-white/20 rounded-lg text-sm font-bold"
+            >
+              Load more
+            </button>
+          )}
           {matches.length === 0 && !loading && (
             <div className="text-center text-gray-300">No completed matches yet</div>
           )}